@@ -7,6 +7,8 @@ This script scrapes sql statements from the test directory, and stores them as s
 from pathlib import Path
 import shutil
 import sqllogic_utils
+import early_error_filter
+import schema_aware_seeds
 import random
 import re
 import sys
@@ -15,7 +17,9 @@ import sys
 # paths (local testing)
 DUCKDB_DIR = Path('~/git/duckdb/').expanduser()
 FILE_DIR_TO_SCRAPE = DUCKDB_DIR / 'test'
-KEY_WORD_FILE = Path(__file__).parents[1] / 'fuzz_utils/duckdb_sql.dict'
+# only the grammar keywords; the full duckdb_sql.dict also has function and type names, that are common identifiers
+KEY_WORD_FILE = Path(__file__).parents[1] / 'fuzz_utils/duckdb_sql_keywords.dict'
+WORD_PATTERN = re.compile(r"\b\w+\b")
 CORPUS_ROOT_DIR = Path(__file__).parents[2] / 'corpus'
 
 
@@ -35,8 +39,10 @@ def main(argv: list[str]):
 
     # create a .sql corpus file per .test file
     all_test_files = list(FILE_DIR_TO_SCRAPE.rglob('*.test'))
-    key_words = re.findall(r"^\"(\w+)\"$", KEY_WORD_FILE.read_text(), flags=re.MULTILINE)
+    key_words = {kw.lower(): kw for kw in re.findall(r"^\"(\w+)\"$", KEY_WORD_FILE.read_text(), flags=re.MULTILINE)}
     print(f"creating corpus files for {len(all_test_files)} test files found in {FILE_DIR_TO_SCRAPE}")
+    candidates = {}
+    test_file_statements = {}
     for test_file in all_test_files:
         if not test_file.is_file():
             continue
@@ -46,21 +52,34 @@ def main(argv: list[str]):
             # skip for now: non-unicode files
             continue
         statements = sqllogic_utils.get_sql_statements(file_content)
+        filename = f"{test_file.stem.replace(' ', '-')}.sql"
+        test_file_statements[filename] = statements
         pruned_statements = [use_casing_from_dict(stmnt, key_words) for stmnt in statements if not sql_exempted(stmnt)]
         if pruned_statements:
-            filename = f"{test_file.stem.replace(' ', '-')}.sql"
-            (corpus_dir / filename).write_text("\n".join(pruned_statements))
+            candidates[filename] = pruned_statements
+
+    # add compact seeds per query: the query with only the statements that create the objects it depends on
+    seeds = schema_aware_seeds.create_schema_aware_seeds(test_file_statements, DUCKDB_DIR, sql_exempted)
+    known_contents = {tuple(statements) for statements in candidates.values()}
+    for filename, seed_statements in seeds.items():
+        seed_statements = [use_casing_from_dict(stmnt, key_words) for stmnt in seed_statements]
+        if tuple(seed_statements) not in known_contents:
+            known_contents.add(tuple(seed_statements))
+            candidates[filename] = seed_statements
+
+    # drop files of which most statements fail early (parser, binder, catalog errors)
+    candidates = early_error_filter.filter_early_failing_files(candidates)
+    for filename, pruned_statements in candidates.items():
+        (corpus_dir / filename).write_text("\n".join(pruned_statements))
 
     # only keep random set, to prevent the corpus is too big -> DELETE the others!
     select_random_corpus_files(corpus_dir)
 
 
 # follow the casing from the .dict file, for better keyword detection by the fuzzer
-def use_casing_from_dict(statement: str, key_words:list[str]):
-    for kw in key_words:
-        pattern = rf"\b{kw}\b"
-        statement = re.sub(pattern, kw, statement, flags=re.IGNORECASE)
-    return statement
+# key_words: the keyword per lower case keyword; a single pass over the words of the statement
+def use_casing_from_dict(statement: str, key_words: dict[str, str]):
+    return WORD_PATTERN.sub(lambda match: key_words.get(match.group().lower(), match.group()), statement)
 
 
 # discard some sql statements that won't (yet) work well in fuzzing context
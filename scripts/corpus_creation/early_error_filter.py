@@ -0,0 +1,68 @@
+'''
+Filter sql corpus candidates of which most statements fail early: in the parser, binder, or catalog.
+Such statements (e.g. queries on tables created in other test files) exercise almost nothing of the
+optimizer and execution engine, so they make poor seeds.
+Every candidate is executed in a fresh in-memory database with the duckdb python module,
+in a forked process per candidate (the candidates are distributed over a process pool).
+'''
+
+import multiprocessing
+import os
+import sys
+from collections import Counter
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parents[1] / 'fuzz_utils'))
+from forked_duckdb import execute_statements, run_in_fork
+
+EARLY_ERRORS = ['parser', 'binder', 'catalog']
+MAX_EARLY_ERROR_RATIO = 0.5
+TIMEOUT_PER_FILE_S = 10
+
+
+# candidates: {file_name: [sql_statement, ...]}; returns the candidates that mostly reach execution
+def filter_early_failing_files(candidates: dict[str, list[str]], nr_workers=None) -> dict[str, list[str]]:
+    print(f"executing {len(candidates)} corpus candidates to classify the statement outcomes ...")
+    with multiprocessing.get_context('fork').Pool(nr_workers or os.cpu_count()) as pool:
+        all_outcomes = dict(zip(candidates, pool.map(classify_statements, candidates.values())))
+
+    kept = {}
+    outcome_count_all = Counter()
+    outcome_count_kept = Counter()
+    nr_rejects_early_errors = 0
+    nr_rejects_crash_or_timeout = 0
+    for file_name, outcomes in all_outcomes.items():
+        outcome_count_all.update(outcomes)
+        if 'crash' in outcomes or 'timeout' in outcomes:
+            nr_rejects_crash_or_timeout += 1
+        elif early_error_ratio(outcomes) > MAX_EARLY_ERROR_RATIO:
+            nr_rejects_early_errors += 1
+        else:
+            kept[file_name] = candidates[file_name]
+            outcome_count_kept.update(outcomes)
+
+    # some logging:
+    print(f"statement outcomes (all candidates): {dict(outcome_count_all.most_common())}")
+    print(f"statement outcomes (kept candidates): {dict(outcome_count_kept.most_common())}")
+    print(f"{nr_rejects_early_errors} rejected because 'most statements fail in parser, binder or catalog'")
+    print(f"{nr_rejects_crash_or_timeout} rejected because 'crash or timeout'")
+    ratio_all = 1 - early_error_ratio(list(outcome_count_all.elements()))
+    ratio_kept = 1 - early_error_ratio(list(outcome_count_kept.elements()))
+    print(f"ratio of statements that pass the parser, binder and catalog: {ratio_all:.2f} (all) -> {ratio_kept:.2f} (kept)")
+    return kept
+
+
+# outcome per statement: see forked_duckdb.classify_exception(); 'crash' or 'timeout' if duckdb did not survive
+def classify_statements(statements: list[str]) -> list[str]:
+    outcomes, _, returncode, timed_out = run_in_fork(execute_statements, statements, timeout=TIMEOUT_PER_FILE_S)
+    if timed_out:
+        return ['timeout']
+    if returncode != 0:
+        return ['crash']
+    return [outcome for outcome, _ in outcomes]
+
+
+def early_error_ratio(outcomes: list[str]) -> float:
+    if not outcomes:
+        return 1.0
+    return sum(1 for outcome in outcomes if outcome in EARLY_ERRORS) / len(outcomes)
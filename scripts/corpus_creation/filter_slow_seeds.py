@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+'''
+This script removes slow seeds from a corpus directory, before it is used by the fuzzer.
+Every seed is executed a few times and the median execution time is recorded;
+seeds exceeding the time budget are moved out of the corpus directory.
+By default the seeds are timed one at a time: the targets are multi-threaded duckdb processes, so parallel timing runs
+compete for the cores, and seeds would be dropped because of the load instead of their own exec time.
+Slow seeds reduce the fuzzer throughput (exec/s) far more than seeds that are large, but fast.
+Inputs:
+    - corpus directory
+    - target:
+        - path to a fuzz target executable (or duckdb cli); the seed is fed via stdin, as done by afl++
+        - or 'sql': the seed is executed as sql with the duckdb python module (in a forked process)
+Output:
+    - the slow seeds are moved to directory '<corpus_dir>_slow'
+    - file '<corpus_dir>_exec_times.json' with the median execution time (ms) per seed
+Note:
+    - fuzz targets that use fixed file paths (duckdb_file_fuzzer, wal_fuzzer) should be run with 1 worker (the default)
+'''
+
+import json
+import multiprocessing
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parents[1] / 'fuzz_utils'))
+from sql_tokenizer import join_tokens, split_sql_statements
+
+DEFAULT_TIME_BUDGET_MS = 200
+DEFAULT_NR_RUNS = 3
+DEFAULT_NR_WORKERS = 1
+
+
+def main(argv: list[str]):
+    corpus_dir = Path(argv[1]).expanduser()
+    target = argv[2]
+    time_budget_ms = float(argv[3]) if len(argv) > 3 else DEFAULT_TIME_BUDGET_MS
+    nr_runs = int(argv[4]) if len(argv) > 4 else DEFAULT_NR_RUNS
+    nr_workers = int(argv[5]) if len(argv) > 5 else DEFAULT_NR_WORKERS
+
+    if not corpus_dir.is_dir():
+        sys.exit(f"corpus directory not found: {corpus_dir}")
+    if target != 'sql':
+        target = str(Path(target).expanduser().absolute())
+        if not Path(target).is_file():
+            sys.exit(f"fuzz target not found: {target}")
+    slow_seed_dir = corpus_dir.parent / f"{corpus_dir.name}_slow"
+    exec_times_file = corpus_dir.parent / f"{corpus_dir.name}_exec_times.json"
+
+    # seeds that (nearly) time out are always slow; no need to wait longer than 10x the budget
+    timeout_s = max(1.0, 10 * time_budget_ms / 1000)
+    seeds = sorted(f for f in corpus_dir.rglob('*') if f.is_file())
+    print(f"timing {len(seeds)} seeds in {corpus_dir} ({nr_runs} runs per seed, {nr_workers} workers) ...")
+    jobs = [(seed, target, nr_runs, timeout_s) for seed in seeds]
+    with multiprocessing.get_context('fork').Pool(nr_workers) as pool:
+        exec_times = dict(zip(seeds, pool.map(median_exec_time_ms, jobs)))
+
+    slow_seeds = [seed for seed, exec_time in exec_times.items() if exec_time > time_budget_ms]
+    for seed in slow_seeds:
+        destination = slow_seed_dir / seed.relative_to(corpus_dir)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(seed, destination)
+    exec_times_file.write_text(
+        json.dumps(
+            {str(seed.relative_to(corpus_dir)): round(exec_time, 3) for seed, exec_time in exec_times.items()},
+            indent=4,
+        )
+    )
+
+    # some logging:
+    if exec_times:
+        print(f"median exec time of all seeds: {statistics.median(exec_times.values()):.1f} ms")
+    print(f"{len(slow_seeds)} seeds slower than {time_budget_ms} ms moved to: {slow_seed_dir}")
+    print(f"{len(seeds) - len(slow_seeds)} seeds kept")
+    print(f"exec time per seed stored in: {exec_times_file}")
+
+
+def median_exec_time_ms(job: tuple[Path, str, int, float]) -> float:
+    seed, target, nr_runs, timeout_s = job
+    if target == 'sql':
+        exec_times = [exec_time_sql_ms(seed, timeout_s) for _ in range(nr_runs)]
+    else:
+        exec_times = [exec_time_target_ms(seed, target, timeout_s) for _ in range(nr_runs)]
+    return statistics.median(exec_times)
+
+
+# feed the seed via stdin; run in a separate working directory, since some targets create files in the cwd
+def exec_time_target_ms(seed: Path, target: str, timeout_s: float) -> float:
+    with tempfile.TemporaryDirectory() as work_dir, seed.open('rb') as seed_fd:
+        start = time.perf_counter()
+        try:
+            subprocess.run(
+                [target],
+                stdin=seed_fd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                cwd=work_dir,
+                timeout=timeout_s,
+            )
+        except subprocess.TimeoutExpired:
+            return timeout_s * 1000
+        return (time.perf_counter() - start) * 1000
+
+
+def exec_time_sql_ms(seed: Path, timeout_s: float) -> float:
+    # only imported for target 'sql'; requires the duckdb python module
+    from forked_duckdb import run_in_fork
+
+    statements = [join_tokens(tokens) for tokens in split_sql_statements(seed.read_text(errors='ignore'))]
+    exec_time, _, _, timed_out = run_in_fork(timed_execute_statements, statements, timeout=timeout_s)
+    if timed_out or exec_time is None:
+        # crashed or timed out
+        return timeout_s * 1000
+    return exec_time
+
+
+# runs in the forked process; excludes the fork overhead
+def timed_execute_statements(statements: list[str]) -> float:
+    from forked_duckdb import execute_statements
+
+    start = time.perf_counter()
+    execute_statements(statements)
+    return (time.perf_counter() - start) * 1000
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in range(3, 7):
+        sys.exit(
+            """
+            ERROR; call this script with the following arguments:
+              1 - corpus directory
+              2 - path to fuzz target (or duckdb cli), or 'sql' to use the duckdb python module
+              3 - (optional) time budget per seed in ms (default: 200)
+              4 - (optional) number of runs per seed (default: 3)
+              5 - (optional) number of parallel workers (default: 1; more workers skew the exec times)
+            """
+        )
+    main(sys.argv)
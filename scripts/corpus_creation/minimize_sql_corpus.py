@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+'''
+This script minimizes the sql corpus files (e.g. created by afl-cmin), as a faster replacement of afl-tmin.
+Per corpus file, complete statements and then tokens are removed (delta debugging), as long as the
+coverage signature reported by afl-showmap is preserved.
+To keep the number of (slow) afl-showmap runs low, every candidate is first executed with the duckdb python module
+in a forked process; only candidates that still have all statement outcomes of the original file
+(success, parser error, binder error, etc.) are verified with afl-showmap.
+The corpus files are processed in parallel (one worker per core).
+Inputs:
+    - directory with sql corpus files
+    - duckdb cli, instrumented by the afl++ compiler (required for afl-showmap)
+Output:
+    - directory with the minimized sql corpus files
+'''
+
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parents[1] / 'fuzz_utils'))
+from delta_debug import minimize_sql
+from forked_duckdb import execute_statements, run_in_fork
+from sql_tokenizer import join_tokens, split_sql_statements
+
+# default paths
+DUCKDB_CLI = Path('~/git/duckdb/build/release/duckdb').expanduser()
+INPUT_DIR = Path(__file__).parents[2] / 'corpus/sql_cmin'
+OUTPUT_DIR = Path(__file__).parents[2] / 'corpus/sql_tmin'
+
+AFL_SHOWMAP = os.environ.get('AFL_SHOWMAP', shutil.which('afl-showmap') or '/AFLplusplus/afl-showmap')
+SHOWMAP_TIMEOUT_MS = 5000
+FORK_TIMEOUT_S = 5
+
+
+def main(argv: list[str]):
+    input_dir = Path(argv[1]).expanduser() if len(argv) > 1 else INPUT_DIR
+    output_dir = Path(argv[2]).expanduser() if len(argv) > 2 else OUTPUT_DIR
+    duckdb_cli = Path(argv[3]).expanduser() if len(argv) > 3 else DUCKDB_CLI
+    nr_workers = int(argv[4]) if len(argv) > 4 else os.cpu_count()
+
+    if not duckdb_cli.is_file():
+        sys.exit(f"expected file not found: {duckdb_cli}")
+    if not Path(AFL_SHOWMAP).is_file():
+        sys.exit(f"afl-showmap not found: {AFL_SHOWMAP} (set env variable AFL_SHOWMAP)")
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    output_dir.mkdir(parents=True)
+    corpus_files = sorted(f for f in input_dir.iterdir() if f.is_file())
+    print(f"minimizing {len(corpus_files)} corpus files from {input_dir} with {nr_workers} workers ...")
+
+    size_before = 0
+    size_after = 0
+    nr_minimized = 0
+    # use 'fork': the workers fork again per candidate, which is only safe from a single threaded process
+    with multiprocessing.get_context('fork').Pool(nr_workers) as pool:
+        jobs = [(corpus_file, output_dir, duckdb_cli) for corpus_file in corpus_files]
+        for corpus_file, original_size, minimized_size in pool.imap_unordered(minimize_corpus_file, jobs):
+            size_before += original_size
+            size_after += minimized_size
+            if minimized_size < original_size:
+                nr_minimized += 1
+            print(f"{corpus_file.name}: {original_size} -> {minimized_size} bytes", flush=True)
+
+    print(f"{nr_minimized} of {len(corpus_files)} corpus files could be minimized")
+    print(f"total corpus size: {size_before} -> {size_after} bytes")
+
+
+def minimize_corpus_file(job: tuple[Path, Path, Path]) -> tuple[Path, int, int]:
+    corpus_file, output_dir, duckdb_cli = job
+    sql = corpus_file.read_text(errors='surrogateescape')
+    with tempfile.TemporaryDirectory() as work_dir:
+        is_interesting = create_oracle(sql, duckdb_cli, Path(work_dir))
+        minimized_sql = minimize_sql(sql, is_interesting) if is_interesting else sql
+    # keep the original if minimization did not help (e.g. only whitespace differences)
+    if len(minimized_sql.encode(errors='surrogateescape')) >= len(sql.encode(errors='surrogateescape')):
+        minimized_sql = sql
+    (output_dir / corpus_file.name).write_text(minimized_sql, errors='surrogateescape')
+    return (
+        corpus_file,
+        len(sql.encode(errors='surrogateescape')),
+        len(minimized_sql.encode(errors='surrogateescape')),
+    )
+
+
+# returns a function that decides if a candidate preserves the coverage of the original sql
+# returns None if the original sql has no stable coverage signature (e.g. it crashes or times out)
+def create_oracle(sql: str, duckdb_cli: Path, work_dir: Path):
+    original_outcomes = statement_outcomes(sql)
+    if original_outcomes is None:
+        return None
+    # edges that are hit in two consecutive runs; ignores coverage caused by non-determinism (e.g. threads)
+    first_signature = coverage_signature(sql, duckdb_cli, work_dir)
+    second_signature = coverage_signature(sql, duckdb_cli, work_dir)
+    if first_signature is None or second_signature is None:
+        return None
+    stable_signature = first_signature & second_signature
+
+    def is_interesting(candidate: str) -> bool:
+        candidate_outcomes = statement_outcomes(candidate)
+        if candidate_outcomes is None or not candidate_outcomes >= original_outcomes:
+            return False
+        candidate_signature = coverage_signature(candidate, duckdb_cli, work_dir)
+        return candidate_signature is not None and candidate_signature >= stable_signature
+
+    return is_interesting
+
+
+# set of statement outcomes ('ok', 'parser', 'binder', ...), None in case of a crash or timeout
+def statement_outcomes(sql: str) -> set[str] | None:
+    statements = [join_tokens(tokens) for tokens in split_sql_statements(sql)]
+    outcomes, _, returncode, timed_out = run_in_fork(execute_statements, statements, timeout=FORK_TIMEOUT_S)
+    if returncode != 0 or timed_out:
+        return None
+    return {outcome for outcome, _ in outcomes}
+
+
+# set of edges hit by the duckdb cli (hit counts are ignored), None in case of a crash or timeout
+def coverage_signature(sql: str, duckdb_cli: Path, work_dir: Path) -> frozenset[str] | None:
+    input_file = work_dir / 'input.sql'
+    map_file = work_dir / 'map.txt'
+    input_file.write_text(sql, errors='surrogateescape')
+    command = [AFL_SHOWMAP, '-q', '-e', '-t', str(SHOWMAP_TIMEOUT_MS), '-o', map_file, '--', duckdb_cli, '-f', input_file]
+    res = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if res.returncode != 0 or not map_file.is_file():
+        return None
+    return frozenset(map_file.read_text().split())
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in range(1, 6):
+        sys.exit(
+            """
+            ERROR; call this script with the following arguments:
+              1 - (optional) input directory with sql corpus files
+              2 - (optional) output directory for the minimized corpus files
+              3 - (optional) path to duckdb cli, instrumented by afl++
+              4 - (optional) number of parallel workers (default: number of cores)
+            """
+        )
+    main(sys.argv)
@@ -0,0 +1,219 @@
+'''
+Create compact sql seeds per query: the query itself, preceded by only the statements that create (and fill)
+the tables, views, types, macros, etc. the query depends on.
+The dependencies are tracked per test file: referenced names are taken from duckdb's parser (json_serialize_sql),
+with a fallback to the identifiers in the statement for statements that can not be serialized.
+Setup statements that are not usable in a fuzzing context (e.g. reading from 'data/csv/...') are executed once
+at corpus creation, and the resulting tables are replaced by a CREATE TABLE + INSERT of (the first rows of) their content.
+These setup statements run in a forked process with a timeout (MATERIALIZE_TIMEOUT_S), so a slow or crashing statement
+only drops the seed.
+'''
+
+import json
+import multiprocessing
+import os
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+import duckdb
+
+sys.path.append(str(Path(__file__).parents[1] / 'fuzz_utils'))
+from forked_duckdb import run_in_fork
+from sql_tokenizer import tokenize_sql
+
+MAX_SEEDS_PER_TEST_FILE = 5
+MAX_MODIFICATIONS_PER_OBJECT = 3
+MAX_MATERIALIZED_ROWS = 10
+MATERIALIZE_TIMEOUT_S = 30
+
+QUERY_TYPES = ['select', 'from', 'with', 'values', 'pivot', 'unpivot', 'summarize', 'describe', 'show', 'explain', '(']
+
+# CREATE [OR REPLACE] [TEMP] <object type> [IF NOT EXISTS] <name>
+CREATE_PATTERN = re.compile(
+    r"^\s*create\s+(?:or\s+replace\s+)?(?:(?:temp|temporary|persistent)\s+)?(?:unique\s+)?"
+    r"(table|view|type|macro|function|sequence|schema|index)\s+(?:if\s+not\s+exists\s+)?([\w.\"]+)",
+    flags=re.IGNORECASE,
+)
+# statements that modify an existing object: INSERT INTO t, UPDATE t, ALTER TABLE t, CREATE INDEX i ON t, ...
+MODIFICATION_PATTERN = re.compile(
+    r"^\s*(?:insert\s+(?:or\s+\w+\s+)?into|update|delete\s+from|alter\s+(?:table|view)|truncate|copy"
+    r"|create\s+(?:unique\s+)?index\s+(?:if\s+not\s+exists\s+)?[\w\"]+\s+on)\s+([\w.\"]+)",
+    flags=re.IGNORECASE,
+)
+
+
+# test_files: {name: [sql_statement, ...]} with all statements of a test file (including exempted ones)
+# returns: {seed_name: [sql_statement, ...]}
+def create_schema_aware_seeds(test_files: dict[str, list[str]], duckdb_dir: Path, is_exempted, nr_workers=None):
+    jobs = [(name, statements, duckdb_dir, is_exempted) for name, statements in test_files.items()]
+    seeds = {}
+    # the workers connect to duckdb; use a pool, so the parent process keeps free of duckdb threads
+    with multiprocessing.get_context('fork').Pool(nr_workers or os.cpu_count()) as pool:
+        for name, seeds_per_file in zip(test_files, pool.map(seeds_for_test_file, jobs)):
+            for seed_idx, seed in enumerate(seeds_per_file):
+                seeds[f"{Path(name).stem}_q{seed_idx}{Path(name).suffix}"] = seed
+    print(f"{len(seeds)} schema aware seeds created for {len(test_files)} test files")
+    return seeds
+
+
+def seeds_for_test_file(job) -> list[list[str]]:
+    _, statements, duckdb_dir, is_exempted = job
+    con = duckdb.connect()
+    try:
+        references = [referenced_names(con, statement) for statement in statements]
+    finally:
+        # close the connection before create_seed() forks: forking a process with running duckdb threads is unsafe
+        con.close()
+    seeds = []
+    for query_idx, query in enumerate(statements):
+        if not is_query(query) or is_exempted(query):
+            continue
+        setup_indices = dependencies(query_idx, statements, references)
+        if not setup_indices:
+            # no setup needed: the query is already usable in isolation
+            continue
+        seed = create_seed(query, [statements[idx] for idx in setup_indices], duckdb_dir, is_exempted)
+        if seed and seed not in seeds:
+            seeds.append(seed)
+        if len(seeds) >= MAX_SEEDS_PER_TEST_FILE:
+            break
+    return seeds
+
+
+def is_query(statement: str) -> bool:
+    return any(statement.lower().lstrip().startswith(query_type) for query_type in QUERY_TYPES)
+
+
+# name of the object created or modified by the statement (lower case, without schema and quotes)
+def created_name(statement: str) -> str | None:
+    match = CREATE_PATTERN.match(statement)
+    return normalize_name(match.group(2)) if match else None
+
+
+def modified_name(statement: str) -> str | None:
+    match = MODIFICATION_PATTERN.match(statement)
+    return normalize_name(match.group(1)) if match else None
+
+
+def normalize_name(name: str) -> str:
+    return name.replace('"', '').split('.')[-1].lower()
+
+
+# names of tables, (table) functions and types referenced by the statement
+def referenced_names(con: duckdb.DuckDBPyConnection, statement: str) -> set[str]:
+    try:
+        serialized = json.loads(con.execute("SELECT json_serialize_sql(?)", [statement]).fetchone()[0])
+    except duckdb.Error:
+        serialized = {'error': True}
+    if serialized.get('error'):
+        # not a select statement (or not parsable): use all identifiers
+        return {normalize_name(token) for token in tokenize_sql(statement) if re.fullmatch(r'\w+|"[^"]+"', token)}
+    names = set()
+    collect_names(serialized, names)
+    return names
+
+
+def collect_names(node, names: set[str]):
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key in ('table_name', 'function_name', 'user_type_name') and isinstance(value, str) and value:
+                names.add(value.lower())
+        if node.get('type') == 'UNBOUND_TYPE_INFO' and node.get('name'):
+            names.add(node['name'].lower())
+        for value in node.values():
+            collect_names(value, names)
+    elif isinstance(node, list):
+        for value in node:
+            collect_names(value, names)
+
+
+# indices of the statements (preceding the query) that create or modify the objects the query depends on
+def dependencies(query_idx: int, statements: list[str], references: list[set[str]]) -> list[int]:
+    created_by: dict[str, int] = {}
+    modified_by: dict[str, list[int]] = {}
+    for idx in range(query_idx):
+        name = created_name(statements[idx])
+        if name:
+            # re-creation replaces the earlier definition
+            created_by[name] = idx
+            modified_by[name] = []
+            continue
+        name = modified_name(statements[idx])
+        if name in created_by:
+            modified_by[name].append(idx)
+
+    needed: set[int] = set()
+    to_visit = list(references[query_idx])
+    visited: set[str] = set()
+    while to_visit:
+        name = to_visit.pop()
+        if name in visited or name not in created_by:
+            continue
+        visited.add(name)
+        for idx in [created_by[name]] + modified_by[name][:MAX_MODIFICATIONS_PER_OBJECT]:
+            needed.add(idx)
+            to_visit.extend(references[idx] - {name})
+    return sorted(needed)
+
+
+# setup statements that are exempted (e.g. reading data files) are replaced by the materialized tables
+def create_seed(query: str, setup: list[str], duckdb_dir: Path, is_exempted) -> list[str] | None:
+    if not any(is_exempted(statement) for statement in setup):
+        return setup + [query]
+    materialized_tables = {
+        name
+        for statement in setup
+        if is_exempted(statement)
+        for name in [created_name(statement) or modified_name(statement)]
+        if name
+    }
+    materialized = materialize_tables(setup, materialized_tables, duckdb_dir)
+    if materialized is None:
+        return None
+    remaining_setup = [
+        statement
+        for statement in setup
+        if not is_exempted(statement) and (created_name(statement) or modified_name(statement)) not in materialized_tables
+    ]
+    return materialized + remaining_setup + [query]
+
+
+# executes the setup statements in a forked process; returns CREATE TABLE + INSERT statements that recreate the tables
+# returns None if the setup fails, crashes or times out
+def materialize_tables(setup: list[str], table_names: set[str], duckdb_dir: Path) -> list[str] | None:
+    materialized, _, _, _ = run_in_fork(dump_tables, setup, table_names, duckdb_dir, timeout=MATERIALIZE_TIMEOUT_S)
+    return materialized
+
+
+# runs in the forked process (see materialize_tables())
+def dump_tables(setup: list[str], table_names: set[str], duckdb_dir: Path) -> list[str] | None:
+    with tempfile.TemporaryDirectory() as test_dir:
+        con = duckdb.connect()
+        try:
+            con.execute(f"SET file_search_path = '{duckdb_dir}'")
+            for statement in setup:
+                con.execute(statement.replace('{DATA_DIR}', 'data').replace('__TEST_DIR__', test_dir))
+            materialized = []
+            for table_name in sorted(table_names):
+                columns = con.execute(f'SELECT column_name, column_type FROM (DESCRIBE "{table_name}")').fetchall()
+                column_defs = ', '.join(f'"{column_name}" {column_type}' for column_name, column_type in columns)
+                materialized.append(f'CREATE TABLE "{table_name}"({column_defs});')
+                select_list = ', '.join(f'"{column_name}"::VARCHAR' for column_name, _ in columns)
+                rows = con.execute(f'SELECT {select_list} FROM "{table_name}" LIMIT {MAX_MATERIALIZED_ROWS}').fetchall()
+                if rows:
+                    values = ', '.join('(' + ', '.join(sql_literal(value) for value in row) + ')' for row in rows)
+                    materialized.append(f'INSERT INTO "{table_name}" VALUES {values};')
+            return materialized
+        except duckdb.Error:
+            # e.g. data file not found, or the table is in fact a view
+            return None
+        finally:
+            con.close()
+
+
+def sql_literal(value: str | None) -> str:
+    if value is None:
+        return 'NULL'
+    return "'" + value.replace("'", "''") + "'"
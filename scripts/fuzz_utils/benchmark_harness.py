@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+'''
+This script compares the throughput (exec/s) of fuzz target executables, e.g. two builds of the same fuzz target.
+Every target is fuzzed with afl-fuzz for a fixed time, with the same corpus; the throughput is read from the
+'fuzzer_stats' file of the run. Running under afl-fuzz (instead of timing single executions) includes the effect of the
+fork server, e.g. work that is done before a deferred fork server (__AFL_INIT) starts.
+The targets are benchmarked one after the other, since some targets use fixed file paths (e.g. wal_fuzzer).
+Environment variables:
+    - BENCHMARK_DURATION_S: fuzz time per target (default: 60)
+    - AFL_FUZZ: path to afl-fuzz (default: /AFLplusplus/afl-fuzz)
+Inputs:
+    - corpus directory
+    - one or more paths to fuzz target executables
+Output:
+    - per target: the exec/s and the number of executions, and the speedup relative to the first target
+'''
+
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BENCHMARK_DURATION_S = int(os.environ.get('BENCHMARK_DURATION_S') or 60)
+AFL_FUZZ = os.environ.get('AFL_FUZZ') or '/AFLplusplus/afl-fuzz'
+AFL_ENV = {
+    'AFL_NO_UI': '1',
+    'AFL_SKIP_CPUFREQ': '1',
+    'AFL_I_DONT_CARE_ABOUT_MISSING_CRASHES': '1',
+    'AFL_NO_AFFINITY': '1',
+}
+
+
+def main(argv: list[str]):
+    corpus_dir = Path(argv[1]).expanduser()
+    targets = [Path(target).expanduser().absolute() for target in argv[2:]]
+    if not corpus_dir.is_dir():
+        sys.exit(f"corpus directory not found: {corpus_dir}")
+    for target in targets:
+        if not target.is_file():
+            sys.exit(f"fuzz target not found: {target}")
+
+    results = []
+    for target in targets:
+        print(f"fuzzing {target} for {BENCHMARK_DURATION_S} s ...", flush=True)
+        results.append(benchmark_target(corpus_dir, target))
+
+    # some logging:
+    baseline_execs_per_sec = results[0]['execs_per_sec']
+    print(f"{'target':<50} {'exec/s':>10} {'execs':>10} {'speedup':>8}")
+    for target, stats in zip(targets, results):
+        speedup = stats['execs_per_sec'] / baseline_execs_per_sec if baseline_execs_per_sec else 0
+        print(f"{target.name:<50} {stats['execs_per_sec']:>10.1f} {stats['execs_done']:>10} {speedup:>7.2f}x")
+
+
+# returns the exec/s and the number of executions of a fuzz run
+def benchmark_target(corpus_dir: Path, target: Path) -> dict:
+    with tempfile.TemporaryDirectory() as output_dir:
+        subprocess.run(
+            [AFL_FUZZ, '-V', str(BENCHMARK_DURATION_S), '-i', str(corpus_dir), '-o', output_dir, '-d', '--', str(target)],
+            env={**os.environ, **AFL_ENV},
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+        stats = read_fuzzer_stats(Path(output_dir) / 'default' / 'fuzzer_stats')
+    return {'execs_per_sec': float(stats['execs_per_sec']), 'execs_done': int(stats['execs_done'])}
+
+
+# fuzzer_stats has one 'key : value' pair per line
+def read_fuzzer_stats(fuzzer_stats_file: Path) -> dict:
+    stats = {}
+    for line in fuzzer_stats_file.read_text().splitlines():
+        key, _, value = line.partition(':')
+        stats[key.strip()] = value.strip()
+    return stats
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        sys.exit(
+            """
+            ERROR; call this script with the following arguments:
+              1 - corpus directory
+              2 - path to fuzz target executable
+              3 - (optional) paths to more fuzz target executables, to compare with
+            """
+        )
+    main(sys.argv)
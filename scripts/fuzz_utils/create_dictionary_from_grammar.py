@@ -1,25 +1,115 @@
 #!/usr/bin/env python3
 
-from pathlib import Path
+'''
+Creates the dictionaries for the sql fuzzer:
+    - duckdb_sql.dict: all candidate entries, ranked
+    - duckdb_sql_afl.dict: the top ranked entries, used as afl++ dictionary (-x)
+    - duckdb_sql_keywords.dict: only the grammar keywords, used by create_sql_corpus.py for the keyword casing
+Candidate entries:
+    - quoted keywords from the autocomplete grammar (extension/autocomplete/grammar/statements/*.gram)
+    - function, pragma, type and setting names from the catalog of the duckdb python module
+    - multi-token phrases: sequences of keywords that occur frequently in the sqllogic tests (e.g. 'group by')
+The candidates are ranked by their frequency in the sql of the sqllogic tests. The afl++ dictionary is capped: above 256
+(MAX_DET_EXTRAS) entries, the deterministic stages use a random sample of the entries per test case (the havoc stage
+uses all entries), so rarely used entries would take the place of frequent ones.
+'''
+
 import re
+import sys
+from collections import Counter
+from pathlib import Path
+
+import duckdb
 
+sys.path.append(str(Path(__file__).parents[1] / 'corpus_creation'))
+import sqllogic_utils
+from sql_tokenizer import tokenize_sql
 
-def main():
-    DUCKDB_DIR = Path('~/git/duckdb/').expanduser()
+MAX_DICT_ENTRIES = 256
+MAX_PHRASE_LENGTH = 3
+MIN_PHRASE_COUNT = 20
+
+
+def main(argv: list[str]):
+    DUCKDB_DIR = Path(argv[1] if len(argv) > 1 else '~/git/duckdb/').expanduser()
     FILE_DIR_TO_SCRAPE = DUCKDB_DIR / 'extension/autocomplete/grammar/statements'
+    TEST_DIR = DUCKDB_DIR / 'test'
     SQL_DICT_FILE = Path(__file__).parent / 'duckdb_sql.dict'
+    AFL_DICT_FILE = Path(__file__).parent / 'duckdb_sql_afl.dict'
+    KEY_WORD_FILE = Path(__file__).parent / 'duckdb_sql_keywords.dict'
+    max_entries = int(argv[2]) if len(argv) > 2 else MAX_DICT_ENTRIES
 
     # scrape quoted keywords
     all_gram_files = FILE_DIR_TO_SCRAPE.rglob('*.gram')
     all_key_words: set[str] = set()
     for f in all_gram_files:
         key_words = set(re.findall(r"'(\w+?)'", f.read_text(), flags=re.NOFLAG))
-        all_key_words.update(key_words)
+        all_key_words.update(kw.lower() for kw in key_words)
+
+    # names from the catalog
+    catalog_names = names_from_catalog()
 
-    # create dictionary file
-    entries = [f"\"{entry.lower()}\"" for entry in sorted(all_key_words)]
+    # count tokens and keyword phrases in the sql of the test files
+    token_counts, phrase_counts = count_tokens_in_tests(TEST_DIR, all_key_words)
+    phrases = {phrase for phrase, count in phrase_counts.items() if count >= MIN_PHRASE_COUNT}
+
+    # rank by frequency; on a tie, prefer the grammar keywords
+    candidates = all_key_words | catalog_names | phrases
+    counts = token_counts + phrase_counts
+    ranked = sorted(candidates, key=lambda entry: (-counts[entry], entry not in all_key_words, entry))
+
+    # create dictionary files
+    entries = [f"\"{entry}\"" for entry in ranked]
     SQL_DICT_FILE.write_text("\n".join(entries))
+    AFL_DICT_FILE.write_text("\n".join(entries[:max_entries]))
+    KEY_WORD_FILE.write_text("\n".join(f"\"{kw}\"" for kw in sorted(all_key_words)))
+    print(
+        f"{len(entries)} candidates written to {SQL_DICT_FILE} "
+        f"({len(all_key_words)} keywords, {len(catalog_names)} catalog names, {len(phrases)} phrases)"
+    )
+    print(f"top {min(len(entries), max_entries)} entries written to {AFL_DICT_FILE}")
+    print(f"{len(all_key_words)} keywords written to {KEY_WORD_FILE}")
+
+
+# function, pragma, type and setting names; internal names (e.g. '__internal_...') and operators are skipped
+def names_from_catalog() -> set[str]:
+    con = duckdb.connect()
+    try:
+        names = [name for (name,) in con.execute("SELECT DISTINCT function_name FROM duckdb_functions()").fetchall()]
+        names += [name for (name,) in con.execute("SELECT DISTINCT type_name FROM duckdb_types()").fetchall()]
+        names += [name for (name,) in con.execute("SELECT name FROM duckdb_settings()").fetchall()]
+    finally:
+        con.close()
+    return {name.lower() for name in names if re.fullmatch(r"[a-zA-Z]\w*", name)}
+
+
+# token_counts: occurrences per (lower case) token; phrase_counts: occurrences per sequence of keywords
+def count_tokens_in_tests(test_dir: Path, key_words: set[str]) -> tuple[Counter, Counter]:
+    token_counts = Counter()
+    phrase_counts = Counter()
+    for test_file in test_dir.rglob('*.test'):
+        try:
+            file_content = test_file.read_text()
+        except UnicodeDecodeError:
+            continue
+        for statement in sqllogic_utils.get_sql_statements(file_content):
+            tokens = [token.lower() for token in tokenize_sql(statement)]
+            token_counts.update(tokens)
+            for length in range(2, MAX_PHRASE_LENGTH + 1):
+                for idx in range(len(tokens) - length + 1):
+                    phrase = tokens[idx : idx + length]
+                    if all(token in key_words for token in phrase):
+                        phrase_counts[' '.join(phrase)] += 1
+    return token_counts, phrase_counts
 
 
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) not in [1, 2, 3]:
+        sys.exit(
+            """
+            ERROR; call this script with the following arguments:
+              1 - (optional) path of duckdb repository
+              2 - (optional) maximum number of afl++ dictionary entries (default: 256)
+            """
+        )
+    main(sys.argv)
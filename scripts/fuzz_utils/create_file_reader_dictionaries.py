@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+
+'''
+Creates an afl++ dictionary for the file reader fuzzers (csv, json or parquet).
+Dictionary entries:
+    - csv: delimiters, quote and escape characters, newlines, NULL and boolean tokens, dates, timestamps and
+      format specifiers (dateformat/timestampformat), special numbers, and the most frequent header names of 'duckdb/data/csv'
+    - json: structural tokens, literals, escape sequences, special numbers, and the most frequent key names of 'duckdb/data/json'
+    - parquet: magic bytes, thrift compact protocol field headers for the page types, encodings and compression codecs,
+      and the most frequent byte sequences and strings (e.g. column names, 'created_by') of the footers of the seed files
+Inputs:
+    - file format: 'csv', 'json' or 'parquet'
+    - (optional) path of duckdb repository
+    - (optional) output file; default: corpus/<format>/<format>.dict
+Output:
+    - dictionary file, to be used with afl-fuzz option '-x'
+'''
+
+import json
+import re
+import struct
+import sys
+from collections import Counter
+from pathlib import Path
+
+# afl++ uses max 256 entries (MAX_DET_EXTRAS) in the deterministic stages; max entry length is 128 (MAX_DICT_FILE)
+MAX_DICT_ENTRIES = 256
+MAX_ENTRY_LENGTH = 128
+MAX_SCRAPED_ENTRIES = 64
+MAX_FILE_SIZE = 1_000_000
+
+CSV_TOKENS = [
+    # delimiters, quotes, escapes, newlines
+    ',', ';', '|', '\t', ' ', '"', "'", '\\', '""', '\\"', '\n', '\r\n', '\r', ',,', '","', '\ufeff',
+    # NULL and boolean tokens
+    'NULL', 'null', '\\N', 'NA', 'N/A', 'nan', 'NaN', 'inf', '-inf', 'true', 'false', 'TRUE', 'FALSE', 'T', 'F',
+    # dates, times and format specifiers
+    '2020-01-01', '2020-01-01 12:34:56', '2020-01-01T12:34:56.123456', '2020-01-01 12:34:56+02:00', '12:34:56',
+    '01/02/2020', '02-01-2020', '20200101', 'infinity', '-infinity', 'epoch',
+    '%Y', '%m', '%d', '%H', '%M', '%S', '%f', '%z', '%Z', '%b', '%B', '%y', '%p', '%I', '%j', '%-d', '%-m',
+    '%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%H:%M:%S', '%Y-%m-%d %H:%M:%S',
+    # numbers
+    '0', '-0', '1.5', '-1', '1e10', '1E-10', '0x1F', '1_000', '1,5', '.5', '9223372036854775807',
+    '9223372036854775808', '-9223372036854775808', '340282366920938463463374607431768211456',
+]
+
+JSON_TOKENS = [
+    '{', '}', '[', ']', ':', ',', '"', '{}', '[]', '{"', '":', '","', '"}', '[{', '}]', '},{', '\n', '\r\n',
+    'true', 'false', 'null', 'NaN', 'Infinity', '-Infinity',
+    '\\"', '\\\\', '\\/', '\\b', '\\f', '\\n', '\\r', '\\t', '\\u0000', '\\u00e9', '\\ud83e\\udd86', '\\ud800',
+    '0', '-0', '1.5', '-1', '1e10', '1E-10', '1e400', '9223372036854775807', '18446744073709551616',
+    '"2020-01-01"', '"2020-01-01 12:34:56"', '"12:34:56"', '"2020-01-01T12:34:56.123456Z"',
+]
+
+PARQUET_MAGIC = b'PAR1'
+# thrift compact protocol: field header = (field id delta << 4) | field type; i32 = 5, list = 9; i32 values are zigzag varints
+THRIFT_I32 = 0x05
+THRIFT_LIST = 0x09
+PARQUET_PAGE_TYPES = range(4)  # DATA_PAGE, INDEX_PAGE, DICTIONARY_PAGE, DATA_PAGE_V2
+PARQUET_ENCODINGS = range(10)  # PLAIN, ..., RLE_DICTIONARY, BYTE_STREAM_SPLIT
+PARQUET_CODECS = range(8)  # UNCOMPRESSED, SNAPPY, GZIP, LZO, BROTLI, LZ4, ZSTD, LZ4_RAW
+
+
+def main(argv: list[str]):
+    file_format = argv[1]
+    duckdb_dir = Path(argv[2] if len(argv) > 2 else '~/git/duckdb/').expanduser()
+    dict_file = (
+        Path(argv[3]).expanduser()
+        if len(argv) > 3
+        else Path(__file__).parents[2] / 'corpus' / file_format / f"{file_format}.dict"
+    )
+
+    match file_format:
+        case 'csv':
+            tokens = [token.encode() for token in CSV_TOKENS] + csv_header_names(duckdb_dir / 'data/csv')
+        case 'json':
+            tokens = [token.encode() for token in JSON_TOKENS] + json_key_names(duckdb_dir / 'data/json')
+        case 'parquet':
+            tokens = parquet_thrift_tokens() + parquet_footer_tokens(duckdb_dir / 'data/parquet-testing')
+        case _:
+            raise ValueError(f"not supported: {file_format}")
+
+    # remove duplicates, keep order
+    tokens = [token for token in dict.fromkeys(tokens) if 0 < len(token) <= MAX_ENTRY_LENGTH][:MAX_DICT_ENTRIES]
+    dict_file.parent.mkdir(parents=True, exist_ok=True)
+    dict_file.write_text("\n".join(dict_entry(token) for token in tokens))
+    print(f"{len(tokens)} dictionary entries written to {dict_file}")
+
+
+# afl++ dictionary syntax: printable characters, except '"' and '\', are written as is; other bytes as \xNN
+def dict_entry(token: bytes) -> str:
+    escaped = ''.join(chr(b) if 0x20 <= b < 0x7F and b not in b'"\\' else f"\\x{b:02x}" for b in token)
+    return f"\"{escaped}\""
+
+
+def data_files(data_dir: Path, suffixes: list[str]) -> list[Path]:
+    return sorted(
+        f for f in data_dir.rglob('*') if f.is_file() and f.suffix in suffixes and f.stat().st_size <= MAX_FILE_SIZE
+    )
+
+
+def csv_header_names(csv_dir: Path) -> list[bytes]:
+    header_names = Counter()
+    for csv_file in data_files(csv_dir, ['.csv', '.tsv', '.txt']):
+        with csv_file.open('rb') as f:
+            header = f.readline().strip()
+        header_names.update(name.strip(b'"\' ') for name in re.split(rb"[,;|\t]", header))
+    return [name for name, _ in header_names.most_common(MAX_SCRAPED_ENTRIES) if re.fullmatch(rb"\w+", name)]
+
+
+def json_key_names(json_dir: Path) -> list[bytes]:
+    key_names = Counter()
+    for json_file in data_files(json_dir, ['.json', '.jsonl', '.ndjson']):
+        text = json_file.read_text(errors='ignore')
+        try:
+            documents = [json.loads(text)]
+        except json.JSONDecodeError:
+            # newline-delimited json
+            documents = []
+            for line in text.splitlines():
+                try:
+                    documents.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        for document in documents:
+            count_keys(document, key_names)
+    return [f'"{key}":'.encode() for key, _ in key_names.most_common(MAX_SCRAPED_ENTRIES)]
+
+
+def count_keys(node, key_names: Counter):
+    if isinstance(node, dict):
+        key_names.update(node.keys())
+        for value in node.values():
+            count_keys(value, key_names)
+    elif isinstance(node, list):
+        for value in node:
+            count_keys(value, key_names)
+
+
+# field headers with a value, for the page type, encodings (list of 1) and compression codec fields
+def parquet_thrift_tokens() -> list[bytes]:
+    tokens = [PARQUET_MAGIC]
+    tokens += [bytes([(1 << 4) | THRIFT_I32, zigzag(page_type)]) for page_type in PARQUET_PAGE_TYPES]
+    tokens += [bytes([(1 << 4) | THRIFT_LIST, (1 << 4) | THRIFT_I32, zigzag(enc)]) for enc in PARQUET_ENCODINGS]
+    tokens += [bytes([(1 << 4) | THRIFT_I32, zigzag(codec)]) for codec in PARQUET_CODECS]
+    return tokens
+
+
+def zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 31)
+
+
+# footer: <file meta data (thrift)> <4 bytes: length of file meta data> 'PAR1'
+def parquet_footer_tokens(parquet_dir: Path) -> list[bytes]:
+    byte_sequences = Counter()
+    strings = Counter()
+    for parquet_file in data_files(parquet_dir, ['.parquet']):
+        content = parquet_file.read_bytes()
+        if len(content) < 12 or not content.startswith(PARQUET_MAGIC) or not content.endswith(PARQUET_MAGIC):
+            continue
+        footer_length = struct.unpack('<I', content[-8:-4])[0]
+        if footer_length > len(content) - 12:
+            continue
+        footer = content[-8 - footer_length : -8]
+        byte_sequences.update(set(footer[idx : idx + 3] for idx in range(len(footer) - 2)))
+        strings.update(set(re.findall(rb"[\x20-\x7e]{4,}", footer)))
+    return [seq for seq, _ in byte_sequences.most_common(MAX_SCRAPED_ENTRIES)] + [
+        string for string, _ in strings.most_common(MAX_SCRAPED_ENTRIES)
+    ]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in [2, 3, 4]:
+        sys.exit(
+            """
+            ERROR; call this script with the following arguments:
+              1 - file format: 'csv', 'json' or 'parquet'
+              2 - (optional) path of duckdb repository
+              3 - (optional) output file (default: corpus/<format>/<format>.dict)
+            """
+        )
+    main(sys.argv)
@@ -0,0 +1,75 @@
+'''
+Generic delta debugging (ddmin), used to shrink fuzz inputs while an 'is_interesting' oracle keeps returning True.
+See: Zeller & Hildebrandt, "Simplifying and Isolating Failure-Inducing Input"
+'''
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Callable, Sequence
+
+from sql_tokenizer import join_statements, split_sql_statements
+
+
+# nr_workers: number of candidates that are tested concurrently (in threads, so is_interesting should release the GIL,
+#   e.g. by running a subprocess); of a batch of candidates, the first interesting one (in order) is kept
+# deadline: time.monotonic() value after which no more candidates are tested; the smallest interesting input so far is returned
+def ddmin(items: Sequence, is_interesting: Callable[[list], bool], nr_workers=1, deadline=None) -> list:
+    # work on indices, so the items themselves don't need to be hashable
+    indices = list(range(len(items)))
+    tested: set[tuple[int, ...]] = set()
+    nr_chunks = 2
+    with ThreadPoolExecutor(nr_workers) if nr_workers > 1 else nullcontext() as executor:
+        test = executor.map if executor else map
+        while len(indices) >= 2 and not is_past(deadline):
+            chunk_size = -(-len(indices) // nr_chunks)  # ceil division
+            chunks = [indices[i : i + chunk_size] for i in range(0, len(indices), chunk_size)]
+            # try to remove one chunk at a time (test the complements)
+            reduced = False
+            for batch in complement_batches(chunks, tested, nr_workers):
+                if is_past(deadline):
+                    break
+                tested.update(batch)
+                results = list(test(is_interesting, [[items[idx] for idx in complement] for complement in batch]))
+                if any(results):
+                    indices = list(batch[results.index(True)])
+                    nr_chunks = max(nr_chunks - 1, 2)
+                    reduced = True
+                    break
+            if not reduced:
+                if nr_chunks >= len(indices):
+                    break
+                nr_chunks = min(nr_chunks * 2, len(indices))
+    return [items[idx] for idx in indices]
+
+
+# the untested complements of the chunks, in batches of (at most) batch_size
+def complement_batches(chunks: list[list[int]], tested: set[tuple[int, ...]], batch_size: int):
+    batch = []
+    for chunk_idx in range(len(chunks)):
+        complement = tuple(idx for i, chunk in enumerate(chunks) if i != chunk_idx for idx in chunk)
+        if complement and complement not in tested:
+            batch.append(complement)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def is_past(deadline) -> bool:
+    return deadline is not None and time.monotonic() > deadline
+
+
+# minimize sql: first remove complete statements, then remove tokens per statement
+def minimize_sql(sql: str, is_interesting: Callable[[str], bool], nr_workers=1, deadline=None) -> str:
+    statements = split_sql_statements(sql)
+    statements = ddmin(statements, lambda candidate: is_interesting(join_statements(candidate)), nr_workers, deadline)
+    for stmnt_idx in range(len(statements)):
+
+        def is_interesting_tokens(tokens: list[str]) -> bool:
+            candidate = statements[:stmnt_idx] + [tokens] + statements[stmnt_idx + 1 :]
+            return is_interesting(join_statements(candidate))
+
+        statements[stmnt_idx] = ddmin(statements[stmnt_idx], is_interesting_tokens, nr_workers, deadline)
+    return join_statements(statements)
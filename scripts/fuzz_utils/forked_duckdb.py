@@ -0,0 +1,110 @@
+'''
+Run the duckdb python module in a forked child process, so a crash or hang of duckdb does not take down the caller.
+The duckdb module is imported once (by the parent); every forked child creates its own in-memory database.
+Note: the parent should not open a duckdb connection itself, since forking a process with running duckdb threads is unsafe.
+'''
+
+import os
+import pickle
+import selectors
+import signal
+import time
+
+import duckdb
+
+
+# runs function(*args) in a forked child
+# returns: (result, stderr, returncode, timed_out); returncode is negative when the child was killed by a signal
+def run_in_fork(function, *args, timeout=10) -> tuple[object, str, int, bool]:
+    result_read_fd, result_write_fd = os.pipe()
+    stderr_read_fd, stderr_write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # child process; it must never return into the code of the caller
+        exit_code = 1
+        try:
+            os.close(result_read_fd)
+            os.close(stderr_read_fd)
+            os.dup2(stderr_write_fd, 2)
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, 1)
+            try:
+                result = function(*args)
+                exit_code = 0
+            except Exception as e:
+                result = None
+                os.write(2, f"{type(e).__name__}: {e}".encode(errors='backslashreplace'))
+            with os.fdopen(result_write_fd, 'wb') as result_fd:
+                pickle.dump(result, result_fd)
+        except BaseException as e:
+            # e.g. an unpicklable result, a broken pipe or SystemExit
+            exit_code = 1
+            os.write(2, f"{type(e).__name__}: {e}".encode(errors='backslashreplace'))
+        finally:
+            os._exit(exit_code)
+
+    # parent process
+    os.close(result_write_fd)
+    os.close(stderr_write_fd)
+    received = {result_read_fd: b'', stderr_read_fd: b''}
+    timed_out = False
+    deadline = time.monotonic() + timeout
+    with selectors.DefaultSelector() as selector:
+        selector.register(result_read_fd, selectors.EVENT_READ)
+        selector.register(stderr_read_fd, selectors.EVENT_READ)
+        while selector.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+                os.kill(pid, signal.SIGKILL)
+                break
+            for key, _ in selector.select(remaining):
+                data = os.read(key.fd, 65536)
+                if data:
+                    received[key.fd] += data
+                else:
+                    selector.unregister(key.fd)
+    os.close(result_read_fd)
+    os.close(stderr_read_fd)
+    _, status = os.waitpid(pid, 0)
+    returncode = os.waitstatus_to_exitcode(status)
+
+    result = None
+    if not timed_out and returncode == 0:
+        result = pickle.loads(received[result_read_fd])
+    stderr = received[stderr_read_fd].decode('utf8', 'ignore').strip()
+    return (result, stderr, returncode, timed_out)
+
+
+# outcome per statement: 'ok', 'parser', 'binder', 'catalog', 'internal', or 'error' (any other error)
+def classify_exception(exception: Exception) -> str:
+    match exception:
+        case duckdb.ParserException():
+            return 'parser'
+        case duckdb.BinderException():
+            return 'binder'
+        case duckdb.CatalogException():
+            return 'catalog'
+        case duckdb.InternalException():
+            return 'internal'
+        case _ if 'INTERNAL' in str(exception):
+            return 'internal'
+        case _:
+            return 'error'
+
+
+# executes the statements one by one in a fresh in-memory database (call this function via run_in_fork)
+# after an internal error the database is invalidated, so the remaining statements are skipped
+def execute_statements(statements: list[str]) -> list[tuple[str, str]]:
+    outcomes = []
+    con = duckdb.connect(':memory:')
+    for statement in statements:
+        try:
+            con.execute(statement).fetchall()
+            outcomes.append(('ok', ''))
+        except Exception as e:
+            outcomes.append((classify_exception(e), str(e)))
+            if outcomes[-1][0] == 'internal':
+                break
+    con.close()
+    return outcomes
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+
+'''
+This script runs a fuzz campaign for one fuzz target on multiple cores: one main afl-fuzz instance (-M) and
+secondary instances (-S) that share the same sync (output) directory.
+It is called with the arguments of a single afl-fuzz run (as used by the fuzz_* targets in the Makefile); the options
+are passed to every instance, with:
+    - a power schedule (-p) per instance, round robin from FUZZ_POWER_SCHEDULES
+    - if the fuzz target also exists in afl++ persistent mode (executable with suffix '_persistent', see
+      src/file_fuzzer_input.hpp), a share of the secondary instances (PERSISTENT_SHARE) fuzzes the other variant; the
+      main instance fuzzes the given fuzz target
+The main instance is named 'default', so the reproduction scripts find the results at the usual place. After the
+campaign, the crashes and hangs of the secondary instances are copied to 'default/crashes' and 'default/hangs', with
+suffix ',sync:<instance name>'.
+The instances stop after the fuzz time (-V); the campaign is stopped after the fuzz time plus STOP_GRACE_S, or on
+SIGINT / SIGTERM. Then all instances get SIGINT (afl-fuzz stops cleanly and writes its stats), and are killed if they
+are still running after STOP_GRACE_S.
+The output of every instance is written to '<sync dir>_logs/<instance name>.log'.
+Note:
+    - fuzz targets that use fixed file paths (duckdb_file_fuzzer, wal_fuzzer) can't be fuzzed by multiple instances
+Environment variables:
+    - FUZZ_POWER_SCHEDULES: comma separated afl++ power schedules (default: fast,explore,coe,lin,quad,exploit,rare)
+    - PERSISTENT_SHARE: share of the secondary instances that fuzz the other (persistent or not) variant (default: 0.5)
+    - AFL_FUZZ: path to afl-fuzz (default: /AFLplusplus/afl-fuzz)
+Inputs:
+    - number of afl-fuzz instances (main + secondary)
+    - the afl-fuzz arguments: options (at least -i and -o), '--' and the fuzz target command
+Output:
+    - the afl-fuzz output of all instances in the sync directory (-o), with all crashes and hangs in 'default'
+'''
+
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+FUZZ_POWER_SCHEDULES = (os.environ.get('FUZZ_POWER_SCHEDULES') or 'fast,explore,coe,lin,quad,exploit,rare').split(',')
+PERSISTENT_SHARE = float(os.environ.get('PERSISTENT_SHARE') or 0.5)
+AFL_FUZZ = os.environ.get('AFL_FUZZ') or '/AFLplusplus/afl-fuzz'
+PERSISTENT_SUFFIX = '_persistent'
+MAIN_INSTANCE = 'default'
+STOP_GRACE_S = 60
+STATUS_INTERVAL_S = 300
+# the instances run in the background; there is no terminal for the afl-fuzz UI
+AFL_ENV = {'AFL_NO_UI': '1'}
+
+stop_requested = False
+
+
+def main(argv: list[str]):
+    nr_instances = int(argv[1])
+    afl_options, target_command = split_afl_arguments(argv[2:])
+    if '-i' not in afl_options or '-o' not in afl_options:
+        sys.exit("afl-fuzz options -i and -o are required")
+    if '-M' in afl_options or '-S' in afl_options:
+        sys.exit("afl-fuzz options -M and -S are set per instance")
+    sync_dir = Path(afl_options[afl_options.index('-o') + 1])
+    fuzz_time_s = int(afl_options[afl_options.index('-V') + 1]) if '-V' in afl_options else None
+    log_dir = sync_dir.parent / f"{sync_dir.name}_logs"
+    sync_dir.mkdir(parents=True, exist_ok=True)
+    log_dir.mkdir(parents=True, exist_ok=True)
+
+    instances = instance_settings(nr_instances, target_command)
+    for instance_name, _, power_schedule, command in instances:
+        print(f"{instance_name}: -p {power_schedule} {' '.join(command)}")
+
+    for sig in [signal.SIGINT, signal.SIGTERM]:
+        signal.signal(sig, request_stop)
+    processes = {}
+    try:
+        for instance_name, role, power_schedule, command in instances:
+            processes[instance_name] = start_instance(instance_name, role, power_schedule, command, afl_options, log_dir)
+            if instance_name == MAIN_INSTANCE:
+                # the main instance creates the sync directory lay-out; give it a head start
+                time.sleep(1)
+        wait_for_instances(processes, fuzz_time_s)
+    finally:
+        stop_instances(processes)
+
+    nr_crashes, nr_hangs = collect_results(sync_dir, [instance_name for instance_name, *_ in instances])
+    print(f"campaign done; {nr_crashes} crashes and {nr_hangs} hangs in {sync_dir / MAIN_INSTANCE}")
+    print(f"instance logs: {log_dir}")
+    if processes[MAIN_INSTANCE].returncode not in [0, -signal.SIGINT, -signal.SIGKILL]:
+        sys.exit(f"main instance failed (exit code {processes[MAIN_INSTANCE].returncode}), see {log_dir}")
+
+
+# splits the afl-fuzz arguments into the options and the fuzz target command
+def split_afl_arguments(arguments: list[str]) -> tuple[list[str], list[str]]:
+    if '--' not in arguments:
+        sys.exit("expected '--' followed by the fuzz target command")
+    separator_idx = arguments.index('--')
+    return (arguments[:separator_idx], arguments[separator_idx + 1 :])
+
+
+# returns (instance name, role ('-M' or '-S'), power schedule, fuzz target command) per instance
+def instance_settings(nr_instances: int, target_command: list[str]) -> list[tuple[str, str, str, list[str]]]:
+    target = target_command[0]
+    if target.endswith(PERSISTENT_SUFFIX):
+        other_variant = target.removesuffix(PERSISTENT_SUFFIX)
+    else:
+        other_variant = target + PERSISTENT_SUFFIX
+    share = PERSISTENT_SHARE if Path(other_variant).is_file() else 0
+    instances = [(MAIN_INSTANCE, '-M', FUZZ_POWER_SCHEDULES[0], target_command)]
+    for idx in range(1, nr_instances):
+        # spread the instances with the other variant evenly over the secondary instances
+        use_other_variant = int(idx * share) > int((idx - 1) * share)
+        command = [other_variant] + target_command[1:] if use_other_variant else target_command
+        instances.append((f"secondary_{idx:02d}", '-S', FUZZ_POWER_SCHEDULES[idx % len(FUZZ_POWER_SCHEDULES)], command))
+    return instances
+
+
+def start_instance(
+    instance_name: str, role: str, power_schedule: str, command: list[str], afl_options: list[str], log_dir: Path
+) -> subprocess.Popen:
+    env = {**os.environ, **AFL_ENV}
+    if role == '-M':
+        # sync the findings of the secondary instances once more before the main instance stops
+        env['AFL_FINAL_SYNC'] = '1'
+    with (log_dir / f"{instance_name}.log").open('wb') as log_file:
+        # a new session: a SIGINT of the terminal only reaches this script, which stops the instances in order
+        return subprocess.Popen(
+            [AFL_FUZZ, role, instance_name, '-p', power_schedule, *afl_options, '--', *command],
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=log_file,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+
+
+def request_stop(signum, frame):
+    global stop_requested
+    stop_requested = True
+    print(f"received {signal.Signals(signum).name}; stopping the campaign ...", flush=True)
+
+
+# waits until all instances are done, the campaign time is over, a stop is requested, or the main instance fails
+def wait_for_instances(processes: dict[str, subprocess.Popen], fuzz_time_s: int | None):
+    start = time.monotonic()
+    deadline = start + fuzz_time_s + STOP_GRACE_S if fuzz_time_s is not None else None
+    next_status = start + STATUS_INTERVAL_S
+    while not stop_requested:
+        if all(process.poll() is not None for process in processes.values()):
+            return
+        if processes[MAIN_INSTANCE].poll() not in [None, 0]:
+            print("main instance stopped unexpectedly; stopping the campaign ...", flush=True)
+            return
+        if deadline is not None and time.monotonic() > deadline:
+            print("campaign time is over; stopping the campaign ...", flush=True)
+            return
+        if time.monotonic() > next_status:
+            nr_running = sum(process.poll() is None for process in processes.values())
+            print(f"{int(time.monotonic() - start)} s: {nr_running} of {len(processes)} instances running", flush=True)
+            next_status += STATUS_INTERVAL_S
+        time.sleep(1)
+
+
+# SIGINT to all running instances; SIGKILL to instances that don't stop within STOP_GRACE_S
+def stop_instances(processes: dict[str, subprocess.Popen]):
+    for process in processes.values():
+        if process.poll() is None:
+            process.send_signal(signal.SIGINT)
+    deadline = time.monotonic() + STOP_GRACE_S
+    for instance_name, process in processes.items():
+        try:
+            process.wait(timeout=max(0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            print(f"{instance_name} did not stop; killing it", flush=True)
+            process.kill()
+            process.wait()
+
+
+# copies the crashes and hangs of the secondary instances to the main instance; returns the total nr of crashes and hangs
+def collect_results(sync_dir: Path, instance_names: list[str]) -> tuple[int, int]:
+    totals = []
+    for result_type in ['crashes', 'hangs']:
+        main_result_dir = sync_dir / MAIN_INSTANCE / result_type
+        main_result_dir.mkdir(parents=True, exist_ok=True)
+        for instance_name in instance_names:
+            result_dir = sync_dir / instance_name / result_type
+            if instance_name == MAIN_INSTANCE or not result_dir.is_dir():
+                continue
+            for result_file in result_dir.iterdir():
+                if result_file.name != 'README.txt':
+                    shutil.copy2(result_file, main_result_dir / f"{result_file.name},sync:{instance_name}")
+        totals.append(sum(1 for result_file in main_result_dir.iterdir() if result_file.name != 'README.txt'))
+    return (totals[0], totals[1])
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 5:
+        sys.exit(
+            """
+            ERROR; call this script with the following arguments:
+              1 - number of afl-fuzz instances (1 main, the others secondary)
+              2 - afl-fuzz options (at least -i <corpus dir> and -o <sync dir>), followed by '--' and the fuzz target command
+            """
+        )
+    main(sys.argv)
@@ -0,0 +1,52 @@
+import re
+
+# crude sql tokenizer, only used to split and shrink sql inputs (e.g. for minimization)
+# - unterminated strings / comments are consumed up to the end of the input
+# - anything that is not recognized becomes a single-character token
+TOKEN_PATTERN = re.compile(
+    r"""
+    [eE]'(?:[^'\\]|\\.|'')*'?          # string literal with backslash escapes (E'...')
+    | '(?:[^']|'')*'?                  # string literal
+    | "(?:[^"]|"")*"?                  # quoted identifier
+    | \$(?P<tag>\w*)\$.*?(?:\$(?P=tag)\$|\Z)   # dollar quoted string
+    | --[^\n]*                         # line comment
+    | /\*.*?(?:\*/|\Z)                 # block comment
+    | (?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?    # number
+    | \w+                              # keyword / identifier
+    | ::|<=|>=|<>|!=|==|\|\||->>|->|=>|:=|\*\*|<<|>>
+    | \S                               # any other character
+    """,
+    flags=re.VERBOSE | re.DOTALL,
+)
+
+
+def tokenize_sql(sql: str) -> list[str]:
+    return [match.group(0) for match in TOKEN_PATTERN.finditer(sql)]
+
+
+# a line comment ends at the end of the line; the next token starts on a new line
+def join_tokens(tokens: list[str]) -> str:
+    joined = ''
+    for idx, token in enumerate(tokens):
+        if idx > 0:
+            joined += '\n' if tokens[idx - 1].startswith('--') else ' '
+        joined += token
+    return joined
+
+
+# split on top-level semicolons; every statement keeps its closing semicolon (if present)
+def split_sql_statements(sql: str) -> list[list[str]]:
+    statements = []
+    current: list[str] = []
+    for token in tokenize_sql(sql):
+        current.append(token)
+        if token == ';':
+            statements.append(current)
+            current = []
+    if current:
+        statements.append(current)
+    return statements
+
+
+def join_statements(statements: list[list[str]]) -> str:
+    return '\n'.join(join_tokens(statement) for statement in statements)
@@ -0,0 +1,129 @@
+'''
+Bucketing of reproduced crashes: crashes with the same fingerprint are considered the same bug.
+The fingerprint is built from the crash class (signal, sanitizer error type, internal error, timeout or resource
+blowup) and the top frames of the stack trace, with addresses, offsets, arguments, template arguments, file paths and
+exception/sanitizer/libc frames removed; mangled names (symbols that could not be demangled) are decoded first.
+Without a stack trace (e.g. a hang, or a build without symbols), the exception message
+with the numbers stripped is used instead.
+'''
+
+import hashlib
+import json
+import re
+from pathlib import Path
+
+import fuzzer_helper
+
+NR_FRAMES = 5
+DEFAULT_BUCKET_CAPACITY = 1
+
+# frames that are part of the error handling, not of the bug
+IGNORED_FRAME_PATTERN = re.compile(
+    r"^(?:duckdb::(?:\w*Exception|StackTrace|ErrorData|ErrorManager)\b|__asan|__sanitizer|__interceptor|__ubsan|__lsan"
+    r"|std::|__gnu_cxx::|__cxa_|_Unwind_"
+    r"|abort$|raise$|gsignal$|__GI_|__libc_|__pthread_kill|pthread_kill|_start$|start_thread$|clone\d*$|main$)"
+)
+
+
+class CrashBuckets:
+    def __init__(self, capacity=DEFAULT_BUCKET_CAPACITY, nr_frames=NR_FRAMES):
+        self.capacity = capacity
+        self.nr_frames = nr_frames
+        # fingerprint -> list of (input, payload); the first input is the representative of the bucket
+        self.buckets: dict[str, list[tuple[str, tuple]]] = {}
+        self.nr_rejected = 0
+
+    # returns False (and does not store the input) if the bucket of the crash is already full
+    def add(self, input_name: str, exception_msg: str, stacktrace: str, payload: tuple) -> bool:
+        bucket = self.buckets.setdefault(fingerprint(exception_msg, stacktrace, self.nr_frames), [])
+        if len(bucket) >= self.capacity:
+            self.nr_rejected += 1
+            return False
+        bucket.append((input_name, payload))
+        return True
+
+    # fingerprint -> payload of the representative input
+    def representatives(self) -> dict[str, tuple]:
+        return {bucket_fingerprint: bucket[0][1] for bucket_fingerprint, bucket in self.buckets.items()}
+
+    # index: fingerprint -> input names (representative first)
+    def save_index(self, index_file: Path):
+        index = {bucket_fingerprint: [name for name, _ in bucket] for bucket_fingerprint, bucket in self.buckets.items()}
+        index_file.write_text(json.dumps(index, indent=4))
+
+    def print_summary(self):
+        nr_inputs = sum(len(bucket) for bucket in self.buckets.values()) + self.nr_rejected
+        print(f"{nr_inputs} reproducible inputs in {len(self.buckets)} buckets")
+
+
+def fingerprint(exception_msg: str, stacktrace: str, nr_frames=NR_FRAMES) -> str:
+    frames = normalized_frames(stacktrace)[:nr_frames]
+    if frames:
+        signature = [crash_class(exception_msg)] + frames
+    else:
+        # ignore numbers in the message (only keep different line numbers from assertion errors)
+        signature = [crash_class(exception_msg), re.sub(r'(?<!line )\b\d+\b', '', exception_msg)]
+    return hashlib.sha1("\n".join(signature).encode(errors='backslashreplace')).hexdigest()[:16]
+
+
+# e.g. 'SIGSEGV', 'SIGABRT AddressSanitizer:heap-buffer-overflow', 'internal', 'timeout', 'resource blowup'
+def crash_class(exception_msg: str) -> str:
+    parts = []
+    signal_match = re.match(r"(SIG[A-Z]+):", exception_msg)
+    if signal_match:
+        parts.append(signal_match.group(1))
+    sanitizer_match = re.search(r"(\w+Sanitizer):? ([\w-]+)", exception_msg)
+    if sanitizer_match:
+        parts.append(f"{sanitizer_match.group(1)}:{sanitizer_match.group(2)}")
+    elif 'runtime error' in exception_msg:
+        parts.append('runtime error')
+    elif 'INTERNAL' in exception_msg:
+        parts.append('internal')
+    elif re.search(r"timed out after [\d.]+ s", exception_msg):
+        parts.append('timeout')
+    elif 'resource blowup' in exception_msg:
+        parts.append('resource blowup')
+    return ' '.join(parts) or 'error'
+
+
+def normalized_frames(stacktrace: str) -> list[str]:
+    frames = []
+    for line in fuzzer_helper.sanitize_stacktrace(stacktrace).split('\n'):
+        frame = normalize_frame(line)
+        if frame and not IGNORED_FRAME_PATTERN.match(frame):
+            frames.append(frame)
+    return frames
+
+
+# function name of a stack frame, or None if the line is not a frame
+def normalize_frame(line: str) -> str | None:
+    line = line.strip()
+    # asan: '#3  in duckdb::Vector::Reference(duckdb::Vector&) /duckdb/src/common/types/vector.cpp:123:4'
+    line = re.sub(r"^#?\d+\s+", '', line)
+    line = re.sub(r"^in\s+", '', line)
+    line = re.sub(r"\s+(?:\(?/|\(\+|\+ ?\d+|\(BuildId).*$", '', line)
+    # remove template arguments, then the argument list
+    while re.search(r"<[^<>]*>", line):
+        line = re.sub(r"<[^<>]*>", '', line)
+    line = re.sub(r"\(.*$", '', line).strip()
+    if line.startswith('_Z'):
+        line = demangle_name(line)
+    if not re.fullmatch(r"[A-Za-z_~][\w:~]*", line):
+        return None
+    return line
+
+
+# symbols that could not be demangled, e.g. '_ZNK6duckdb9ErrorData8ToStringB5cxx11Ev' -> 'duckdb::ErrorData::ToString':
+# only the names of the (nested) name are decoded, so the frame is normalized like the demangled frame
+def demangle_name(symbol: str) -> str:
+    prefix_match = re.match(r"_Z(N[rVKO]*)?(St)?", symbol)
+    names = ['std'] if prefix_match.group(2) else []
+    pos = prefix_match.end()
+    while (length_match := re.match(r"\d+", symbol[pos:])) is not None:
+        name_start = pos + length_match.end()
+        pos = name_start + int(length_match.group())
+        names.append(symbol[name_start:pos])
+        if not prefix_match.group(1):
+            # not a nested name: a single name
+            break
+    return '::'.join(names) or symbol
@@ -1,11 +1,21 @@
 import os
 import re
+import resource
 import signal
+import statistics
 import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import github_helper
 
+sys.path.append(str(Path(__file__).parents[1] / 'fuzz_utils'))
+from sql_tokenizer import tokenize_sql
+
 # functions borrowed from duckdb/duckdb_sqlsmith -> fuzzer_helper.py
 
 fuzzer_desc = '''Issue found by ${FUZZER} on git commit hash [${SHORT_HASH}](https://github.com/duckdb/duckdb/commit/${FULL_HASH}) using seed ${SEED}.
@@ -32,6 +42,47 @@ trace_header = '''
 footer = '''
 ```'''
 
+# reproduction settings; the number of concurrent duckdb processes can be set with env variable 'NR_REPRODUCTION_WORKERS'
+REPRODUCTION_TIMEOUT_S = 300
+NR_REPRODUCTION_WORKERS = int(os.environ.get('NR_REPRODUCTION_WORKERS') or os.cpu_count())
+CANCEL_POLL_INTERVAL_S = 1
+# number of inputs per duckdb process in batched mode (env variable 'REPRODUCTION_BATCH_SIZE'; 1 disables batching)
+REPRODUCTION_BATCH_SIZE = int(os.environ.get('REPRODUCTION_BATCH_SIZE') or 32)
+
+# hang reproduction: the timeout is derived from the exec time of a trivial statement (per duckdb cli build),
+# unless env variable 'HANG_TIMEOUT_S' is set. A hang is confirmed with the long timeout 'HANG_CONFIRMATION_TIMEOUT_S'
+# (default: REPRODUCTION_TIMEOUT_S; 0 disables the confirmation)
+HANG_TIMEOUT_S = float(os.environ['HANG_TIMEOUT_S']) if os.environ.get('HANG_TIMEOUT_S') else None
+HANG_TIMEOUT_FACTOR = 200
+MIN_HANG_TIMEOUT_S = 10
+NR_CALIBRATION_RUNS = 5
+CALIBRATION_SQL = b"SELECT 42;"
+HANG_CONFIRMATION_TIMEOUT_S = float(os.environ.get('HANG_CONFIRMATION_TIMEOUT_S') or REPRODUCTION_TIMEOUT_S)
+_hang_timeouts: dict[tuple[str, bytes], float] = {}
+# held during the calibration: concurrent calibrations (e.g. from a thread pool) would inflate the baseline
+_hang_timeouts_lock = threading.Lock()
+
+# resource accounting: peak rss, cpu time and wall time are measured for every duckdb process. A run without error that
+# exceeds 'RESOURCE_BLOWUP_RSS_MB' or 'RESOURCE_BLOWUP_CPU_S' (env variables) is reported as a resource blowup.
+# Optional caps (env variables): 'REPRODUCTION_RLIMIT_AS_MB' (address space; not usable for asan builds) and
+# 'REPRODUCTION_MEMORY_LIMIT' (duckdb setting memory_limit, e.g. '4GB')
+RESOURCE_BLOWUP_RSS_MB = float(os.environ.get('RESOURCE_BLOWUP_RSS_MB') or 4096)
+RESOURCE_BLOWUP_CPU_S = float(os.environ.get('RESOURCE_BLOWUP_CPU_S') or 60)
+REPRODUCTION_RLIMIT_AS_MB = int(os.environ['REPRODUCTION_RLIMIT_AS_MB']) if os.environ.get('REPRODUCTION_RLIMIT_AS_MB') else None
+REPRODUCTION_MEMORY_LIMIT = os.environ.get('REPRODUCTION_MEMORY_LIMIT')
+# resource usage of the last run per (duckdb cli, sql statement), e.g. to be recorded in the result store;
+# keyed by duckdb cli too: the same statements can be run with several builds at the same time (reproduction_matrix).
+# The inputs of a batch without errors get the usage of the whole batch, with 'batch_size' > 1: an upper bound of the
+# peak rss and the cpu time of each input
+resource_usages: dict[tuple[str, bytes], dict | None] = {}
+
+# inputs that can't be safely concatenated with other inputs: cli dot-commands, or switching databases
+BATCH_UNSAFE_PATTERN = re.compile(r"^\s*\.|\b(?:attach|detach|use)\b", flags=re.IGNORECASE | re.MULTILINE)
+# unterminated string, quoted identifier, dollar quoted string or block comment (would swallow the next inputs)
+UNTERMINATED_TOKEN_PATTERN = re.compile(
+    r"'(?:[^']|'')*|\"(?:[^\"]|\"\")*|\$(\w*)\$(?:(?!\$\1\$).)*|/\*(?:(?!\*/).)*", flags=re.DOTALL
+)
+
 
 def file_issue(title, sql_statement, exception_msg, stacktrace, fuzzer, seed, hash):
     # issue is new, file it
@@ -90,68 +141,307 @@ def run_command(command):
 
 
 def print_std_error(duckdb_cli, sql_statement_bytes, stderr):
-    print("\n==== duckdb_cli: ===")
-    print(duckdb_cli)
-    print("\n==== sql_statement: ===")
-    print(sql_statement_bytes.decode(errors='backslashreplace'))
-    print("\n==== STD error: ===")
-    print(stderr)
-    print("==========", flush=True)
+    # single print call: reproductions can run in parallel threads
+    print(
+        "\n==== duckdb_cli: ===\n"
+        + f"{duckdb_cli}\n"
+        + "\n==== sql_statement: ===\n"
+        + f"{sql_statement_bytes.decode(errors='backslashreplace')}\n"
+        + "\n==== STD error: ===\n"
+        + f"{stderr}\n"
+        + "==========",
+        flush=True,
+    )
 
 
-def run_sql(duckdb_cli, sql_statement_bytes, fuzzer_name) -> tuple[str, str]:
-    (stdout, stderr, returncode, timed_out) = run_duckdb(duckdb_cli, sql_statement_bytes)
+def run_sql(duckdb_cli, sql_statement_bytes, fuzzer_name, cancel_event=None, timeout=REPRODUCTION_TIMEOUT_S) -> tuple[str, str]:
+    (stdout, stderr, returncode, timed_out, usage) = run_duckdb(duckdb_cli, sql_statement_bytes, timeout, cancel_event)
+    record_resource_usage(duckdb_cli, sql_statement_bytes, usage)
+    exception_msg, stacktrace = classify_run(returncode, stderr, timed_out, fuzzer_name, timeout)
+    if exception_msg and not timed_out:
+        print_std_error(duckdb_cli, sql_statement_bytes, stderr)
+    elif not exception_msg and is_resource_blowup(usage):
+        exception_msg, stacktrace = (f"{fuzzer_name} resource blowup: {describe_usage(usage)}", "")
+        print(f"{exception_msg}\n==== sql_statement: ===\n{sql_statement_bytes.decode(errors='backslashreplace')}", flush=True)
+    return (exception_msg, stacktrace)
+
+
+# (exception_msg, stacktrace) of a duckdb run; both are empty if the run did not reproduce an error
+# returncode: 0 (ok), 1 (error), negative (killed by a signal), or any other value if timed_out
+def classify_run(returncode, stderr, timed_out, fuzzer_name, timeout=REPRODUCTION_TIMEOUT_S) -> tuple[str, str]:
     match returncode:
         case 0:
             exception_msg, stacktrace = "", ""
         case 1 if not is_internal_error(stderr):  # regular error
             exception_msg, stacktrace = "", ""
         case 1:  # internal error
-            print_std_error(duckdb_cli, sql_statement_bytes, stderr)
             exception_msg, stacktrace = split_exception_trace(stderr)
         case _ if returncode < 0:  # crash
-            print_std_error(duckdb_cli, sql_statement_bytes, stderr)
             exception_msg, stacktrace = split_exception_trace(stderr)
             sig_name = signal.Signals(-returncode).name
             exception_msg = f"{sig_name}: {exception_msg}"
         case _ if timed_out:  # hang
-            exception_msg, stacktrace = (f"{fuzzer_name} timed out after 300 s", "")
+            exception_msg, stacktrace = (f"{fuzzer_name} timed out after {timeout:g} s", "")
         case _:
             raise ValueError(f"undefined return code: {returncode} (expected 0, 1, or negative values)")
     return (exception_msg, stacktrace)
 
 
-def reproduce_filereader_issue(duckdb_cli, repro_file_path, file_reader_function, arguments):
+def filereader_sql_statement(repro_file_path, file_reader_function, arguments) -> bytearray:
     sql_statement = f"from {file_reader_function}('{repro_file_path}'{arguments})"
-    sql_statement_bytes = bytearray(sql_statement, 'utf8')
+    return bytearray(sql_statement, 'utf8')
+
+
+def storage_sql_statement(repro_file_path) -> bytes:
+    return f"ATTACH '{repro_file_path}' AS tmp_db (READ_ONLY); use tmp_db; show tables;".encode()
+
+
+def reproduce_filereader_issue(duckdb_cli, repro_file_path, file_reader_function, arguments):
+    sql_statement_bytes = filereader_sql_statement(repro_file_path, file_reader_function, arguments)
     exception_msg, stacktrace = run_sql(duckdb_cli, sql_statement_bytes, file_reader_function)
     return (exception_msg, stacktrace)
 
 
 def reproduce_crashes_from_sql_dir(sql_file_dir: Path, duckdb_cli: Path, max_one=False):
-    unique_crashes = {}
+    # imported here: crash_buckets and result_store import this module
+    from crash_buckets import CrashBuckets
+    from result_store import run_with_result_store
+
+    buckets = CrashBuckets()
     all_sql_files = sorted(sql_file_dir.iterdir())
     print(f"reproducing errors in {len(all_sql_files)} sql files in dir {sql_file_dir} ...")
-    for sql_file in all_sql_files:
-        sql_statement_bytes = bytearray(sql_file.read_bytes())
-        exception_msg, stacktrace = run_sql(duckdb_cli, sql_statement_bytes, 'sql_fuzzer')
+    jobs = [(bytearray(sql_file.read_bytes()), 'sql_fuzzer') for sql_file in all_sql_files]
+    # hangs: stop at the first one; crashes: most are duplicates of a few bugs, so test them in batches
+    # inputs that were already reproduced with this duckdb cli are looked up in the result store
+    run_jobs = run_sql_hang_candidates if max_one else run_sql_batched
+    results = run_with_result_store(duckdb_cli, jobs, run_jobs, max_one=max_one)
+    for sql_file, (sql_statement_bytes, _), result in zip(all_sql_files, jobs, results):
+        exception_msg, stacktrace = result
         if exception_msg:
-            unique_crashes[exception_msg] = (sql_statement_bytes, exception_msg, stacktrace)
-            if max_one:
+            buckets.add(sql_file.name, exception_msg, stacktrace, (sql_statement_bytes, exception_msg, stacktrace))
+    buckets.print_summary()
+    buckets.save_index(sql_file_dir.parent / f"{sql_file_dir.name}_buckets.json")
+    return buckets.representatives()
+
+
+# runs run_sql() for every job (sql_statement_bytes, fuzzer_name) in a pool of threads, each running a duckdb process
+# returns the (exception_msg, stacktrace) per job, in the order of the jobs
+# max_one: stop after the first job (in job order) that times out (a hang); running jobs after it are killed,
+#          and their results are omitted. Other errors (e.g. resource blowups) don't stop the jobs
+def run_sql_in_parallel(
+    duckdb_cli, jobs: list[tuple[bytes, str]], nr_workers=None, max_one=False, timeout=REPRODUCTION_TIMEOUT_S
+) -> list[tuple[str, str]]:
+    cancel_event = threading.Event()
+    results = []
+    with ThreadPoolExecutor(max_workers=nr_workers or NR_REPRODUCTION_WORKERS) as executor:
+        futures = [
+            executor.submit(run_sql, duckdb_cli, sql_statement_bytes, fuzzer_name, cancel_event, timeout)
+            for sql_statement_bytes, fuzzer_name in jobs
+        ]
+        for future in futures:
+            exception_msg, stacktrace = future.result()
+            results.append((exception_msg, stacktrace))
+            if max_one and is_hang(exception_msg):
+                cancel_event.set()
+                for pending_future in futures:
+                    pending_future.cancel()
                 break
-    return unique_crashes
+    return results
+
+
+# like run_sql_in_parallel(max_one=True), with the calibrated hang timeout instead of REPRODUCTION_TIMEOUT_S.
+# The first job that times out is confirmed with HANG_CONFIRMATION_TIMEOUT_S; if it finishes in time after all,
+# the remaining jobs are tried. The results before the hang can contain other errors, e.g. resource blowups.
+def run_sql_hang_candidates(duckdb_cli, jobs: list[tuple[bytes, str]], nr_workers=None) -> list[tuple[str, str]]:
+    timeout = calibrated_hang_timeout(duckdb_cli)
+    results = []
+    while len(results) < len(jobs):
+        remaining_jobs = jobs[len(results) :]
+        candidate_results = run_sql_in_parallel(duckdb_cli, remaining_jobs, nr_workers, max_one=True, timeout=timeout)
+        sql_statement_bytes, fuzzer_name = remaining_jobs[len(candidate_results) - 1]
+        candidate_results[-1] = confirm_hang(duckdb_cli, sql_statement_bytes, fuzzer_name, candidate_results[-1], timeout)
+        results += candidate_results
+        if is_hang(results[-1][0]):
+            break
+    return results
+
+
+# True for the exception_msg of a timed out run (see classify_run())
+def is_hang(exception_msg: str) -> bool:
+    return re.search(r"timed out after [\d.]+ s$", exception_msg) is not None
+
+
+# a timeout with the (short) calibrated hang timeout is rerun with HANG_CONFIRMATION_TIMEOUT_S; returns the confirmed result
+def confirm_hang(
+    duckdb_cli, sql_statement_bytes, fuzzer_name, result: tuple[str, str], timeout, cancel_event=None
+) -> tuple[str, str]:
+    exception_msg, _ = result
+    if exception_msg.endswith(f"timed out after {timeout:g} s") and HANG_CONFIRMATION_TIMEOUT_S > timeout:
+        if cancel_event is not None and cancel_event.is_set():
+            return result
+        print(f"confirming hang with timeout {HANG_CONFIRMATION_TIMEOUT_S:g} s ...")
+        return run_sql(duckdb_cli, sql_statement_bytes, fuzzer_name, cancel_event, HANG_CONFIRMATION_TIMEOUT_S)
+    return result
 
 
-def run_duckdb(duckdb_cli, sql_statement_bytes):
+# hang timeout per duckdb cli: HANG_TIMEOUT_FACTOR x the median exec time of a trivial statement,
+# but at least MIN_HANG_TIMEOUT_S and at most REPRODUCTION_TIMEOUT_S
+def calibrated_hang_timeout(duckdb_cli, calibration_sql=CALIBRATION_SQL) -> float:
+    if HANG_TIMEOUT_S is not None:
+        return HANG_TIMEOUT_S
+    key = (str(duckdb_cli), calibration_sql)
+    with _hang_timeouts_lock:
+        if key not in _hang_timeouts:
+            exec_times = []
+            for _ in range(NR_CALIBRATION_RUNS):
+                start = time.perf_counter()
+                run_duckdb(duckdb_cli, calibration_sql)
+                exec_times.append(time.perf_counter() - start)
+            baseline = statistics.median(exec_times)
+            _hang_timeouts[key] = round(min(max(HANG_TIMEOUT_FACTOR * baseline, MIN_HANG_TIMEOUT_S), REPRODUCTION_TIMEOUT_S), 1)
+            print(f"baseline exec time of {duckdb_cli}: {baseline * 1000:.1f} ms -> hang timeout: {_hang_timeouts[key]:g} s")
+        return _hang_timeouts[key]
+
+
+# batched mode (group testing): a group of jobs is fed to a single duckdb process; only if the group reproduces an error
+# (crash, internal error or timeout), it is split in halves, until the responsible jobs are found.
+# isolate: every job runs in a fresh in-memory database (ATTACH ':memory:'), so tables etc. of other jobs are not visible
+# returns the (exception_msg, stacktrace) per job, in the order of the jobs (like run_sql_in_parallel)
+def run_sql_batched(duckdb_cli, jobs: list[tuple[bytes, str]], isolate=True, batch_size=None, nr_workers=None) -> list[tuple[str, str]]:
+    batch_size = batch_size or REPRODUCTION_BATCH_SIZE
+    batchable = [idx for idx, (sql_statement_bytes, _) in enumerate(jobs) if batch_size > 1 and is_batchable(sql_statement_bytes)]
+    groups = [batchable[i : i + batch_size] for i in range(0, len(batchable), batch_size)]
+    groups += [[idx] for idx in sorted(set(range(len(jobs))) - set(batchable))]
+
+    results: list[tuple[str, str]] = [("", "")] * len(jobs)
+    nr_processes = 0
+    with ThreadPoolExecutor(max_workers=nr_workers or NR_REPRODUCTION_WORKERS) as executor:
+        futures = [executor.submit(run_group, duckdb_cli, jobs, group, isolate) for group in groups]
+        for group, future in zip(groups, futures):
+            group_results, group_nr_processes = future.result()
+            nr_processes += group_nr_processes
+            for idx, result in zip(group, group_results):
+                results[idx] = result
+    print(f"{len(jobs)} inputs reproduced with {nr_processes} duckdb processes (batch size: {batch_size})")
+    return results
+
+
+# returns the results of the jobs in the group, and the number of duckdb processes used
+def run_group(duckdb_cli, jobs: list[tuple[bytes, str]], group: list[int], isolate: bool) -> tuple[list[tuple[str, str]], int]:
+    if len(group) == 1:
+        sql_statement_bytes, fuzzer_name = jobs[group[0]]
+        return ([run_sql(duckdb_cli, sql_statement_bytes, fuzzer_name)], 1)
+    batch = batch_sql_statement([jobs[idx][0] for idx in group], isolate)
+    _, stderr, returncode, timed_out, usage = run_duckdb(duckdb_cli, batch)
+    if not timed_out and returncode >= 0 and not is_internal_error(stderr) and not is_resource_blowup(usage):
+        for idx in group:
+            record_resource_usage(duckdb_cli, jobs[idx][0], usage, batch_size=len(group))
+        return ([("", "")] * len(group), 1)
+    half = len(group) // 2
+    first_results, first_nr_processes = run_group(duckdb_cli, jobs, group[:half], isolate)
+    second_results, second_nr_processes = run_group(duckdb_cli, jobs, group[half:], isolate)
+    return (first_results + second_results, 1 + first_nr_processes + second_nr_processes)
+
+
+def batch_sql_statement(sql_statements: list[bytes], isolate: bool) -> bytearray:
+    batch = bytearray()
+    for idx, sql_statement_bytes in enumerate(sql_statements):
+        if isolate:
+            batch += f"ATTACH ':memory:' AS batch_input_{idx};\nUSE batch_input_{idx};\n".encode()
+        # terminate the last statement of the input, even if it is incomplete
+        batch += sql_statement_bytes + b"\n;\n"
+        if isolate:
+            batch += f"USE memory;\nDETACH batch_input_{idx};\n".encode()
+    return batch
+
+
+def is_batchable(sql_statement_bytes) -> bool:
+    sql = bytes(sql_statement_bytes).decode(errors='surrogateescape')
+    if BATCH_UNSAFE_PATTERN.search(sql):
+        return False
+    # only the last token can be unterminated; it consumes the remainder of the input
+    tokens = tokenize_sql(sql)
+    return not tokens or not UNTERMINATED_TOKEN_PATTERN.fullmatch(tokens[-1])
+
+
+# returncode 42 and timed_out=True if the process timed out (or was cancelled with the cancel_event)
+# usage: peak rss (MB), user and sys cpu time (s) and wall time (s) of the process (None if it is unknown)
+# stdin, stdout and stderr are temporary files, so the process can be reaped with os.wait4() to get its resource usage
+def run_duckdb(duckdb_cli, sql_statement_bytes, timeout=REPRODUCTION_TIMEOUT_S, cancel_event=None):
     command = [duckdb_cli, '-batch', '-init', '/dev/null']
-    timed_out = False
-    try:
-        res = subprocess.run(
-            command, input=sql_statement_bytes, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=300
-        )
-        stdout = res.stdout.decode('utf8', 'ignore').strip()
-        stderr = res.stderr.decode('utf8', 'ignore').strip()
-        returncode = res.returncode
-    except subprocess.TimeoutExpired:
-        return ("", "", 42, True)
-    return (stdout, stderr, returncode, timed_out)
+    if REPRODUCTION_MEMORY_LIMIT:
+        sql_statement_bytes = f"SET memory_limit = '{REPRODUCTION_MEMORY_LIMIT}';\n".encode() + sql_statement_bytes
+    with tempfile.TemporaryFile() as stdin_file, tempfile.TemporaryFile() as stdout_file, tempfile.TemporaryFile() as stderr_file:
+        stdin_file.write(sql_statement_bytes)
+        stdin_file.seek(0)
+        start = time.monotonic()
+        deadline = start + timeout
+        process = subprocess.Popen(command, stdin=stdin_file, stdout=stdout_file, stderr=stderr_file)
+        limit_address_space(process.pid)
+        exit_status = []
+        waiter = threading.Thread(target=lambda: exit_status.extend(os.wait4(process.pid, 0)))
+        waiter.start()
+        while waiter.is_alive():
+            waiter.join(min(CANCEL_POLL_INTERVAL_S, max(0, deadline - time.monotonic())))
+            if waiter.is_alive() and (time.monotonic() >= deadline or (cancel_event is not None and cancel_event.is_set())):
+                # not process.kill(): it polls the process first, and could reap it before os.wait4() does
+                try:
+                    os.kill(process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                waiter.join()
+                process.returncode = 42
+                usage = resource_usage(exit_status[2], time.monotonic() - start) if exit_status else None
+                return ("", "", 42, True, usage)
+        if not exit_status:
+            raise ChildProcessError(f"duckdb process {process.pid} was reaped by another thread")
+        _, status, rusage = exit_status
+        usage = resource_usage(rusage, time.monotonic() - start)
+        # the process is reaped already; let Popen know its exit code
+        process.returncode = os.waitstatus_to_exitcode(status)
+        stdout_file.seek(0)
+        stderr_file.seek(0)
+        stdout = stdout_file.read().decode('utf8', 'ignore').strip()
+        stderr = stderr_file.read().decode('utf8', 'ignore').strip()
+    return (stdout, stderr, process.returncode, False, usage)
+
+
+# set on the running process, not with preexec_fn: a fork of this multi-threaded process should only exec
+def limit_address_space(pid):
+    if REPRODUCTION_RLIMIT_AS_MB is not None:
+        limit = REPRODUCTION_RLIMIT_AS_MB * 1024 * 1024
+        resource.prlimit(pid, resource.RLIMIT_AS, (limit, limit))
+
+
+def resource_usage(rusage, wall_s) -> dict:
+    # ru_maxrss is in kilobytes on linux
+    return {
+        'peak_rss_mb': rusage.ru_maxrss / 1024,
+        'user_cpu_s': rusage.ru_utime,
+        'sys_cpu_s': rusage.ru_stime,
+        'wall_s': wall_s,
+    }
+
+
+def is_resource_blowup(usage: dict | None) -> bool:
+    if usage is None:
+        return False
+    return usage['peak_rss_mb'] > RESOURCE_BLOWUP_RSS_MB or usage['user_cpu_s'] + usage['sys_cpu_s'] > RESOURCE_BLOWUP_CPU_S
+
+
+def record_resource_usage(duckdb_cli, sql_statement_bytes, usage: dict | None, batch_size=1):
+    if usage is not None:
+        usage = {**usage, 'batch_size': batch_size}
+    resource_usages[(str(duckdb_cli), bytes(sql_statement_bytes))] = usage
+
+
+# resource usage of the last run of the sql statement with the duckdb cli, or None
+def last_resource_usage(duckdb_cli, sql_statement_bytes) -> dict | None:
+    return resource_usages.get((str(duckdb_cli), bytes(sql_statement_bytes)))
+
+
+def describe_usage(usage: dict) -> str:
+    return (
+        f"peak rss {usage['peak_rss_mb']:.0f} MB, cpu time {usage['user_cpu_s']:.1f} s user + {usage['sys_cpu_s']:.1f} s sys, "
+        f"wall time {usage['wall_s']:.1f} s"
+    )
@@ -1,20 +1,42 @@
 import json
 import requests
-import re
 import os
+import random
+import time
 import urllib.parse
+from pathlib import Path
+
+import issue_index
 
 USERNAME = 'fuzzerofducks'
 
 REPO_OWNER = 'duckdb'
 REPO_NAME = 'duckdb-fuzzer'
 
+# can be set to a local stub server for testing
+API_URL = os.environ.get('GITHUB_API_URL', 'https://api.github.com')
+
+# retries of api requests: rate limited responses (403/429) wait for 'Retry-After' or 'X-RateLimit-Reset',
+# server errors and connection errors are retried with exponential backoff.
+# Other requests (e.g. the POST that creates an issue) may have been processed despite a server error or a broken
+# connection; to not file an issue twice, they are only retried if rate limited or if the connection could not be
+# made. An issue that is not filed stays in the issue queue, and is filed by the next run if it is still not known.
+MAX_RETRIES = 5
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+BACKOFF_BASE_S = 2
+MAX_WAIT_S = 900
+
+# issues are filed via a queue on disk; issues that could not be filed are filed first by the next run
+ISSUE_QUEUE_FILE = Path(os.environ.get('ISSUE_QUEUE_FILE', '~/.cache/duckdb-aflplusplus/issue_queue.json')).expanduser()
+
+_session = None
+
 
 # functions borrowed from duckdb/duckdb_sqlsmith -> fuzzer_helper.py
 
 
 def issue_url():
-    return 'https://api.github.com/repos/%s/%s/issues' % (REPO_OWNER, REPO_NAME)
+    return '%s/repos/%s/%s/issues' % (API_URL, REPO_OWNER, REPO_NAME)
 
 
 def file_url(file_path):
@@ -48,6 +70,59 @@ def create_session_no_auth():
     return session
 
 
+def create_session_if_key_available():
+    if 'FUZZEROFDUCKSKEY' in os.environ and len(os.environ['FUZZEROFDUCKSKEY']) > 0:
+        return create_session()
+    return create_session_no_auth()
+
+
+# one session per process, so the connection is reused
+def get_session():
+    global _session
+    if _session is None:
+        _session = create_session_if_key_available()
+    return _session
+
+
+def request_with_retry(method, url, **kwargs) -> requests.Response:
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            r = get_session().request(method, url, **kwargs)
+        except requests.ConnectionError as e:
+            # a connect timeout: the request was not sent
+            if attempt == MAX_RETRIES or not (method in IDEMPOTENT_METHODS or isinstance(e, requests.ConnectTimeout)):
+                raise
+            wait_s = backoff_s(attempt)
+            print(f"{method} {url} failed ({e}); retry in {wait_s:.0f} s")
+        else:
+            wait_s = rate_limit_wait_s(r)
+            if wait_s is None and (r.status_code < 500 or method not in IDEMPOTENT_METHODS):
+                return r
+            if attempt == MAX_RETRIES:
+                return r
+            wait_s = backoff_s(attempt) if wait_s is None else wait_s
+            print(f"{method} {url} returned {r.status_code}; retry in {wait_s:.0f} s")
+        time.sleep(wait_s)
+
+
+# None if the response is not rate limited
+def rate_limit_wait_s(r: requests.Response) -> float | None:
+    if r.status_code not in (403, 429):
+        return None
+    if 'Retry-After' in r.headers:
+        return min(float(r.headers['Retry-After']), MAX_WAIT_S)
+    if r.headers.get('X-RateLimit-Remaining') == '0' and 'X-RateLimit-Reset' in r.headers:
+        return min(max(float(r.headers['X-RateLimit-Reset']) - time.time(), 0) + 1, MAX_WAIT_S)
+    if r.status_code == 429 or b'rate limit' in r.content:
+        # secondary rate limit without headers: wait at least a minute
+        return 60
+    return None
+
+
+def backoff_s(attempt: int) -> float:
+    return min(BACKOFF_BASE_S * 2**attempt + random.uniform(0, 1), MAX_WAIT_S)
+
+
 def make_github_issue(title, body, labels=None):
     if labels is None:
         labels = []
@@ -56,35 +131,64 @@ def make_github_issue(title, body, labels=None):
         title = title[:240] + '...'
     if len(body) > 60000:
         body = body[:60000] + '... (body of github issue is truncated)'
-    session = create_session()
-    url = issue_url()
-    issue = {'title': title, 'body': body, 'labels': labels}
-    r = session.post(url, json.dumps(issue))
+    get_token()
+    queue = read_issue_queue()
+    queue.append({'title': title, 'body': body, 'labels': labels})
+    write_issue_queue(queue)
+    file_queued_issues()
+
+
+# files the queued issues in order; an issue is removed from the queue as soon as it is created
+def file_queued_issues():
+    queue = read_issue_queue()
+    while queue:
+        issue = queue[0]
+        existing_issue = issue_index.open_issue_index().find(issue['title'])
+        if existing_issue:
+            # e.g. queued by an earlier run, and filed in the meantime
+            print(f"Skip filing queued issue, already exists: #{existing_issue['number']} {issue['title']}")
+        else:
+            create_issue(issue)
+        queue.pop(0)
+        write_issue_queue(queue)
+
+
+def create_issue(issue: dict):
+    r = request_with_retry('POST', issue_url(), data=json.dumps(issue))
     if r.status_code == 201:
-        print('Successfully created Issue "%s"' % title)
+        print('Successfully created Issue "%s"' % issue['title'])
         issue_json = r.json()
         print(f"::notice::created issue: {issue_json.get('html_url')} - {issue_json.get('title')}")
+        # known for the rest of the run
+        issue_index.open_issue_index().add(issue_json)
     else:
-        print('Could not create Issue "%s"' % title)
+        print('Could not create Issue "%s"' % issue['title'])
         print('Response:', r.content.decode('utf8'))
+        print(f"unfiled issues are kept in: {ISSUE_QUEUE_FILE}")
         raise Exception("Failed to create issue")
 
 
+def read_issue_queue() -> list[dict]:
+    if not ISSUE_QUEUE_FILE.is_file():
+        return []
+    return json.loads(ISSUE_QUEUE_FILE.read_text())
+
+
+def write_issue_queue(queue: list[dict]):
+    ISSUE_QUEUE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    ISSUE_QUEUE_FILE.write_text(json.dumps(queue, indent=4))
+
+
 def issues_by_title_url(*title_parts):
-    base_url = "https://api.github.com/search/issues"
+    base_url = f"{API_URL}/search/issues"
     title_str = " ".join(title_part for title_part in title_parts)
     query_string = urllib.parse.quote(f"repo:{REPO_OWNER}/{REPO_NAME} {title_str} in:title is:open")
     return f"{base_url}?q={query_string}"
 
 
 def get_github_issues_by_title(*issue_title) -> list[dict]:
-    session = (
-        create_session()
-        if 'FUZZEROFDUCKSKEY' in os.environ and len(os.environ['FUZZEROFDUCKSKEY']) > 0
-        else create_session_no_auth()
-    )
     url = issues_by_title_url(*issue_title)
-    r = session.get(url)
+    r = request_with_retry('GET', url)
     if r.status_code != 200:
         print('Failed to query the issues')
         print('Response:', r.content.decode('utf8'))
@@ -94,15 +198,19 @@ def get_github_issues_by_title(*issue_title) -> list[dict]:
 
 
 def is_known_github_issue(exception_msg):
-    # search for combination of title parts, strip some numbers, to prevent near-duplicates
-    title_parts = [part.strip() for part in re.split(r"(?<!line )\b\d+\b", exception_msg) if part.strip()]
-    existing_issues = get_github_issues_by_title(*tuple(title_parts))
-    if existing_issues:
+    # match against the (cached) index of open issues; numbers are stripped, to prevent near-duplicates
+    existing_issue = issue_index.open_issue_index().find(exception_msg)
+    if existing_issue:
         print("Skip filing duplicate issue")
-        print(
-            f"Issue already exists: https://github.com/{REPO_OWNER}/{REPO_NAME}/issues/"
-            + str(existing_issues[0]['number'])
-        )
+        print(f"Issue already exists: https://github.com/{REPO_OWNER}/{REPO_NAME}/issues/" + str(existing_issue['number']))
         return True
     else:
         return False
+
+
+# url of the open issue that matches the exception message, or None
+def known_issue_url(exception_msg) -> str | None:
+    existing_issue = issue_index.open_issue_index().find(exception_msg)
+    if existing_issue:
+        return f"https://github.com/{REPO_OWNER}/{REPO_NAME}/issues/{existing_issue['number']}"
+    return None
@@ -0,0 +1,148 @@
+'''
+Local index of the open issues of the duckdb-fuzzer repository, to check if an issue is already known
+without a search API request per crash.
+The open issues are fetched once (100 per page, following the 'next' links), and cached on disk:
+    - within the time-to-live, the cache is used without any request
+    - after that, the cache is refreshed with the issues updated since it was fetched (state=all&since=...): new and
+      reopened issues are added, renamed issues are updated, and closed issues are dropped
+Matching is the same as the search query of github_helper.get_github_issues_by_title(): all words of the title,
+with the numbers stripped, should be in the title of an open issue. Optionally, titles that are similar
+(difflib ratio >= ISSUE_FUZZY_MATCH_RATIO) are also considered as known.
+Settings (env variables):
+    - GITHUB_API_URL: base url of the api, e.g. 'http://localhost:8000' to test with a stub server
+    - ISSUE_CACHE_FILE: cache file (default: ~/.cache/duckdb-aflplusplus/open_issues.json)
+    - ISSUE_CACHE_TTL_S: time-to-live of the cache in seconds (default: 3600)
+    - ISSUE_FUZZY_MATCH_RATIO: e.g. 0.9; fuzzy matching is disabled if not set
+'''
+
+import difflib
+import json
+import os
+import re
+import time
+from pathlib import Path
+
+import github_helper
+
+ISSUE_CACHE_FILE = Path(os.environ.get('ISSUE_CACHE_FILE', '~/.cache/duckdb-aflplusplus/open_issues.json')).expanduser()
+ISSUE_CACHE_TTL_S = float(os.environ.get('ISSUE_CACHE_TTL_S') or 3600)
+ISSUE_FUZZY_MATCH_RATIO = float(os.environ['ISSUE_FUZZY_MATCH_RATIO']) if os.environ.get('ISSUE_FUZZY_MATCH_RATIO') else None
+ISSUES_PER_PAGE = 100
+
+
+class IssueIndex:
+    def __init__(self, issues_url=None, cache_file=ISSUE_CACHE_FILE, ttl_s=ISSUE_CACHE_TTL_S, fuzzy_ratio=ISSUE_FUZZY_MATCH_RATIO):
+        self.issues_url = issues_url or github_helper.issue_url()
+        self.cache_file = cache_file
+        self.ttl_s = ttl_s
+        self.fuzzy_ratio = fuzzy_ratio
+        self.nr_requests = 0
+        self.issues: list[dict] = []
+        self.fetched_at = 0.0
+        self.load()
+
+    # returns the first open issue (dict with 'number' and 'title') that matches the exception message
+    def find(self, exception_msg: str) -> dict | None:
+        words = title_words(exception_msg)
+        for issue in self.issues:
+            if words <= title_words(issue['title']):
+                return issue
+        if self.fuzzy_ratio is not None:
+            stripped_msg = strip_numbers(exception_msg)
+            for issue in self.issues:
+                if difflib.SequenceMatcher(None, stripped_msg, strip_numbers(issue['title'])).ratio() >= self.fuzzy_ratio:
+                    return issue
+        return None
+
+    # e.g. an issue that was just created, so it is known for the rest of the run
+    def add(self, issue: dict):
+        self.issues.insert(0, {'number': issue['number'], 'title': issue['title']})
+        self.save()
+
+    def load(self):
+        cache = self.read_cache()
+        if cache and time.time() - cache['fetched_at'] < self.ttl_s:
+            self.issues, self.fetched_at = cache['issues'], cache['fetched_at']
+            return
+        # issues that are updated while fetching are fetched again by the next refresh
+        fetch_start = time.time()
+        if cache:
+            self.issues = self.refresh(cache['issues'], cache['fetched_at'])
+        else:
+            open_issues = self.fetch_all(self.get(self.page_url(1)))
+            self.issues = [{'number': issue['number'], 'title': issue['title']} for issue in open_issues]
+        self.fetched_at = fetch_start
+        self.save()
+        print(f"index of {len(self.issues)} open issues loaded ({self.nr_requests} api requests)")
+
+    # applies the changes since the cache was fetched; the issues that were updated come first
+    def refresh(self, issues: list[dict], fetched_at: float) -> list[dict]:
+        since = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(fetched_at))
+        updated_issues = self.fetch_all(self.get(self.page_url(1, state='all', since=since)))
+        updated_numbers = {issue['number'] for issue in updated_issues}
+        open_issues = [issue for issue in updated_issues if issue['state'] == 'open']
+        return [{'number': issue['number'], 'title': issue['title']} for issue in open_issues] + [
+            issue for issue in issues if issue['number'] not in updated_numbers
+        ]
+
+    def read_cache(self) -> dict | None:
+        if not self.cache_file.is_file():
+            return None
+        try:
+            cache = json.loads(self.cache_file.read_text())
+        except json.JSONDecodeError:
+            return None
+        # a cache of another repository (or stub server) is not valid
+        return cache if cache.get('issues_url') == self.issues_url else None
+
+    def save(self):
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        cache = {'issues_url': self.issues_url, 'fetched_at': self.fetched_at, 'issues': self.issues}
+        self.cache_file.write_text(json.dumps(cache))
+
+    def fetch_all(self, first_page) -> list[dict]:
+        issues = []
+        page = first_page
+        while True:
+            # the issues api also lists pull requests
+            issues += [
+                {'number': issue['number'], 'title': issue['title'], 'state': issue['state']}
+                for issue in page.json()
+                if 'pull_request' not in issue
+            ]
+            if 'next' not in page.links:
+                return issues
+            page = self.get(page.links['next']['url'])
+
+    def page_url(self, page_nr: int, state='open', since=None) -> str:
+        url = f"{self.issues_url}?state={state}&sort=updated&direction=desc&per_page={ISSUES_PER_PAGE}&page={page_nr}"
+        return url + f"&since={since}" if since else url
+
+    def get(self, url):
+        r = github_helper.request_with_retry('GET', url)
+        self.nr_requests += 1
+        if r.status_code != 200:
+            print('Failed to query the issues')
+            print('Response:', r.content.decode('utf8'))
+            raise Exception("Failed to query the issues")
+        return r
+
+
+def strip_numbers(title: str) -> str:
+    # same as github_helper.is_known_github_issue(): strip numbers, except line numbers
+    return ' '.join(part.strip() for part in re.split(r"(?<!line )\b\d+\b", title) if part.strip())
+
+
+def title_words(title: str) -> set[str]:
+    return set(re.findall(r"\w+", strip_numbers(title).lower()))
+
+
+_index = None
+
+
+# one index per process
+def open_issue_index() -> IssueIndex:
+    global _index
+    if _index is None:
+        _index = IssueIndex()
+    return _index
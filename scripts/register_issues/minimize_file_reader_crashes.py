@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+'''
+Minimizes the input files of file reader crashes (read_csv, read_json or read_parquet) before the issues are filed,
+as long as the duckdb cli reproduces a crash with the same fingerprint (see crash_buckets.py):
+    - csv, json: first complete lines are removed, then single bytes
+    - parquet: chunks of PARQUET_CHUNK_SIZE bytes are removed; the magic bytes at the start and the footer length and
+      magic bytes at the end of the file are kept
+The content is reduced with delta debugging (see delta_debug.py). The files are minimized in parallel, and the
+candidates of a file are tested in parallel as well (in total NR_REPRODUCTION_WORKERS duckdb processes).
+Every file has a time budget: env variable 'MINIMIZATION_BUDGET_S' (default: 300; 0 disables the minimization).
+Hangs and resource blowups are not minimized.
+The minimized content is written to a new file '<name>_minimized<suffix>', and recorded in _REDUCED_REPRODUCTIONS.json
+(see prune_file_reader_arguments.py); the original file is not changed, since its digest is the key of its result in
+the result store.
+Inputs:
+    - file reader function: 'read_csv', 'read_json' or 'read_parquet'
+    - (optional) a reproductions directory with file _REPRODUCTIONS.json (created by decode_multi_param_files.py)
+    - (optional) path to duckdb cli (executable)
+Output:
+    - the minimized files, the updated _REDUCED_REPRODUCTIONS.json file, and per file: the size before and after
+      minimization
+'''
+
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from crash_buckets import crash_class, fingerprint
+import fuzzer_helper
+from prune_file_reader_arguments import update_reduced_reproductions
+
+sys.path.append(str(Path(__file__).parents[1] / 'fuzz_utils'))
+from delta_debug import ddmin
+
+MINIMIZATION_BUDGET_S = float(os.environ.get('MINIMIZATION_BUDGET_S') or 300)
+PARQUET_CHUNK_SIZE = 64
+# 'PAR1' at the start; footer length (4 bytes) and 'PAR1' at the end
+PARQUET_HEADER_SIZE = 4
+PARQUET_FOOTER_SIZE = 8
+
+
+def main(argv: list[str]):
+    file_reader_function = argv[1]
+    if file_reader_function not in ['read_csv', 'read_json', 'read_parquet']:
+        raise ValueError(f"invalid input: {file_reader_function}")
+    reproduction_dir = Path(argv[2] if len(argv) > 2 else "~/Desktop/reproductions").expanduser()
+    duckdb_cli = Path(argv[3] if len(argv) > 3 else "~/git/duckdb/build/debug/duckdb").expanduser()
+    if not duckdb_cli.is_file():
+        raise ValueError(f"expected file not found: {duckdb_cli}")
+
+    reproduction_data: list[dict] = json.loads((reproduction_dir / '_REPRODUCTIONS.json').read_text())
+    repro_items = [
+        (reproduction_dir / repro_item['file_name'], ", " + repro_item['arguments'] if repro_item['arguments'] else "")
+        for repro_item in reproduction_data
+    ]
+    jobs = [
+        (fuzzer_helper.filereader_sql_statement(repro_file_path, file_reader_function, arguments), file_reader_function)
+        for repro_file_path, arguments in repro_items
+    ]
+    results = fuzzer_helper.run_sql_in_parallel(duckdb_cli, jobs)
+    issues = [
+        (repro_file_path, arguments, exception_msg, stacktrace)
+        for (repro_file_path, arguments), (exception_msg, stacktrace) in zip(repro_items, results)
+        if exception_msg
+    ]
+    print(f"{len(issues)} of {len(repro_items)} files reproduce an error")
+    minimize_issues(issues, duckdb_cli, file_reader_function)
+
+
+# issues: (repro_file_path, arguments, exception_msg, stacktrace), e.g. the unique crashes of reproduce_and_file_issues.py
+# returns the issues with the minimized files (in the same order)
+def minimize_issues(issues: list[tuple], duckdb_cli: Path, file_reader_function: str) -> list[tuple]:
+    to_minimize = [idx for idx, issue in enumerate(issues) if crash_class(issue[2]) not in ['timeout', 'resource blowup']]
+    if not to_minimize or MINIMIZATION_BUDGET_S <= 0:
+        return issues
+    # the reproduction workers are divided over the files
+    nr_parallel_files = min(len(to_minimize), fuzzer_helper.NR_REPRODUCTION_WORKERS)
+    nr_workers = max(1, fuzzer_helper.NR_REPRODUCTION_WORKERS // nr_parallel_files)
+    print(f"minimizing {len(to_minimize)} files ({nr_parallel_files} in parallel, with {nr_workers} workers per file) ...")
+    # calibrate the hang timeout once, before the workers start (and load the machine)
+    fuzzer_helper.calibrated_hang_timeout(duckdb_cli)
+    with ThreadPoolExecutor(max_workers=nr_parallel_files) as executor:
+        futures = [
+            executor.submit(minimize_repro_file, duckdb_cli, file_reader_function, *issues[idx], nr_workers)
+            for idx in to_minimize
+        ]
+        minimized_issues = list(issues)
+        for idx, future in zip(to_minimize, futures):
+            repro_file_path, arguments, exception_msg, stacktrace = issues[idx]
+            original_size, minimized_size, minimized_file_path = future.result()
+            print(f"{repro_file_path.name}: {original_size} -> {minimized_size} bytes", flush=True)
+            minimized_issues[idx] = (minimized_file_path, arguments, exception_msg, stacktrace)
+    update_reduced_reproductions([issues[idx] for idx in to_minimize], [minimized_issues[idx] for idx in to_minimize])
+    return minimized_issues
+
+
+# returns the file size before and after the minimization, and the path of the minimized file (the path of the
+# original file if it could not be minimized)
+def minimize_repro_file(
+    duckdb_cli: Path, file_reader_function: str, repro_file_path: Path, arguments: str, exception_msg: str, stacktrace: str, nr_workers: int
+) -> tuple[int, int, Path]:
+    content = repro_file_path.read_bytes()
+    deadline = time.monotonic() + MINIMIZATION_BUDGET_S
+    with tempfile.TemporaryDirectory() as work_dir:
+        is_interesting = create_oracle(duckdb_cli, file_reader_function, repro_file_path, arguments, Path(work_dir))
+        target = fingerprint(exception_msg, stacktrace)
+        if not is_interesting(content, target):
+            # the crash is not stable (e.g. it depends on the file name); keep the original file
+            return (len(content), len(content), repro_file_path)
+        if file_reader_function == 'read_parquet':
+            header = content[:PARQUET_HEADER_SIZE]
+            footer = content[-PARQUET_FOOTER_SIZE:] if len(content) >= PARQUET_HEADER_SIZE + PARQUET_FOOTER_SIZE else b''
+            body = content[len(header) : len(content) - len(footer)]
+            chunks = [body[i : i + PARQUET_CHUNK_SIZE] for i in range(0, len(body), PARQUET_CHUNK_SIZE)]
+            chunks = ddmin(chunks, lambda candidate: is_interesting(header + b''.join(candidate) + footer, target), nr_workers, deadline)
+            minimized = header + b''.join(chunks) + footer
+        else:
+            lines = content.splitlines(keepends=True)
+            lines = ddmin(lines, lambda candidate: is_interesting(b''.join(candidate), target), nr_workers, deadline)
+            single_bytes = [bytes([byte]) for byte in b''.join(lines)]
+            single_bytes = ddmin(single_bytes, lambda candidate: is_interesting(b''.join(candidate), target), nr_workers, deadline)
+            minimized = b''.join(single_bytes)
+    if len(minimized) == len(content):
+        return (len(content), len(content), repro_file_path)
+    minimized_file_path = repro_file_path.with_name(f"{repro_file_path.stem}_minimized{repro_file_path.suffix}")
+    minimized_file_path.write_bytes(minimized)
+    return (len(content), len(minimized), minimized_file_path)
+
+
+# returns a function that decides if a candidate content reproduces a crash with the target fingerprint
+def create_oracle(duckdb_cli: Path, file_reader_function: str, repro_file_path: Path, arguments: str, work_dir: Path):
+    # candidates that hang are not interesting; don't wait for the full reproduction timeout
+    timeout = fuzzer_helper.calibrated_hang_timeout(duckdb_cli)
+
+    def is_interesting(candidate: bytes, target: str) -> bool:
+        fd, candidate_file = tempfile.mkstemp(suffix=repro_file_path.suffix, dir=work_dir)
+        with os.fdopen(fd, 'wb') as candidate_fd:
+            candidate_fd.write(candidate)
+        sql_statement_bytes = fuzzer_helper.filereader_sql_statement(candidate_file, file_reader_function, arguments)
+        _, stderr, returncode, timed_out, _ = fuzzer_helper.run_duckdb(duckdb_cli, sql_statement_bytes, timeout)
+        os.unlink(candidate_file)
+        exception_msg, stacktrace = fuzzer_helper.classify_run(returncode, stderr, timed_out, file_reader_function, timeout)
+        # the file name can be part of the exception message
+        exception_msg = exception_msg.replace(candidate_file, str(repro_file_path))
+        return bool(exception_msg) and fingerprint(exception_msg, stacktrace) == target
+
+    return is_interesting
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in [2, 3, 4]:
+        sys.exit(
+            """
+            ERROR; call this script with the following arguments:
+              1 - file reader function: 'read_csv', 'read_json' or 'read_parquet'
+              2 - (optional) path to reproductions directory (created by decode_multi_param_files.py)
+              3 - (optional) path to duckdb cli (executable)
+            """
+        )
+    main(sys.argv)
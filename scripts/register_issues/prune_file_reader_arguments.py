@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+
+'''
+Prunes the arguments of file reader crashes (found by the multi param fuzzers) before the issues are filed.
+The argument strings created by decode_multi_param_files.py often contain arguments that are not needed to reproduce
+the crash. As long as the duckdb cli reproduces a crash with the same fingerprint (see crash_buckets.py):
+    - arguments are removed (delta debugging, see delta_debug.py; down to removing them one at a time)
+    - the values of the remaining arguments are simplified: INTEGER and DOUBLE values are replaced by 0 or 1, and VARCHAR
+      values are shortened
+The argument strings are split with the parameter names of the fuzzer (see decode_multi_param_files.py), since the
+values are not quoted and can contain commas.
+The candidates are tested in parallel batches; the crashes are pruned in parallel as well (in total
+NR_REPRODUCTION_WORKERS duckdb processes). Hangs and resource blowups are not pruned.
+The pruned argument strings are written to the file _REDUCED_REPRODUCTIONS.json of the reproduction; _REPRODUCTIONS.json
+is not changed, since the original reproduction is the key of its result in the result store and the triage checkpoint.
+Inputs:
+    - file reader function: 'read_csv', 'read_json' or 'read_parquet'
+    - (optional) a reproductions directory with file _REPRODUCTIONS.json (created by decode_multi_param_files.py)
+    - (optional) path to duckdb cli (executable)
+Output:
+    - the updated _REDUCED_REPRODUCTIONS.json file, and per crash: the arguments before and after pruning
+'''
+
+import json
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from crash_buckets import crash_class, fingerprint
+import fuzzer_helper
+
+sys.path.append(str(Path(__file__).parents[1] / 'fuzz_utils'))
+sys.path.append(str(Path(__file__).parents[1] / 'reproduction'))
+from decode_multi_param_files import decoder_settings
+from delta_debug import ddmin
+
+FUZZ_SRC_DIR = Path(__file__).parents[2] / 'src'
+REDUCED_REPRODUCTIONS_FILE_NAME = '_REDUCED_REPRODUCTIONS.json'
+# replacement values, in order of preference
+SIMPLE_VALUES = {'INTEGER': ['0', '1'], 'DOUBLE': ['0', '1']}
+
+
+def main(argv: list[str]):
+    file_reader_function = argv[1]
+    if file_reader_function not in ['read_csv', 'read_json', 'read_parquet']:
+        raise ValueError(f"invalid input: {file_reader_function}")
+    reproduction_dir = Path(argv[2] if len(argv) > 2 else "~/Desktop/reproductions").expanduser()
+    duckdb_cli = Path(argv[3] if len(argv) > 3 else "~/git/duckdb/build/debug/duckdb").expanduser()
+    if not duckdb_cli.is_file():
+        raise ValueError(f"expected file not found: {duckdb_cli}")
+
+    reproduction_data: list[dict] = json.loads((reproduction_dir / '_REPRODUCTIONS.json').read_text())
+    repro_items = [
+        (reproduction_dir / repro_item['file_name'], ", " + repro_item['arguments'] if repro_item['arguments'] else "")
+        for repro_item in reproduction_data
+    ]
+    jobs = [
+        (fuzzer_helper.filereader_sql_statement(repro_file_path, file_reader_function, arguments), file_reader_function)
+        for repro_file_path, arguments in repro_items
+    ]
+    results = fuzzer_helper.run_sql_in_parallel(duckdb_cli, jobs)
+    issues = [
+        (repro_file_path, arguments, exception_msg, stacktrace)
+        for (repro_file_path, arguments), (exception_msg, stacktrace) in zip(repro_items, results)
+        if exception_msg
+    ]
+    print(f"{len(issues)} of {len(repro_items)} files reproduce an error")
+    prune_issues(issues, duckdb_cli, file_reader_function)
+
+
+# issues: (repro_file_path, arguments, exception_msg, stacktrace), e.g. the unique crashes of reproduce_and_file_issues.py
+# returns the issues with the pruned arguments (in the same order)
+def prune_issues(issues: list[tuple], duckdb_cli: Path, file_reader_function: str) -> list[tuple]:
+    to_prune = [idx for idx, issue in enumerate(issues) if issue[1] and crash_class(issue[2]) not in ['timeout', 'resource blowup']]
+    if not to_prune:
+        return issues
+    parameters, _ = decoder_settings(file_reader_function, FUZZ_SRC_DIR)
+    # the reproduction workers are divided over the issues
+    nr_parallel_issues = min(len(to_prune), fuzzer_helper.NR_REPRODUCTION_WORKERS)
+    nr_workers = max(1, fuzzer_helper.NR_REPRODUCTION_WORKERS // nr_parallel_issues)
+    print(f"pruning the arguments of {len(to_prune)} reproductions ...")
+    # calibrate the hang timeout once, before the workers start (and load the machine)
+    fuzzer_helper.calibrated_hang_timeout(duckdb_cli)
+    with ThreadPoolExecutor(max_workers=nr_parallel_issues) as executor:
+        futures = [
+            executor.submit(prune_arguments, duckdb_cli, file_reader_function, parameters, *issues[idx], nr_workers)
+            for idx in to_prune
+        ]
+        pruned_issues = list(issues)
+        for idx, future in zip(to_prune, futures):
+            repro_file_path, arguments, exception_msg, stacktrace = issues[idx]
+            pruned_arguments = future.result()
+            print(f"{repro_file_path.name}: ({arguments.lstrip(', ')}) -> ({pruned_arguments.lstrip(', ')})", flush=True)
+            pruned_issues[idx] = (repro_file_path, pruned_arguments, exception_msg, stacktrace)
+    update_reduced_reproductions([issues[idx] for idx in to_prune], [pruned_issues[idx] for idx in to_prune])
+    return pruned_issues
+
+
+# returns the pruned arguments (like the input: an empty string, or a string starting with ', ')
+def prune_arguments(
+    duckdb_cli: Path,
+    file_reader_function: str,
+    parameters: list[tuple[str, str]],
+    repro_file_path: Path,
+    arguments: str,
+    exception_msg: str,
+    stacktrace: str,
+    nr_workers: int,
+) -> str:
+    target = fingerprint(exception_msg, stacktrace)
+    # candidates that hang are not interesting; don't wait for the full reproduction timeout
+    timeout = fuzzer_helper.calibrated_hang_timeout(duckdb_cli)
+
+    def is_interesting(candidate: list[str]) -> bool:
+        candidate_arguments = ''.join(f", {argument}" for argument in candidate)
+        sql_statement_bytes = fuzzer_helper.filereader_sql_statement(repro_file_path, file_reader_function, candidate_arguments)
+        _, stderr, returncode, timed_out, _ = fuzzer_helper.run_duckdb(duckdb_cli, sql_statement_bytes, timeout)
+        candidate_msg, candidate_trace = fuzzer_helper.classify_run(returncode, stderr, timed_out, file_reader_function, timeout)
+        return bool(candidate_msg) and fingerprint(candidate_msg, candidate_trace) == target
+
+    # ddmin does not test the empty candidate
+    if is_interesting([]):
+        return ""
+    current = ddmin(split_arguments(arguments.removeprefix(", "), parameters), is_interesting, nr_workers)
+
+    # simplify the values, one argument at a time
+    parameter_types = dict(parameters)
+    with ThreadPoolExecutor(max_workers=nr_workers) as executor:
+        for arg_idx in range(len(current)):
+            name, _, value = current[arg_idx].partition('=')
+
+            def with_value(candidate_value: str) -> list[str]:
+                return current[:arg_idx] + [f"{name}={candidate_value}"] + current[arg_idx + 1 :]
+
+            candidate_values = [v for v in SIMPLE_VALUES.get(parameter_types.get(name), []) if v != value]
+            if parameter_types.get(name) == 'VARCHAR' and value:
+                candidate_values = ['']
+            results = list(executor.map(is_interesting, [with_value(v) for v in candidate_values]))
+            if any(results):
+                current = with_value(candidate_values[results.index(True)])
+            elif parameter_types.get(name) == 'VARCHAR' and len(value) > 1:
+                shortened = ddmin(list(value), lambda chars: is_interesting(with_value(''.join(chars))), nr_workers)
+                current = with_value(''.join(shortened))
+    return ''.join(f", {argument}" for argument in current)
+
+
+# splits an argument string (as created by decode_file()) into 'name=value' arguments
+# the values are not quoted, so an argument only starts at ', <name>=' for a known parameter name
+def split_arguments(argument_str: str, parameters: list[tuple[str, str]]) -> list[str]:
+    if not argument_str:
+        return []
+    names = sorted({re.escape(name) for name, _ in parameters}, key=len, reverse=True)
+    return re.split(rf", (?=(?:{'|'.join(names)})=)", argument_str)
+
+
+# writes the reduced reproductions (pruned arguments and/or minimized file) to the _REDUCED_REPRODUCTIONS.json file(s)
+# of the reproductions, next to _REPRODUCTIONS.json: one item per original reproduction, with its file name and arguments
+# issues and reduced_issues: (repro_file_path, arguments, exception_msg, stacktrace), in the same order
+def update_reduced_reproductions(issues: list[tuple], reduced_issues: list[tuple]):
+    for reproduction_dir in {repro_file_path.parent for repro_file_path, *_ in issues}:
+        reduced_json = reproduction_dir / REDUCED_REPRODUCTIONS_FILE_NAME
+        reduced_data: list[dict] = json.loads(reduced_json.read_text()) if reduced_json.is_file() else []
+        reduced_items = {reduced_item['original_file_name']: reduced_item for reduced_item in reduced_data}
+        for (repro_file_path, arguments, *_), (reduced_file_path, reduced_arguments, *_) in zip(issues, reduced_issues):
+            if repro_file_path.parent != reproduction_dir:
+                continue
+            if repro_file_path.name not in reduced_items:
+                reduced_items[repro_file_path.name] = {
+                    'original_file_name': repro_file_path.name,
+                    'original_arguments': arguments.removeprefix(", "),
+                }
+                reduced_data.append(reduced_items[repro_file_path.name])
+            reduced_items[repro_file_path.name]['file_name'] = reduced_file_path.name
+            reduced_items[repro_file_path.name]['arguments'] = reduced_arguments.removeprefix(", ")
+        with reduced_json.open('w') as reduced_file:
+            json.dump(reduced_data, reduced_file, indent=4)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in [2, 3, 4]:
+        sys.exit(
+            """
+            ERROR; call this script with the following arguments:
+              1 - file reader function: 'read_csv', 'read_json' or 'read_parquet'
+              2 - (optional) path to reproductions directory (created by decode_multi_param_files.py)
+              3 - (optional) path to duckdb cli (executable)
+            """
+        )
+    main(sys.argv)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+'''
+Reduces the sql of the crashes found by the sql fuzzer before the issues are filed.
+First complete statements, then tokens per statement are removed (delta debugging, see delta_debug.py), as long as the
+duckdb cli reproduces a crash with the same fingerprint (see crash_buckets.py).
+To keep the number of (slow) duckdb cli runs low, every candidate is first executed with the duckdb python module in a
+forked process (see forked_duckdb.py): if the original sql also crashes (or raises an internal error) in the python
+module, candidates that don't are rejected without running the duckdb cli. Note: the python module is usually a release
+build, so crashes on assertions can only be checked with the duckdb cli. The python module is optional: if it is not
+installed, every candidate is checked with the duckdb cli only.
+The crashes are reduced in parallel (env variable 'NR_REPRODUCTION_WORKERS'), every crash with a time budget
+(env variable 'MINIMIZATION_BUDGET_S', default: 300; 0 disables the reduction). Hangs and resource blowups are not reduced.
+Inputs:
+    - (optional) directory with sql files, e.g. the 'crashes' dir created by the fuzzer
+    - (optional) path to duckdb cli (executable)
+    - (optional) output directory (default: '<input directory>_reduced')
+Output:
+    - the reduced sql files, and per file: the size before and after the reduction
+'''
+
+import multiprocessing
+import os
+import sys
+import time
+from pathlib import Path
+
+from crash_buckets import crash_class, fingerprint
+import fuzzer_helper
+
+sys.path.append(str(Path(__file__).parents[1] / 'fuzz_utils'))
+from delta_debug import minimize_sql
+from sql_tokenizer import join_tokens, split_sql_statements
+
+MINIMIZATION_BUDGET_S = float(os.environ.get('MINIMIZATION_BUDGET_S') or 300)
+FORK_TIMEOUT_S = 5
+
+
+def main(argv: list[str]):
+    input_dir = Path(argv[1] if len(argv) > 1 else "~/Desktop/fuzz_results/sql_fuzzer/default/crashes").expanduser()
+    duckdb_cli = Path(argv[2] if len(argv) > 2 else "~/git/duckdb/build/debug/duckdb").expanduser()
+    output_dir = Path(argv[3]).expanduser() if len(argv) > 3 else input_dir.with_name(f"{input_dir.name}_reduced")
+    if not duckdb_cli.is_file():
+        raise ValueError(f"expected file not found: {duckdb_cli}")
+
+    sql_files = [sql_file for sql_file in sorted(input_dir.iterdir()) if sql_file.name != 'README.txt']
+    jobs = [(bytearray(sql_file.read_bytes()), 'sql_fuzzer') for sql_file in sql_files]
+    results = fuzzer_helper.run_sql_in_parallel(duckdb_cli, jobs)
+    issues = [
+        (sql_file, sql_statement_bytes, exception_msg, stacktrace)
+        for sql_file, (sql_statement_bytes, _), (exception_msg, stacktrace) in zip(sql_files, jobs, results)
+        if exception_msg
+    ]
+    print(f"{len(issues)} of {len(sql_files)} sql files reproduce an error")
+
+    reduced = reduce_sql_issues([issue[1:] for issue in issues], duckdb_cli)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for (sql_file, *_), reduced_sql_bytes in zip(issues, reduced):
+        (output_dir / sql_file.name).write_bytes(reduced_sql_bytes)
+    print(f"reduced sql files written to {output_dir}")
+
+
+# issues: (sql_statement_bytes, exception_msg, stacktrace), e.g. the unique crashes of reproduce_crashes_from_sql_dir()
+# returns the reduced sql per issue (in the same order); the sql of an issue that can't be reduced is returned as is
+def reduce_sql_issues(issues: list[tuple], duckdb_cli: Path) -> list[bytes]:
+    reduced = [bytes(sql_statement_bytes) for sql_statement_bytes, _, _ in issues]
+    to_reduce = [idx for idx, issue in enumerate(issues) if crash_class(issue[1]) not in ['timeout', 'resource blowup']]
+    if not to_reduce or MINIMIZATION_BUDGET_S <= 0:
+        return reduced
+    print(f"reducing the sql of {len(to_reduce)} crashes ...")
+    # calibrate the hang timeout once, before the workers are forked
+    fuzzer_helper.calibrated_hang_timeout(duckdb_cli)
+    # use 'fork': the workers fork again per candidate, which is only safe from a single threaded process
+    jobs = [(*issues[idx], duckdb_cli) for idx in to_reduce]
+    nr_workers = min(len(jobs), fuzzer_helper.NR_REPRODUCTION_WORKERS)
+    with multiprocessing.get_context('fork').Pool(nr_workers) as pool:
+        for idx, reduced_sql_bytes in zip(to_reduce, pool.imap(reduce_sql_issue, jobs)):
+            print(f"{fingerprint(*issues[idx][1:])}: {len(reduced[idx])} -> {len(reduced_sql_bytes)} bytes", flush=True)
+            reduced[idx] = reduced_sql_bytes
+    return reduced
+
+
+def reduce_sql_issue(job: tuple[bytes, str, str, Path]) -> bytes:
+    sql_statement_bytes, exception_msg, stacktrace, duckdb_cli = job
+    sql = bytes(sql_statement_bytes).decode(errors='surrogateescape')
+    is_interesting = create_oracle(sql, fingerprint(exception_msg, stacktrace), duckdb_cli)
+    reduced_sql = minimize_sql(sql, is_interesting, deadline=time.monotonic() + MINIMIZATION_BUDGET_S)
+    reduced_sql_bytes = reduced_sql.encode(errors='surrogateescape')
+    # keep the original if the reduction did not help (e.g. only whitespace differences)
+    if len(reduced_sql_bytes) >= len(sql_statement_bytes) or not is_interesting(reduced_sql):
+        return bytes(sql_statement_bytes)
+    return reduced_sql_bytes
+
+
+# returns a function that decides if a candidate reproduces a crash with the target fingerprint
+def create_oracle(sql: str, target: str, duckdb_cli: Path):
+    prefilter = crashes_in_fork(sql)
+    # candidates that hang are not interesting; don't wait for the full reproduction timeout
+    timeout = fuzzer_helper.calibrated_hang_timeout(duckdb_cli)
+
+    def is_interesting(candidate: str) -> bool:
+        if prefilter and not crashes_in_fork(candidate):
+            return False
+        sql_statement_bytes = candidate.encode(errors='surrogateescape')
+        _, stderr, returncode, timed_out, _ = fuzzer_helper.run_duckdb(duckdb_cli, sql_statement_bytes, timeout)
+        exception_msg, stacktrace = fuzzer_helper.classify_run(returncode, stderr, timed_out, 'sql_fuzzer', timeout)
+        return bool(exception_msg) and fingerprint(exception_msg, stacktrace) == target
+
+    return is_interesting
+
+
+# True if the sql crashes the duckdb python module, or raises an internal error
+# False if the duckdb python module is not installed; the candidates are then only checked with the duckdb cli
+def crashes_in_fork(sql: str) -> bool:
+    # only imported here; the reproduction scripts don't require the duckdb python module
+    try:
+        from forked_duckdb import execute_statements, run_in_fork
+    except ImportError:
+        return False
+    statements = [join_tokens(tokens) for tokens in split_sql_statements(sql)]
+    outcomes, _, returncode, timed_out = run_in_fork(execute_statements, statements, timeout=FORK_TIMEOUT_S)
+    if timed_out:
+        return False
+    return returncode < 0 or any(outcome == 'internal' for outcome, _ in outcomes or [])
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in range(1, 5):
+        sys.exit(
+            """
+            ERROR; call this script with the following arguments:
+              1 - (optional) directory with sql files, e.g. the 'crashes' dir created by the fuzzer
+              2 - (optional) path to duckdb cli (executable)
+              3 - (optional) output directory (default: '<input directory>_reduced')
+            """
+        )
+    main(sys.argv)
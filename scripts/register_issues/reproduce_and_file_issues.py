@@ -5,12 +5,17 @@ import os
 from pathlib import Path
 import sys
 
+from crash_buckets import CrashBuckets
 import fuzzer_helper
 import github_helper
+from minimize_file_reader_crashes import minimize_issues
+from prune_file_reader_arguments import prune_issues
+from result_store import record_issue_url, run_with_result_store
 
 
 def reproduce_crashes(reproduction_dir: Path, duckdb_cli, file_reader_function):
     unique_crashes = {}
+    buckets = CrashBuckets()
     # verify file _REPRODUCTIONS.json exists
     crashes_json_file = reproduction_dir / 'crashes/_REPRODUCTIONS.json'
     if not crashes_json_file.is_file():
@@ -23,21 +28,32 @@ def reproduce_crashes(reproduction_dir: Path, duckdb_cli, file_reader_function):
         repro_file_path = reproduction_dir / 'crashes' / repro_item['file_name']
         if not repro_file_path.is_file():
             raise ValueError(f"file not found: {repro_file_path}")
-    # reproduce crashes
+    # reproduce crashes (in parallel)
     count_reproducible = 0
-    for repro_item in reproduction_data:
-        repro_file_path = reproduction_dir / 'crashes' / repro_item['file_name']
-        arguments = ", " + repro_item['arguments'] if repro_item['arguments'] else ""
-        exception_msg, stacktrace = fuzzer_helper.reproduce_filereader_issue(
-            duckdb_cli, repro_file_path, file_reader_function, arguments
-        )
+    repro_items = [
+        (reproduction_dir / 'crashes' / repro_item['file_name'], ", " + repro_item['arguments'] if repro_item['arguments'] else "")
+        for repro_item in reproduction_data
+    ]
+    jobs = [
+        (fuzzer_helper.filereader_sql_statement(repro_file_path, file_reader_function, arguments), file_reader_function)
+        for repro_file_path, arguments in repro_items
+    ]
+    # inputs that were already reproduced with this duckdb cli are looked up in the result store
+    results = run_with_result_store(
+        duckdb_cli,
+        jobs,
+        lambda duckdb_cli, jobs: fuzzer_helper.run_sql_batched(duckdb_cli, jobs, isolate=False),
+        input_files=[repro_file_path for repro_file_path, _ in repro_items],
+    )
+    for (repro_file_path, arguments), (exception_msg, stacktrace) in zip(repro_items, results):
         if exception_msg:
             count_reproducible += 1
-        if exception_msg and exception_msg not in unique_crashes:
-            unique_crashes[exception_msg] = (repro_file_path, arguments, exception_msg, stacktrace)
-        print(f"{len(reproduction_data)} crashes found by fuzzer")
-        print(f"{count_reproducible} crashes could be reproduced")
-        print(f"{len(unique_crashes)} crashes are unique")
+            buckets.add(repro_file_path.name, exception_msg, stacktrace, (repro_file_path, arguments, exception_msg, stacktrace))
+    unique_crashes = buckets.representatives()
+    buckets.save_index(reproduction_dir / 'crashes_buckets.json')
+    print(f"{len(reproduction_data)} crashes found by fuzzer")
+    print(f"{count_reproducible} crashes could be reproduced")
+    print(f"{len(unique_crashes)} crashes are unique")
     return unique_crashes
 
 
@@ -55,37 +71,42 @@ def reproduce_hangs(reproduction_dir, duckdb_cli, file_reader_function):
         repro_file_path = reproduction_dir / 'hangs' / repro_item['file_name']
         if not repro_file_path.is_file():
             raise ValueError(f"file not found: {repro_file_path}")
-    # reproduce hangs (return as soon as 1 has been found)
+    # reproduce hangs in parallel, with a calibrated timeout (stop as soon as 1 has been confirmed)
     print(f"{len(reproduction_data)} hangs found by fuzzer")
-    for repro_item in reproduction_data:
-        repro_file_path = reproduction_dir / 'hangs' / repro_item['file_name']
-        arguments = ", " + repro_item['arguments'] if repro_item['arguments'] else ""
-        exception_msg, stacktrace = fuzzer_helper.reproduce_filereader_issue(
-            duckdb_cli, repro_file_path, file_reader_function, arguments
-        )
+    repro_items = [
+        (reproduction_dir / 'hangs' / repro_item['file_name'], ", " + repro_item['arguments'] if repro_item['arguments'] else "")
+        for repro_item in reproduction_data
+    ]
+    jobs = [
+        (fuzzer_helper.filereader_sql_statement(repro_file_path, file_reader_function, arguments), file_reader_function)
+        for repro_file_path, arguments in repro_items
+    ]
+    results = run_with_result_store(
+        duckdb_cli,
+        jobs,
+        fuzzer_helper.run_sql_hang_candidates,
+        input_files=[repro_file_path for repro_file_path, _ in repro_items],
+        max_one=True,
+    )
+    # the hang search continues after other errors (e.g. resource blowups); these are bucketed as their own issues
+    buckets = CrashBuckets()
+    for (repro_file_path, arguments), (exception_msg, stacktrace) in zip(repro_items, results):
         if exception_msg:
-            unique_hangs[exception_msg] = (repro_file_path, arguments, exception_msg, stacktrace)
-            print(f"hang could be reproduced (adding one unique case)")
-            return unique_hangs
-    if reproduction_data:
+            buckets.add(repro_file_path.name, exception_msg, stacktrace, (repro_file_path, arguments, exception_msg, stacktrace))
+    unique_hangs = buckets.representatives()
+    hang_found = bool(results) and fuzzer_helper.is_hang(results[-1][0])
+    if hang_found:
+        print(f"hang could be reproduced (adding one unique case)")
+    elif reproduction_data:
         print("hang could not be reproduced")
+    if len(unique_hangs) > hang_found:
+        print(f"{len(unique_hangs) - hang_found} other unique errors (e.g. resource blowups) found in the hangs")
     return unique_hangs
 
 
 def main(argv: list[str]):
     fuzz_scenario = argv[1]
-    match fuzz_scenario:
-        case 'csv_multi_param_fuzzer':
-            file_reader_function = 'read_csv'
-            file_type = 'csv'
-        case 'json_multi_param_fuzzer':
-            file_reader_function = 'read_json'
-            file_type = 'json'
-        case 'parquet_multi_param_fuzzer':
-            file_reader_function = 'read_parquet'
-            file_type = 'parquet'
-        case _:
-            raise ValueError(f"invalid input: {file_reader_function}")
+    file_reader_function, file_type = fuzz_target(fuzz_scenario)
 
     # default inputs (for local reproduction)
     reproduction_dir = Path("~/Desktop/reproductions").expanduser()
@@ -119,13 +140,9 @@ def main(argv: list[str]):
     rel_file_dir = f"reproduction_inputs/{file_type}"
     new_issues = {}
     for issue in unique_issues.values():
-        repro_file_path, arguments, exception_msg, stacktrace = issue
-        title = exception_msg[:200]
-        if not github_helper.is_known_github_issue(title):
-            repro_file_name = repro_file_path.name
-            rel_file_path = f"{rel_file_dir}/{repro_file_name}"
-            sql_statement_gh = f".sh wget {github_helper.file_url(rel_file_path)}\nfrom {file_reader_function}('{repro_file_name}'{arguments});"
-            new_issues[exception_msg] = (title, rel_file_path, repro_file_path, sql_statement_gh, exception_msg, stacktrace)
+        new_issue = find_new_issue(issue, file_reader_function, rel_file_dir)
+        if new_issue:
+            new_issues[new_issue[4]] = new_issue
     print(f"{len(new_issues)} new issues found by fuzzer")
 
     # dry run mode: early out
@@ -133,6 +150,56 @@ def main(argv: list[str]):
         print("running in dry run mode; no issues are created !")
         return
 
+    new_issues = reduce_new_issues(unique_issues, new_issues, duckdb_cli, file_reader_function, rel_file_dir)
+    file_new_issues(new_issues, duckdb_fuzzer_dir, rel_file_dir)
+    record_issue_urls(unique_issues, duckdb_cli, file_reader_function)
+
+
+# file reader function and file type of a multi param fuzzer
+def fuzz_target(fuzz_scenario: str) -> tuple[str, str]:
+    match fuzz_scenario:
+        case 'csv_multi_param_fuzzer':
+            return ('read_csv', 'csv')
+        case 'json_multi_param_fuzzer':
+            return ('read_json', 'json')
+        case 'parquet_multi_param_fuzzer':
+            return ('read_parquet', 'parquet')
+        case _:
+            raise ValueError(f"invalid input: {fuzz_scenario}")
+
+
+# returns the new issue (title, rel_file_path, repro_file_path, sql_statement_gh, exception_msg, stacktrace),
+# or None if the issue is already known
+def find_new_issue(issue: tuple, file_reader_function: str, rel_file_dir: str) -> tuple | None:
+    if github_helper.is_known_github_issue(issue[2][:200]):
+        return None
+    return new_issue_of(issue, file_reader_function, rel_file_dir)
+
+
+# (title, rel_file_path, repro_file_path, sql_statement_gh, exception_msg, stacktrace) of a reproduction
+def new_issue_of(issue: tuple, file_reader_function: str, rel_file_dir: str) -> tuple:
+    repro_file_path, arguments, exception_msg, stacktrace = issue
+    title = exception_msg[:200]
+    repro_file_name = repro_file_path.name
+    rel_file_path = f"{rel_file_dir}/{repro_file_name}"
+    sql_statement_gh = f".sh wget {github_helper.file_url(rel_file_path)}\nfrom {file_reader_function}('{repro_file_name}'{arguments});"
+    return (title, rel_file_path, repro_file_path, sql_statement_gh, exception_msg, stacktrace)
+
+
+# shrinks the reproductions of the new issues before they are filed: first the arguments are pruned, then the input
+# file is minimized (into a new file); the new issues are returned with the reduced reproduction.
+# unique_issues is not changed: the original reproductions are the keys of the results in the result store
+def reduce_new_issues(unique_issues: dict, new_issues: dict, duckdb_cli: Path, file_reader_function: str, rel_file_dir: str) -> dict:
+    issues = [issue for issue in unique_issues.values() if issue[2] in new_issues]
+    reduced_issues = prune_issues(issues, duckdb_cli, file_reader_function)
+    reduced_issues = minimize_issues(reduced_issues, duckdb_cli, file_reader_function)
+    for issue in reduced_issues:
+        new_issues[issue[2]] = new_issue_of(issue, file_reader_function, rel_file_dir)
+    return new_issues
+
+
+# commits the reproduction files to the duckdb-fuzzer repository, and files the issues
+def file_new_issues(new_issues: dict, duckdb_fuzzer_dir: Path, rel_file_dir: str):
     # commit reproduction files
     if new_issues:
         fuzzer_helper.run_command(f"mkdir -p {duckdb_fuzzer_dir / rel_file_dir}")
@@ -155,6 +222,13 @@ def main(argv: list[str]):
         )
 
 
+# records the issue urls (of both the known and the new issues) in the result store
+def record_issue_urls(unique_issues: dict, duckdb_cli: Path, file_reader_function: str):
+    for repro_file_path, arguments, exception_msg, stacktrace in unique_issues.values():
+        sql_statement_bytes = fuzzer_helper.filereader_sql_statement(repro_file_path, file_reader_function, arguments)
+        record_issue_url(duckdb_cli, sql_statement_bytes, exception_msg[:200], repro_file_path)
+
+
 if __name__ == "__main__":
     if len(sys.argv) not in range(2, 6):
         sys.exit(
@@ -6,6 +6,8 @@ import sys
 
 import fuzzer_helper
 import github_helper
+from reduce_sql_crashes import reduce_sql_issues
+from result_store import record_issue_url
 
 
 def main(argv: list[str]):
@@ -37,14 +39,21 @@ def main(argv: list[str]):
             new_issues[exception_msg] = (title, sql_statement_bytes, exception_msg, stacktrace)
     print(f"{len(new_issues)} new issues found by fuzzer")
 
+    # reduce the sql of the new issues (in parallel)
+    reduced_sql = reduce_sql_issues([issue[1:] for issue in new_issues.values()], duckdb_cli)
+
     # create github issues
-    for issue in new_issues.values():
+    for issue, reduced_sql_bytes in zip(new_issues.values(), reduced_sql):
         title, sql_statement_bytes, exception_msg, stacktrace = issue
-        sql_statement = sql_statement_bytes.decode(errors='backslashreplace')
+        sql_statement = reduced_sql_bytes.decode(errors='backslashreplace')
         fuzzer_helper.file_issue(
             title, sql_statement, exception_msg, stacktrace, "sql_fuzzer", 0, os.environ['DUCKDB_SHA']
         )
 
+    # record the issue urls (of both the known and the new issues) in the result store
+    for sql_statement_bytes, exception_msg, stacktrace in unique_issues.values():
+        record_issue_url(duckdb_cli, sql_statement_bytes, exception_msg[:200])
+
 
 if __name__ == "__main__":
     if len(sys.argv) not in range(1, 4):
@@ -7,32 +7,34 @@ Before running this script, the 'raw' crash cases should be pre-processed with s
 
 import os
 from pathlib import Path
-import re
 import sys
 import time
 import uuid
 
+from crash_buckets import CrashBuckets
 import fuzzer_helper
 import github_helper
+from result_store import record_issue_url, run_with_result_store
 
 
 def reproduce_storage_errors(storage_file_dir: Path, duckdb_cli: Path, max_one=False):
-    unique_errors = {}
+    buckets = CrashBuckets()
     all_storage_files = sorted(storage_file_dir.iterdir())
 
     print(f"reproducing errors in {len(all_storage_files)} storage files in dir {storage_file_dir} ...")
-    for repro_file_path in all_storage_files:
-        sql_statement = f"ATTACH '{repro_file_path}' AS tmp_db (READ_ONLY); use tmp_db; show tables;"
-        exception_msg, stacktrace = fuzzer_helper.run_sql(duckdb_cli, sql_statement.encode(), 'storage_fuzzer')
+    jobs = [
+        (fuzzer_helper.storage_sql_statement(repro_file_path), 'storage_fuzzer') for repro_file_path in all_storage_files
+    ]
+    # inputs that were already reproduced with this duckdb cli are looked up in the result store
+    run_jobs = fuzzer_helper.run_sql_hang_candidates if max_one else fuzzer_helper.run_sql_in_parallel
+    results = run_with_result_store(duckdb_cli, jobs, run_jobs, input_files=all_storage_files, max_one=max_one)
+    for repro_file_path, (exception_msg, stacktrace) in zip(all_storage_files, results):
         if exception_msg:
-            # ignore duplicates error messages that only have different numbers (only keep different line numbers from assertion errors)
-            exception_msg_pruned = re.sub(r'(?<!line )\b\d+\b', '', exception_msg)
-
-            unique_errors[exception_msg_pruned] = (repro_file_path, exception_msg, stacktrace)
-
-            if max_one:
-                break
-    return unique_errors
+            # duplicates are detected by the stack trace (or the error message without numbers, if there is no stack trace)
+            buckets.add(repro_file_path.name, exception_msg, stacktrace, (repro_file_path, exception_msg, stacktrace))
+    buckets.print_summary()
+    buckets.save_index(storage_file_dir.parent / f"{storage_file_dir.name}_buckets.json")
+    return buckets.representatives()
 
 
 def main(argv: list[str]):
@@ -100,6 +102,10 @@ def main(argv: list[str]):
             title, sql_statement_gh, exception_msg, stacktrace, os.environ['FUZZ_SCENARIO'], 0, os.environ['DUCKDB_SHA']
         )
 
+    # record the issue urls (of both the known and the new issues) in the result store
+    for repro_file_path, exception_msg, stacktrace in unique_issues.values():
+        record_issue_url(duckdb_cli, fuzzer_helper.storage_sql_statement(repro_file_path), exception_msg[:200], repro_file_path)
+
 
 if __name__ == "__main__":
     if len(sys.argv) not in range(1, 5):
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+'''
+Reproduces a set of inputs with several duckdb cli builds (e.g. release, relassert and debug builds, or builds of
+older commits), to see which builds are affected by a crash.
+All (input, duckdb cli) pairs are run in a pool of duckdb processes; results of earlier runs are looked up in the
+result store (see result_store.py).
+Inputs:
+    - input type: 'sql', 'storage', 'read_csv', 'read_json' or 'read_parquet'
+    - inputs:
+        - sql: a directory of sql files (e.g. fuzz_results/sql_fuzzer/default/crashes) or a single sql file
+        - storage: a directory of duckdb files or a single duckdb file
+        - read_csv, read_json, read_parquet: a reproductions directory (created by decode_multi_param_files.py)
+    - paths of the duckdb clis (executables)
+Output:
+    - table with the outcome per input and duckdb cli: '-' if the input does not reproduce an error, otherwise the
+      crash class and the fingerprint (see crash_buckets.py)
+    - the same results as json: <inputs>_matrix.json
+'''
+
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from crash_buckets import crash_class, fingerprint
+import fuzzer_helper
+from result_store import open_result_store, run_with_result_store
+
+
+def main(argv: list[str]):
+    input_type = argv[1]
+    inputs_path = Path(argv[2]).expanduser()
+    duckdb_clis = [Path(arg).expanduser() for arg in argv[3:]]
+    for duckdb_cli in duckdb_clis:
+        if not duckdb_cli.is_file():
+            raise ValueError(f"expected file not found: {duckdb_cli}")
+
+    input_names, jobs, input_files = matrix_inputs(input_type, inputs_path)
+    print(f"reproducing {len(jobs)} inputs with {len(duckdb_clis)} duckdb clis ...")
+
+    # one thread per duckdb cli; the reproduction workers are divided over the duckdb clis
+    nr_workers = max(1, fuzzer_helper.NR_REPRODUCTION_WORKERS // len(duckdb_clis))
+    open_result_store()
+    with ThreadPoolExecutor(max_workers=len(duckdb_clis)) as executor:
+        futures = [
+            executor.submit(
+                run_with_result_store,
+                duckdb_cli,
+                jobs,
+                lambda duckdb_cli, jobs: fuzzer_helper.run_sql_in_parallel(duckdb_cli, jobs, nr_workers),
+                input_files,
+            )
+            for duckdb_cli in duckdb_clis
+        ]
+        results_per_cli = [future.result() for future in futures]
+
+    # matrix: input name -> one cell per duckdb cli
+    matrix = {
+        input_name: [outcome(*results[idx]) for results in results_per_cli] for idx, input_name in enumerate(input_names)
+    }
+    print_matrix(matrix, duckdb_clis)
+    matrix_file = inputs_path.parent / f"{inputs_path.stem}_matrix.json"
+    matrix_file.write_text(json.dumps({'duckdb_clis': [str(cli) for cli in duckdb_clis], 'matrix': matrix}, indent=4))
+    print(f"matrix written to {matrix_file}")
+
+
+# input names, jobs (sql_statement_bytes, fuzzer_name) and the input file per job (or None)
+def matrix_inputs(input_type: str, inputs_path: Path) -> tuple[list[str], list[tuple[bytes, str]], list[Path | None]]:
+    match input_type:
+        case 'sql':
+            sql_files = sorted(inputs_path.iterdir()) if inputs_path.is_dir() else [inputs_path]
+            sql_files = [sql_file for sql_file in sql_files if sql_file.name != 'README.txt']
+            jobs = [(bytearray(sql_file.read_bytes()), 'sql_fuzzer') for sql_file in sql_files]
+            return [sql_file.name for sql_file in sql_files], jobs, [None] * len(jobs)
+        case 'storage':
+            storage_files = sorted(inputs_path.iterdir()) if inputs_path.is_dir() else [inputs_path]
+            jobs = [(fuzzer_helper.storage_sql_statement(storage_file), 'storage_fuzzer') for storage_file in storage_files]
+            return [storage_file.name for storage_file in storage_files], jobs, storage_files
+        case 'read_csv' | 'read_json' | 'read_parquet':
+            reproduction_data = json.loads((inputs_path / '_REPRODUCTIONS.json').read_text())
+            repro_items = [
+                (inputs_path / repro_item['file_name'], ", " + repro_item['arguments'] if repro_item['arguments'] else "")
+                for repro_item in reproduction_data
+            ]
+            jobs = [
+                (fuzzer_helper.filereader_sql_statement(repro_file_path, input_type, arguments), input_type)
+                for repro_file_path, arguments in repro_items
+            ]
+            return [repro_file_path.name for repro_file_path, _ in repro_items], jobs, [path for path, _ in repro_items]
+        case _:
+            raise ValueError(f"invalid input type: {input_type}")
+
+
+def outcome(exception_msg: str, stacktrace: str) -> str:
+    if not exception_msg:
+        return '-'
+    return f"{crash_class(exception_msg)} {fingerprint(exception_msg, stacktrace)}"
+
+
+# the columns are numbered; the duckdb clis are listed above the table
+def print_matrix(matrix: dict[str, list[str]], duckdb_clis: list[Path]):
+    for idx, duckdb_cli in enumerate(duckdb_clis):
+        print(f"[{idx + 1}] {duckdb_cli}")
+    headers = ['input'] + [f"[{idx + 1}]" for idx in range(len(duckdb_clis))]
+    rows = [[input_name] + cells for input_name, cells in matrix.items()]
+    widths = [max(len(row[column]) for row in [headers] + rows) for column in range(len(headers))]
+    for row in [headers] + rows:
+        print('  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip())
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        sys.exit(
+            """
+            ERROR; call this script with the following arguments:
+              1 - input type: 'sql', 'storage', 'read_csv', 'read_json' or 'read_parquet'
+              2 - inputs: directory or file of sql inputs / storage files, or a reproductions directory
+                  (created by decode_multi_param_files.py) for the file readers
+              3 - path to duckdb cli (executable)
+              4... - (optional) paths to more duckdb clis
+            """
+        )
+    main(sys.argv)
@@ -0,0 +1,195 @@
+'''
+Persistent store of reproduction results, so inputs that were already reproduced with the same duckdb cli build
+(e.g. by an earlier CI run on the same fuzz results) are looked up instead of run again.
+Results are keyed by:
+    - the digest of the input: the sql statement, with the path of the input file (if any) replaced by the digest
+      of its content
+    - the digest of the duckdb cli executable
+Per input, the store records the outcome (exception message and stack trace; empty if the input does not reproduce
+an error), the fingerprint of the crash, the resource usage of the run and the url of the github issue.
+The resource usage of the inputs of a batch without errors is the usage of the whole batch (batch_size > 1), an upper
+bound of the usage of the input.
+In CI, the store is cached per fuzzer and duckdb commit (actions/cache), so reruns on the same commit reuse it.
+Settings (env variables):
+    - RESULT_STORE_FILE: sqlite database (default: ~/.cache/duckdb-aflplusplus/results.sqlite); 'none' disables the store
+'''
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from crash_buckets import fingerprint
+import fuzzer_helper
+import github_helper
+
+RESULT_STORE_FILE = os.environ.get('RESULT_STORE_FILE', '~/.cache/duckdb-aflplusplus/results.sqlite')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS results (
+    input_digest TEXT,
+    cli_digest TEXT,
+    exception_msg TEXT,
+    stacktrace TEXT,
+    fingerprint TEXT,
+    peak_rss_mb REAL,
+    user_cpu_s REAL,
+    sys_cpu_s REAL,
+    wall_s REAL,
+    issue_url TEXT,
+    recorded_at REAL,
+    batch_size INTEGER,
+    PRIMARY KEY (input_digest, cli_digest)
+)
+'''
+# columns added after the first version of the schema
+ADDED_COLUMNS = {'batch_size': 'INTEGER'}
+
+
+class ResultStore:
+    def __init__(self, store_file: Path):
+        store_file.parent.mkdir(parents=True, exist_ok=True)
+        self.store_file = store_file
+        # the store can be shared by threads (e.g. one per duckdb cli)
+        self.con = sqlite3.connect(store_file, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.con.execute(SCHEMA)
+        columns = [row[1] for row in self.con.execute("PRAGMA table_info(results)")]
+        for column, column_type in ADDED_COLUMNS.items():
+            if column not in columns:
+                self.con.execute(f"ALTER TABLE results ADD COLUMN {column} {column_type}")
+
+    # (exception_msg, stacktrace), or None if the input was not reproduced with this duckdb cli
+    def get(self, input_digest: str, cli_digest: str) -> tuple[str, str] | None:
+        with self.lock:
+            row = self.con.execute(
+                "SELECT exception_msg, stacktrace FROM results WHERE input_digest = ? AND cli_digest = ?",
+                (input_digest, cli_digest),
+            ).fetchone()
+        return tuple(row) if row else None
+
+    # the issue url of an earlier result is kept
+    def put(self, input_digest: str, cli_digest: str, exception_msg: str, stacktrace: str, usage: dict | None):
+        usage = usage or {}
+        with self.lock:
+            self.con.execute(
+                '''
+                INSERT INTO results (
+                    input_digest, cli_digest, exception_msg, stacktrace, fingerprint,
+                    peak_rss_mb, user_cpu_s, sys_cpu_s, wall_s, batch_size, recorded_at
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (input_digest, cli_digest) DO UPDATE SET
+                    exception_msg = excluded.exception_msg, stacktrace = excluded.stacktrace, fingerprint = excluded.fingerprint,
+                    peak_rss_mb = excluded.peak_rss_mb, user_cpu_s = excluded.user_cpu_s, sys_cpu_s = excluded.sys_cpu_s,
+                    wall_s = excluded.wall_s, batch_size = excluded.batch_size, recorded_at = excluded.recorded_at
+                ''',
+                (
+                    input_digest,
+                    cli_digest,
+                    exception_msg,
+                    stacktrace,
+                    fingerprint(exception_msg, stacktrace) if exception_msg else None,
+                    usage.get('peak_rss_mb'),
+                    usage.get('user_cpu_s'),
+                    usage.get('sys_cpu_s'),
+                    usage.get('wall_s'),
+                    usage.get('batch_size'),
+                    time.time(),
+                ),
+            )
+            self.con.commit()
+
+    def set_issue_url(self, input_digest: str, cli_digest: str, issue_url: str):
+        with self.lock:
+            self.con.execute(
+                "UPDATE results SET issue_url = ? WHERE input_digest = ? AND cli_digest = ?",
+                (issue_url, input_digest, cli_digest),
+            )
+            self.con.commit()
+
+
+def input_digest(sql_statement_bytes, input_file: Path | None = None) -> str:
+    sql_statement_bytes = bytes(sql_statement_bytes)
+    if input_file is not None:
+        file_digest = hashlib.sha256(Path(input_file).read_bytes()).hexdigest()
+        sql_statement_bytes = sql_statement_bytes.replace(str(input_file).encode(), file_digest.encode())
+    return hashlib.sha256(sql_statement_bytes).hexdigest()
+
+
+_cli_digests: dict[str, str] = {}
+
+
+def cli_digest(duckdb_cli) -> str:
+    if str(duckdb_cli) not in _cli_digests:
+        with open(duckdb_cli, 'rb') as f:
+            _cli_digests[str(duckdb_cli)] = hashlib.file_digest(f, 'sha256').hexdigest()
+    return _cli_digests[str(duckdb_cli)]
+
+
+# runs run_jobs(duckdb_cli, jobs) for the jobs (sql_statement_bytes, fuzzer_name) that are not in the store, and
+# stores their results; returns the (exception_msg, stacktrace) per job, in the order of the jobs
+# input_files: per job, the input file that is referenced by the sql statement (or None)
+# max_one: run_jobs stops after the first job that reproduces a hang; the results after it are omitted
+def run_with_result_store(duckdb_cli, jobs: list[tuple[bytes, str]], run_jobs, input_files=None, max_one=False):
+    store = open_result_store()
+    if store is None:
+        return run_jobs(duckdb_cli, jobs)
+    cli = cli_digest(duckdb_cli)
+    input_files = input_files or [None] * len(jobs)
+    digests = [input_digest(sql_statement_bytes, input_file) for (sql_statement_bytes, _), input_file in zip(jobs, input_files)]
+    results = [store.get(digest, cli) for digest in digests]
+    to_run = [idx for idx, result in enumerate(results) if result is None]
+    if max_one:
+        # no need to run the jobs after the first known hang
+        first_hang = next((idx for idx, result in enumerate(results) if result and fuzzer_helper.is_hang(result[0])), len(jobs))
+        to_run = [idx for idx in to_run if idx < first_hang]
+    nr_known = sum(result is not None for result in results)
+    print(f"{nr_known} of {len(jobs)} inputs looked up in result store {store.store_file}")
+    new_results = run_jobs(duckdb_cli, [jobs[idx] for idx in to_run]) if to_run else []
+    for idx, (exception_msg, stacktrace) in zip(to_run, new_results):
+        results[idx] = (exception_msg, stacktrace)
+        usage = fuzzer_helper.last_resource_usage(duckdb_cli, jobs[idx][0])
+        store.put(digests[idx], cli, exception_msg, stacktrace, usage)
+    if max_one:
+        first_hang = next((idx for idx, result in enumerate(results) if result and fuzzer_helper.is_hang(result[0])), len(jobs) - 1)
+        results = results[: first_hang + 1]
+    return results
+
+
+# single job version of run_with_result_store(), for callers that stream their jobs: run_job(duckdb_cli, sql_statement_bytes, fuzzer_name)
+# run_job can return None (e.g. if the run was cancelled); then nothing is stored, and None is returned
+def run_one_with_result_store(duckdb_cli, sql_statement_bytes, fuzzer_name, run_job, input_file=None) -> tuple[str, str] | None:
+    store = open_result_store()
+    if store is None:
+        return run_job(duckdb_cli, sql_statement_bytes, fuzzer_name)
+    digest = input_digest(sql_statement_bytes, input_file)
+    result = store.get(digest, cli_digest(duckdb_cli))
+    if result is None:
+        result = run_job(duckdb_cli, sql_statement_bytes, fuzzer_name)
+        if result is None:
+            return None
+        usage = fuzzer_helper.last_resource_usage(duckdb_cli, sql_statement_bytes)
+        store.put(digest, cli_digest(duckdb_cli), result[0], result[1], usage)
+    return result
+
+
+# records the url of the open issue that matches the title (e.g. the issue that was just filed for the input)
+def record_issue_url(duckdb_cli, sql_statement_bytes, title: str, input_file: Path | None = None):
+    store = open_result_store()
+    issue_url = github_helper.known_issue_url(title)
+    if store is not None and issue_url:
+        store.set_issue_url(input_digest(sql_statement_bytes, input_file), cli_digest(duckdb_cli), issue_url)
+
+
+_store = None
+
+
+# one store per process; None if the store is disabled
+def open_result_store() -> ResultStore | None:
+    global _store
+    if _store is None and RESULT_STORE_FILE.lower() != 'none':
+        _store = ResultStore(Path(RESULT_STORE_FILE).expanduser())
+    return _store
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+
+'''
+Triage of the fuzz results of a multi param fuzzer (read_csv, read_json or read_parquet) as a streaming pipeline.
+Instead of decoding all fuzz results first (decode_multi_param_files.py), then reproducing all of them and only then
+deduplicating them and checking github (reproduce_and_file_issues.py), the stages run concurrently (asyncio):
+    decode -> reproduce -> dedupe -> issue lookup
+The stages are connected by bounded queues: a stage that falls behind blocks the stages in front of it (backpressure),
+so the triage time is bounded by the slowest stage (the reproduction, with NR_REPRODUCTION_WORKERS duckdb processes),
+instead of by the sum of all stages.
+Every reproduced input is appended to a checkpoint file; if the script is restarted (e.g. after a cancelled job), the
+inputs in the checkpoint file are not decoded and reproduced again.
+Crashes are reproduced in batches (see fuzzer_helper.run_sql_batched()), and deduplicated by fingerprint (see
+crash_buckets.py). Hangs are reproduced with the calibrated hang timeout (see fuzzer_helper.py); once a hang is
+reproduced, the hang reproductions that are still running are cancelled, and the remaining hangs are skipped.
+Inputs:
+    - fuzz scenario ('csv_multi_param_fuzzer', 'json_multi_param_fuzzer' or 'parquet_multi_param_fuzzer')
+    - (optional) fuzz results directory, with the 'crashes' and 'hangs' dirs created by the fuzzer
+    - (optional) reproductions directory
+    - (optional) path to duckdb cli (executable)
+    - (optional) path to /duckdb/duckdb-fuzzer directory
+Output:
+    - reproductions directory with the decoded inputs and a _REPRODUCTIONS.json file per dir 'crashes' and 'hangs'
+      (same as decode_multi_param_files.py), crashes_buckets.json and the checkpoint file _TRIAGE_CHECKPOINT.jsonl
+    - github issues for the new crashes and hangs (unless dry run)
+'''
+
+import asyncio
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parents[1] / 'reproduction'))
+from crash_buckets import CrashBuckets, fingerprint
+from decode_multi_param_files import decode_file, decoded_file_name, decoder_settings
+import fuzzer_helper
+from reproduce_and_file_issues import file_new_issues, find_new_issue, fuzz_target, record_issue_urls, reduce_new_issues
+from result_store import cli_digest, run_one_with_result_store, run_with_result_store
+
+FUZZ_SRC_DIR = Path(__file__).parents[2] / 'src'
+CHECKPOINT_FILE_NAME = '_TRIAGE_CHECKPOINT.jsonl'
+# max nr of items waiting in front of a stage (per queue); the items of the decoded queue are batches of crashes
+# (REPRODUCTION_BATCH_SIZE inputs), or a single hang
+QUEUE_SIZE = int(os.environ.get('TRIAGE_QUEUE_SIZE') or 2 * fuzzer_helper.NR_REPRODUCTION_WORKERS)
+KINDS = ['crashes', 'hangs']
+
+
+def main(argv: list[str]):
+    fuzz_scenario = argv[1]
+    file_reader_function, file_type = fuzz_target(fuzz_scenario)
+
+    # default inputs (for local reproduction)
+    fuzz_result_dir = Path(f"~/Desktop/fuzz_results/{fuzz_scenario}/default").expanduser()
+    reproduction_dir = Path("~/Desktop/reproductions").expanduser()
+    duckdb_cli = Path("~/git/duckdb/build/debug/duckdb").expanduser()
+    duckdb_fuzzer_dir = Path("~/git/duckdb-fuzzer").expanduser()
+
+    if len(argv) > 2:
+        fuzz_result_dir = Path(argv[2]).expanduser()
+    if len(argv) > 3:
+        reproduction_dir = Path(argv[3]).expanduser()
+    if len(argv) > 4:
+        duckdb_cli = Path(argv[4]).expanduser()
+    if len(argv) > 5:
+        duckdb_fuzzer_dir = Path(argv[5]).expanduser()
+
+    # dry run mode:
+    # if 'FUZZEROFDUCKSKEY' is missing we assume it is a dry run
+    dry_run = False if ('FUZZEROFDUCKSKEY' in os.environ and len(os.environ['FUZZEROFDUCKSKEY']) > 0) else True
+
+    # verify duckdb_cli can be found
+    if not duckdb_cli.is_file():
+        raise ValueError(f"expected file not found: {duckdb_cli}")
+
+    rel_file_dir = f"reproduction_inputs/{file_type}"
+    pipeline = TriagePipeline(fuzz_result_dir, reproduction_dir, duckdb_cli, file_reader_function, rel_file_dir)
+    asyncio.run(pipeline.run())
+    pipeline.print_summary()
+
+    # dry run mode: early out
+    if dry_run:
+        print("running in dry run mode; no issues are created !")
+        return
+
+    new_issues = reduce_new_issues(pipeline.unique_issues, pipeline.new_issues, duckdb_cli, file_reader_function, rel_file_dir)
+    file_new_issues(new_issues, duckdb_fuzzer_dir, rel_file_dir)
+    record_issue_urls(pipeline.unique_issues, duckdb_cli, file_reader_function)
+
+
+class TriagePipeline:
+    def __init__(self, fuzz_result_dir: Path, reproduction_dir: Path, duckdb_cli: Path, file_reader_function: str, rel_file_dir: str):
+        self.fuzz_result_dir = fuzz_result_dir
+        self.reproduction_dir = reproduction_dir
+        self.duckdb_cli = duckdb_cli
+        self.file_reader_function = file_reader_function
+        self.rel_file_dir = rel_file_dir
+        self.parameters, self.extension = decoder_settings(file_reader_function, FUZZ_SRC_DIR)
+        self.checkpoint_file = reproduction_dir / CHECKPOINT_FILE_NAME
+
+        # kind -> entries of _REPRODUCTIONS.json
+        self.reproductions: dict[str, list[dict]] = {kind: [] for kind in KINDS}
+        self.counts = {'found': {kind: 0 for kind in KINDS}, 'reproduced': {kind: 0 for kind in KINDS}, 'resumed': 0}
+        self.buckets = CrashBuckets()
+        # set by the dedupe stage; cancels the hang reproductions that are still running
+        self.hang_found = threading.Event()
+        # exception_msg -> (repro_file_path, arguments, exception_msg, stacktrace), like reproduce_and_file_issues.py
+        self.unique_issues: dict[str, tuple] = {}
+        self.new_issues: dict[str, tuple] = {}
+
+    async def run(self):
+        checkpoint = self.read_checkpoint()
+        for kind in KINDS:
+            (self.reproduction_dir / kind).mkdir(parents=True, exist_ok=True)
+            # remove the inputs of an earlier run that were decoded, but not reproduced (they are decoded again);
+            # minimized files (see minimize_file_reader_crashes.py) are kept
+            checkpoint_files = {entry['file_name'] for entry in checkpoint.values() if entry['kind'] == kind}
+            for decoded_file in (self.reproduction_dir / kind).glob(f"*{self.extension}"):
+                if decoded_file.name not in checkpoint_files and not decoded_file.stem.endswith('_minimized'):
+                    decoded_file.unlink()
+        decoded_queue: asyncio.Queue = asyncio.Queue(QUEUE_SIZE)
+        reproduced_queue: asyncio.Queue = asyncio.Queue(QUEUE_SIZE)
+        unique_queue: asyncio.Queue = asyncio.Queue(QUEUE_SIZE)
+
+        # the duckdb processes and the github requests run in threads; one per reproduction worker, plus one per stage
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(fuzzer_helper.NR_REPRODUCTION_WORKERS + 3))
+        with self.checkpoint_file.open('a') as checkpoint_fd:
+            async with asyncio.TaskGroup() as task_group:
+                task_group.create_task(self.decode_stage(checkpoint, decoded_queue, reproduced_queue))
+                task_group.create_task(self.reproduce_stage(decoded_queue, reproduced_queue, checkpoint_fd))
+                task_group.create_task(self.dedupe_stage(reproduced_queue, unique_queue))
+                task_group.create_task(self.lookup_stage(unique_queue))
+
+        for kind in KINDS:
+            with (self.reproduction_dir / kind / '_REPRODUCTIONS.json').open('w') as reproduction_file:
+                json.dump(self.reproductions[kind], reproduction_file, indent=4)
+        self.buckets.save_index(self.reproduction_dir / 'crashes_buckets.json')
+
+    # checkpoint entries (reproduced with this duckdb cli) per (kind, fuzz file name)
+    def read_checkpoint(self) -> dict[tuple[str, str], dict]:
+        checkpoint = {}
+        if self.checkpoint_file.is_file():
+            cli = cli_digest(self.duckdb_cli)
+            for line in self.checkpoint_file.read_text().splitlines():
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # last line of a run that was killed while writing it
+                    continue
+                if entry['cli_digest'] == cli and (self.reproduction_dir / entry['kind'] / entry['file_name']).is_file():
+                    checkpoint[(entry['kind'], entry['fuzz_file'])] = entry
+        return checkpoint
+
+    # decodes the fuzz results (crashes first); inputs in the checkpoint are passed on to the dedupe stage directly
+    async def decode_stage(self, checkpoint: dict, decoded_queue: asyncio.Queue, reproduced_queue: asyncio.Queue):
+        crash_batch = []
+        for kind in KINDS:
+            kind_dir = self.fuzz_result_dir / kind
+            fuzz_files = sorted(kind_dir.iterdir()) if kind_dir.is_dir() else []
+            for fuzz_file in fuzz_files:
+                if fuzz_file.name == "README.txt":
+                    # skip readme file that afl++ adds to the 'crashes' directory
+                    continue
+                self.counts['found'][kind] += 1
+                entry = checkpoint.get((kind, fuzz_file.name))
+                if entry:
+                    self.counts['resumed'] += 1
+                    self.reproductions[kind].append({'file_name': entry['file_name'], 'arguments': entry['arguments']})
+                    await reproduced_queue.put(entry)
+                    continue
+                argument_str, file_content = await asyncio.to_thread(decode_file, fuzz_file, self.parameters)
+                file_name = decoded_file_name(self.extension)
+                (self.reproduction_dir / kind / file_name).write_bytes(file_content)
+                self.reproductions[kind].append({'file_name': file_name, 'arguments': argument_str})
+                entry = {'kind': kind, 'fuzz_file': fuzz_file.name, 'file_name': file_name, 'arguments': argument_str}
+                if kind == 'hangs':
+                    await decoded_queue.put([entry])
+                    continue
+                crash_batch.append(entry)
+                if len(crash_batch) == fuzzer_helper.REPRODUCTION_BATCH_SIZE:
+                    await decoded_queue.put(crash_batch)
+                    crash_batch = []
+            if crash_batch:
+                await decoded_queue.put(crash_batch)
+                crash_batch = []
+        for _ in range(fuzzer_helper.NR_REPRODUCTION_WORKERS):
+            await decoded_queue.put(None)
+
+    async def reproduce_stage(self, decoded_queue: asyncio.Queue, reproduced_queue: asyncio.Queue, checkpoint_fd):
+        hang_timeout = await asyncio.to_thread(fuzzer_helper.calibrated_hang_timeout, self.duckdb_cli)
+        cli = cli_digest(self.duckdb_cli)
+
+        async def worker():
+            while (entries := await decoded_queue.get()) is not None:
+                if entries[0]['kind'] == 'hangs':
+                    if self.hang_found.is_set():
+                        continue
+                    result = await asyncio.to_thread(self.reproduce_hang, entries[0], hang_timeout)
+                    if result is None:
+                        # cancelled; not written to the checkpoint, so it is tried again if the script is restarted
+                        continue
+                    results = [result]
+                else:
+                    results = await asyncio.to_thread(self.reproduce_crashes, entries)
+                for entry, (exception_msg, stacktrace) in zip(entries, results):
+                    entry['exception_msg'], entry['stacktrace'] = exception_msg, stacktrace
+                    entry['cli_digest'] = cli
+                    checkpoint_fd.write(json.dumps(entry) + "\n")
+                    checkpoint_fd.flush()
+                    await reproduced_queue.put(entry)
+
+        await asyncio.gather(*[worker() for _ in range(fuzzer_helper.NR_REPRODUCTION_WORKERS)])
+        await reproduced_queue.put(None)
+
+    def sql_statement(self, entry: dict) -> bytearray:
+        arguments = ", " + entry['arguments'] if entry['arguments'] else ""
+        return fuzzer_helper.filereader_sql_statement(self.repro_file_path(entry), self.file_reader_function, arguments)
+
+    def repro_file_path(self, entry: dict) -> Path:
+        return self.reproduction_dir / entry['kind'] / entry['file_name']
+
+    # one batch per worker: the batch is bisected by a single duckdb process at a time
+    def reproduce_crashes(self, entries: list[dict]) -> list[tuple[str, str]]:
+        jobs = [(self.sql_statement(entry), self.file_reader_function) for entry in entries]
+
+        def run_jobs(duckdb_cli, jobs):
+            return fuzzer_helper.run_sql_batched(duckdb_cli, jobs, isolate=False, nr_workers=1)
+
+        # inputs that were already reproduced with this duckdb cli are looked up in the result store
+        input_files = [self.repro_file_path(entry) for entry in entries]
+        return run_with_result_store(self.duckdb_cli, jobs, run_jobs, input_files=input_files)
+
+    # None if the reproduction is cancelled, because another hang was reproduced in the meantime
+    def reproduce_hang(self, entry: dict, timeout) -> tuple[str, str] | None:
+        def run_job(duckdb_cli, sql_statement_bytes, fuzzer_name):
+            result = fuzzer_helper.run_sql(duckdb_cli, sql_statement_bytes, fuzzer_name, self.hang_found, timeout)
+            result = fuzzer_helper.confirm_hang(duckdb_cli, sql_statement_bytes, fuzzer_name, result, timeout, self.hang_found)
+            # a cancelled run looks like a timeout
+            return None if self.hang_found.is_set() and fuzzer_helper.is_hang(result[0]) else result
+
+        sql_statement_bytes = self.sql_statement(entry)
+        return run_one_with_result_store(
+            self.duckdb_cli, sql_statement_bytes, self.file_reader_function, run_job, self.repro_file_path(entry)
+        )
+
+    # keeps the first input per crash bucket (keyed by fingerprint, see crash_buckets.py), and the first hang
+    async def dedupe_stage(self, reproduced_queue: asyncio.Queue, unique_queue: asyncio.Queue):
+        while (entry := await reproduced_queue.get()) is not None:
+            kind, exception_msg, stacktrace = entry['kind'], entry['exception_msg'], entry['stacktrace']
+            if not exception_msg:
+                continue
+            self.counts['reproduced'][kind] += 1
+            issue = (self.repro_file_path(entry), ", " + entry['arguments'] if entry['arguments'] else "", exception_msg, stacktrace)
+            # other errors of hang candidates (e.g. resource blowups) are bucketed like crashes
+            if kind == 'hangs' and fuzzer_helper.is_hang(exception_msg):
+                if self.hang_found.is_set():
+                    continue
+                self.hang_found.set()
+                print("hang could be reproduced (adding one unique case)")
+            elif not self.buckets.add(entry['file_name'], exception_msg, stacktrace, issue):
+                continue
+            # like CrashBuckets.representatives(): the first input of a bucket is the issue of the bucket
+            issue_fingerprint = fingerprint(exception_msg, stacktrace, self.buckets.nr_frames)
+            if issue_fingerprint in self.unique_issues:
+                continue
+            self.unique_issues[issue_fingerprint] = issue
+            await unique_queue.put(issue)
+        await unique_queue.put(None)
+
+    # only keeps the issues that are not known on github
+    async def lookup_stage(self, unique_queue: asyncio.Queue):
+        while (issue := await unique_queue.get()) is not None:
+            new_issue = await asyncio.to_thread(find_new_issue, issue, self.file_reader_function, self.rel_file_dir)
+            if new_issue:
+                print(f"new issue: {new_issue[0]}")
+                self.new_issues[new_issue[4]] = new_issue
+
+    def print_summary(self):
+        if self.counts['resumed']:
+            print(f"{self.counts['resumed']} inputs resumed from checkpoint file {self.checkpoint_file}")
+        for kind in KINDS:
+            print(f"{self.counts['found'][kind]} {kind} found by fuzzer")
+            print(f"{self.counts['reproduced'][kind]} {kind} could be reproduced")
+        if self.counts['found']['hangs'] and not self.hang_found.is_set():
+            print("hang could not be reproduced")
+        print(f"{len(self.buckets.buckets)} crashes are unique")
+        print(f"{len(self.unique_issues)} total unique and reproducible errors found by fuzzer")
+        print(f"{len(self.new_issues)} new issues found by fuzzer")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in range(2, 7):
+        sys.exit(
+            """
+            ERROR; call this script with the following arguments:
+              1 - fuzz scenario ('csv_multi_param_fuzzer', 'json_multi_param_fuzzer' or 'parquet_multi_param_fuzzer')
+              2 - (optional) fuzz results directory, with the 'crashes' and 'hangs' dirs created by the fuzzer
+              3 - (optional) path to reproductions directory
+              4 - (optional) path to duckdb cli (executable)
+              5 - (optional) path to /duckdb/duckdb-fuzzer directory
+            """
+        )
+    main(sys.argv)
@@ -36,18 +36,7 @@ def main(argv: list[str]):
         INPUT_DIR = Path(argv[2]).expanduser()
         OUTPUT_DIR = Path(argv[3]).expanduser()
 
-    match target_function:
-        case 'read_csv':
-            parameters = read_tuples_from_cpp(FUZZ_SRC_DIR / 'csv_parameters.cpp')
-            extension = '.csv'
-        case 'read_json':
-            parameters = read_tuples_from_cpp(FUZZ_SRC_DIR / 'json_parameters.cpp')
-            extension = '.json'
-        case 'read_parquet':
-            parameters = read_tuples_from_cpp(FUZZ_SRC_DIR / 'parquet_parameters.cpp')
-            extension = '.parquet'
-        case _:
-            raise ValueError(f"invalid input: {target_function}")
+    parameters, extension = decoder_settings(target_function, FUZZ_SRC_DIR)
 
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     reproductions = []
@@ -56,7 +45,7 @@ def main(argv: list[str]):
             # skip readme file that afl++ adds to the 'crashes' directory
             continue
         argument_str, file_content = decode_file(fuzz_file, parameters)
-        file_name = f"{time.strftime(r"%Y%m%d")}_{uuid.uuid4().hex[:6]}{extension}"
+        file_name = decoded_file_name(extension)
         (OUTPUT_DIR / file_name).write_bytes(file_content)
         reproductions.append({'file_name': file_name, 'arguments': argument_str})
 
@@ -64,6 +53,23 @@ def main(argv: list[str]):
         json.dump(reproductions, reproduction_file, indent=4)
 
 
+# parameters (name, type) and file extension of the target function
+def decoder_settings(target_function: str, fuzz_src_dir: Path) -> tuple[list[tuple[str, str]], str]:
+    match target_function:
+        case 'read_csv':
+            return (read_tuples_from_cpp(fuzz_src_dir / 'csv_parameters.cpp'), '.csv')
+        case 'read_json':
+            return (read_tuples_from_cpp(fuzz_src_dir / 'json_parameters.cpp'), '.json')
+        case 'read_parquet':
+            return (read_tuples_from_cpp(fuzz_src_dir / 'parquet_parameters.cpp'), '.parquet')
+        case _:
+            raise ValueError(f"invalid input: {target_function}")
+
+
+def decoded_file_name(extension: str) -> str:
+    return f"{time.strftime('%Y%m%d')}_{uuid.uuid4().hex[:6]}{extension}"
+
+
 def decode_file(fuzz_file: Path, parameters: list[tuple[str, str]]) -> tuple[str, str]:
     content = fuzz_file.read_bytes()
     nr_bytes = len(content)
@@ -2,91 +2,140 @@
 
 '''
 Script to reproduce the crash-cases created by fuzzer: csv_single_param_fuzzer
-Note that the content of 'SCENARIOS' should be equal to the scenarios used in csv_single_param_fuzzer.cpp
-to correctly reproduce the error case
+The first byte of a fuzz input selects the parameter scenario; the scenarios are read from csv_single_param_fuzzer.cpp,
+so they are always equal to the scenarios used during fuzzing.
+The cases are decoded and reproduced in parallel (env variable 'NR_REPRODUCTION_WORKERS'), with the arguments of
+their scenario. If a case reproduces an error, it is also run without arguments to see if the scenario is needed,
+unless this is already known for the crash class of the error (same fingerprint, see crash_buckets.py).
+Inputs (all optional):
+    - directory with the fuzz results, e.g. the 'crashes' dir created by the fuzzer
+    - output directory
+    - path to duckdb cli (executable); should be compiled with: BUILD_JSON=1 CRASH_ON_ASSERT=1
+Output:
+    - a directory per scenario with the reproducible cases: 'scenario_<idx>_<parameter>', or 'scenario_without_params'
+      if the error can be reproduced without the arguments
+    - _SCENARIOS.json: the arguments and the exception message of the cases, per scenario directory
 '''
 
-from pathlib import Path
-import subprocess
+import functools
+import json
+import re
 import shutil
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parents[1] / 'register_issues'))
+from crash_buckets import fingerprint
+import fuzzer_helper
+
+FUZZ_SRC_DIR = Path(__file__).parents[2] / 'src'
+FUZZER_NAME = 'csv_single_param_fuzzer'
+NO_PARAMS_DIR_NAME = 'scenario_without_params'
+
+# c++ escape sequences in the string literals of the scenario table
+CPP_ESCAPES = {'n': '\n', 'r': '\r', 't': '\t', '0': '\0'}
+
+
+def main(argv: list[str]):
+    fuzz_result_dir = Path(argv[1] if len(argv) > 1 else "~/Desktop/crashes").expanduser()
+    reproduction_dir = Path(argv[2] if len(argv) > 2 else "~/Desktop/csv_issues").expanduser()
+    duckdb_cli = Path(argv[3] if len(argv) > 3 else "~/git/duckdb/build/release/duckdb").expanduser()
+    if not duckdb_cli.is_file():
+        raise ValueError(f"expected file not found: {duckdb_cli}")
+
+    scenarios = read_scenarios_from_cpp(FUZZ_SRC_DIR / f"{FUZZER_NAME}.cpp")
+    reproduction_dir.mkdir(parents=True, exist_ok=True)
+    # skip readme file that afl++ adds to the 'crashes' directory
+    fuzz_files = [fuzz_file for fuzz_file in sorted(fuzz_result_dir.iterdir()) if fuzz_file.name != "README.txt"]
+
+    # fingerprint -> whether the error can be reproduced without arguments
+    reproduces_without_params: dict[str, bool] = {}
+    lock = threading.Lock()
+
+    def reproduce(count_and_file):
+        count, fuzz_file = count_and_file
+        case_file = reproduction_dir / f"case_{count}"
+        return reproduce_case(fuzz_file, case_file, scenarios, duckdb_cli, reproduces_without_params, lock)
+
+    with ThreadPoolExecutor(max_workers=fuzzer_helper.NR_REPRODUCTION_WORKERS) as executor:
+        results = list(executor.map(reproduce, enumerate(fuzz_files)))
+
+    # scenario directory -> cases
+    grouped_cases: dict[str, list[dict]] = {}
+    for case_name, scenario_dir_name, arguments, exception_msg in results:
+        if scenario_dir_name:
+            grouped_cases.setdefault(scenario_dir_name, []).append(
+                {'file_name': case_name, 'arguments': arguments, 'exception_msg': exception_msg}
+            )
+    (reproduction_dir / '_SCENARIOS.json').write_text(json.dumps(grouped_cases, indent=4))
+    for scenario_dir_name, cases in sorted(grouped_cases.items()):
+        print(f"{len(cases)} cases - {scenario_dir_name}")
+    print(f"{sum(len(cases) for cases in grouped_cases.values())} of {len(fuzz_files)} cases could be reproduced")
+
+
+# returns (case name, scenario directory name or None if not reproducible, arguments, exception message)
+def reproduce_case(
+    fuzz_file: Path, case_file: Path, scenarios: list[str], duckdb_cli: Path, reproduces_without_params: dict, lock
+):
+    content = bytearray(fuzz_file.read_bytes())
+
+    # determine scenario based on first byte (same as GetParameterString() in the fuzzer; an empty input has no scenario)
+    scenario_idx = content.pop(0) % len(scenarios) if content and scenarios else None
+    arguments = scenarios[scenario_idx] if scenario_idx is not None else ""
+
+    # create input file for reproduction: NOTE: first byte has been popped!
+    case_file.write_bytes(content)
+    exception_msg, stacktrace = run_case(duckdb_cli, case_file, arguments)
+    if not exception_msg:
+        case_file.unlink()  # delete the file, only keep reproducible cases
+        print(f"{case_file.name}: non-rep")
+        return (case_file.name, None, arguments, "")
+
+    # is the scenario needed to reproduce the error? (only run without arguments for unknown crash classes)
+    bucket = fingerprint(exception_msg, stacktrace)
+    with lock:
+        without_params = reproduces_without_params.get(bucket)
+    if without_params is None:
+        without_params = not arguments or bool(run_case(duckdb_cli, case_file, "")[0])
+        with lock:
+            reproduces_without_params.setdefault(bucket, without_params)
+
+    if without_params:
+        scenario_dir_name = NO_PARAMS_DIR_NAME
+    else:
+        scenario_dir_name = f"scenario_{scenario_idx}_{arguments.split('=')[0].strip()}"
+    scenario_dir = case_file.parent / scenario_dir_name
+    scenario_dir.mkdir(parents=True, exist_ok=True)
+    shutil.move(case_file, scenario_dir / case_file.name)
+    print(f"{case_file.name} - {arguments if not without_params else 'NO ARG'} - {exception_msg}")
+    return (case_file.name, scenario_dir_name, arguments, exception_msg)
+
+
+def run_case(duckdb_cli: Path, case_file: Path, arguments: str) -> tuple[str, str]:
+    sql_statement_bytes = fuzzer_helper.filereader_sql_statement(case_file, 'read_csv', f", {arguments}" if arguments else "")
+    return fuzzer_helper.run_sql(duckdb_cli, sql_statement_bytes, FUZZER_NAME)
+
 
-# duckdb should be compiled with: BUILD_JSON=1 CRASH_ON_ASSERT=1
-DUCKDB_PATH = Path("~/git/duckdb/build/release/duckdb").expanduser()
-FUZZ_RESULT_PATH = Path("~/Desktop/crashes").expanduser()
-REPRODUCTION_PATH = Path("~/Desktop/csv_issues").expanduser()
-
-# scenarios copied from csv_single_param_fuzzer.cpp
-SCENARIOS = [
-    "all_varchar=true",
-    "allow_quoted_nulls=false",
-    "auto_detect=false",
-    "auto_type_candidates = ['BIGINT', 'DATE']",
-    "columns = {'col1': 'INTEGER', 'col2': 'VARCHAR'}",
-    "auto_detect=false, columns = {'col1': 'INTEGER', 'col2': 'VARCHAR'}",
-    "compression=gzip",
-    "dateformat='%d/%m/%Y'",
-    "decimal_separator=','",
-    "delim='@'",
-    "escape='@'",
-    "filename=true",
-    "force_not_null=[a]",
-    "header=false",
-    "hive_partitioning=true",
-    "ignore_errors=true",
-    "max_line_size=10",
-    "names=['apple','pear','banana']",
-    "new_line='\\r\\n'",
-    "normalize_names=true",
-    "null_padding=true",
-    "nullstr=['a', 'b']",
-    "parallel=false",
-    "quote=@",
-    "sample_size=1",
-    "sep='('",
-    "skip=1",
-    "timestampformat='%A, %-d %B %Y - %I:%M:%S %p'",
-    "types=['INTEGER','INTEGER']",
-    "dtypes={'a': 'DATE'}",
-    "union_by_name=true",
-]
-
-
-def main():
-    REPRODUCTION_PATH.mkdir(parents=True, exist_ok=True)
-
-    count = 0
-    for fuzz_file in sorted(FUZZ_RESULT_PATH.iterdir()):
-        content = bytearray(fuzz_file.read_bytes())
-
-        # determine scenario based on first byte
-        scenario_idx = content.pop(0) % len(SCENARIOS)
-        arguments = SCENARIOS[scenario_idx]
-
-        # create input file for reproduction: NOTE: first byte has been popped!
-        newfile = REPRODUCTION_PATH / f"case_{count}"
-        newfile.write_bytes(content)
-
-        # try to reproduce without extra arguments
-        res = subprocess.run(f"{DUCKDB_PATH} -c \"select * from read_csv('{newfile}');\"", shell=True, capture_output=True)
-        if res.returncode < 0 or res.returncode > 1:
-            scenariodir = REPRODUCTION_PATH / f"scenario_without_params"
-            scenariodir.mkdir(parents=True, exist_ok=True)
-            shutil.move(newfile, scenariodir)
-            print(f"{newfile.name} - NO ARG - {res.stderr}")
-        else:
-            # try to reproduce with extra arguments
-            res = subprocess.run(f"{DUCKDB_PATH} -c \"select * from read_csv('{newfile}', {arguments});\"", shell=True, capture_output=True)
-            if res.returncode < 0 or res.returncode > 1:
-                scenariodir = REPRODUCTION_PATH / f"scenario_{scenario_idx}_{arguments.split('=')[0].strip()}"
-                scenariodir.mkdir(parents=True, exist_ok=True)
-                shutil.move(newfile, scenariodir)
-                print(f"{newfile.name} - {arguments} - {res.stderr}")
-            else:
-                newfile.unlink()  # delete the file, only keep reproducible cases
-                print(f"{newfile.name}: non-rep; return code: {res.returncode}")
-
-        count += 1
+# the scenarios of GetParameterString(), in order
+@functools.cache
+def read_scenarios_from_cpp(cpp_source_file: Path) -> list[str]:
+    file_content = cpp_source_file.read_text()
+    scenarios = re.findall(r'parameter_scenarios\.push_back\("((?:[^"\\]|\\.)*)"\);', file_content)
+    if not scenarios:
+        raise ValueError(f"no parameter scenarios found in: {cpp_source_file}")
+    return [re.sub(r'\\(.)', lambda m: CPP_ESCAPES.get(m.group(1), m.group(1)), scenario) for scenario in scenarios]
 
 
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) not in range(1, 5):
+        sys.exit(
+            """
+            ERROR; call this script with the following arguments:
+              1 - (optional) directory with fuzz results, e.g. the 'crashes' dir created by the fuzzer
+              2 - (optional) output directory
+              3 - (optional) path to duckdb cli (executable)
+            """
+        )
+    main(sys.argv)
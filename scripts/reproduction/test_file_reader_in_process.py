@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+'''
+Script to reproduce the crashes of the multi param fuzzers (read_csv, read_json or read_parquet) in process,
+with the duckdb python module instead of the duckdb cli.
+The duckdb module is imported once; every case runs in a forked child process (see forked_duckdb.py), so there is
+no shell or cli startup per case. The children are spread over the cores (env variable 'NR_REPRODUCTION_WORKERS').
+Like test_file_reader_with_args.py, every file is first read without arguments; if that doesn't crash, it is read again
+with its arguments, in a new forked child (so the first read can't influence the outcome of the second).
+The outcome is classified in the same way as fuzzer_helper.run_sql() does for the duckdb cli.
+Note: to reproduce internal errors and assertions, the duckdb python module should be built from source with the
+same build flags as the duckdb cli (e.g. BUILD_JSON=1 CRASH_ON_ASSERT=1).
+Inputs:
+    - file reader function: 'read_csv', 'read_json' or 'read_parquet'
+    - (optional) a reproductions directory with file _REPRODUCTIONS.json (created by decode_multi_param_files.py)
+Output:
+    - the reproduced errors, and the number of cases per outcome
+'''
+
+import json
+import multiprocessing
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parents[1] / 'register_issues'))
+sys.path.append(str(Path(__file__).parents[1] / 'fuzz_utils'))
+import fuzzer_helper
+from forked_duckdb import execute_statements, run_in_fork
+
+ANSI_RESET = "\033[0m"
+ANSI_RED = "\033[91m"
+ANSI_GREEN = "\033[92m"
+
+
+def main(argv: list[str]):
+    file_reader_function = argv[1]
+    if file_reader_function not in ['read_csv', 'read_json', 'read_parquet']:
+        raise ValueError(f"invalid input: {file_reader_function}")
+    reproduction_dir = Path(argv[2] if len(argv) > 2 else "~/Desktop/reproductions").expanduser()
+
+    reproduction_data: list[dict] = json.loads((reproduction_dir / '_REPRODUCTIONS.json').read_text())
+    cases = [
+        (reproduction_dir / case['file_name'], ", " + case['arguments'] if case['arguments'] else "", file_reader_function)
+        for case in reproduction_data
+    ]
+
+    # the pool workers are forked before any duckdb connection is opened; each worker forks a child per case
+    counts = {'ok': 0, 'regular error': 0, 'internal error': 0, 'crash': 0, 'hang': 0}
+    with multiprocessing.get_context('fork').Pool(fuzzer_helper.NR_REPRODUCTION_WORKERS) as pool:
+        for (case_file, arguments, _), (outcome, exception_msg) in zip(cases, pool.imap(reproduce_case, cases)):
+            counts[outcome] += 1
+            if exception_msg:
+                print(f"{ANSI_RED}{case_file.name}{ANSI_RESET} ({arguments.lstrip(', ')}): {exception_msg}")
+
+    # print summary
+    print(f"{len(cases)} - scenarios executed")
+    for outcome, count in counts.items():
+        color = ANSI_GREEN if outcome in ['ok', 'regular error'] else ANSI_RED
+        print(f"{color}{count}{ANSI_RESET} - {outcome}")
+
+
+# returns the outcome ('ok', 'regular error', 'internal error', 'crash' or 'hang') and the exception message
+def reproduce_case(case: tuple[Path, str, str]) -> tuple[str, str]:
+    case_file, arguments, file_reader_function = case
+    result = reproduce_statement(case_file, "", file_reader_function)
+    if result[0] in ['ok', 'regular error'] and arguments:
+        result = reproduce_statement(case_file, arguments, file_reader_function)
+    return result
+
+
+# runs a single statement in its own forked child, with a fresh database
+def reproduce_statement(case_file: Path, arguments: str, file_reader_function: str) -> tuple[str, str]:
+    statement = fuzzer_helper.filereader_sql_statement(case_file, file_reader_function, arguments).decode()
+    timeout = fuzzer_helper.REPRODUCTION_TIMEOUT_S
+    outcomes, stderr, returncode, timed_out = run_in_fork(execute_statements, [statement], timeout=timeout)
+    if timed_out:
+        # same as fuzzer_helper.run_duckdb()
+        returncode = 42
+    elif returncode == 0 and outcomes[0][0] != 'ok':
+        # the child ran without crashing; the statement raised an error
+        returncode, stderr = 1, outcomes[0][1]
+    exception_msg, _ = fuzzer_helper.classify_run(returncode, stderr, timed_out, file_reader_function, timeout)
+    if timed_out:
+        return ('hang', exception_msg)
+    if returncode < 0:
+        return ('crash', exception_msg)
+    if exception_msg:
+        return ('internal error', exception_msg)
+    return ('ok' if returncode == 0 else 'regular error', '')
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in [2, 3]:
+        sys.exit(
+            """
+            ERROR; call this script with the following arguments:
+              1 - file reader function: 'read_csv', 'read_json' or 'read_parquet'
+              2 - (optional) path to reproductions directory (created by decode_multi_param_files.py)
+            """
+        )
+    main(sys.argv)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+'''
+Script to reproduce the crashes when using function 'read_csv', 'read_json' or 'read_parquet'
+(found by the multi param fuzzers), with the duckdb cli.
+Every file is first read without arguments; if that doesn't crash, it is read again with its arguments.
+The cases run in parallel, in a pool of duckdb processes (env variable 'NR_REPRODUCTION_WORKERS', default: nr of cores).
+The duckdb cli is run and its result is classified like in the other reproduction scripts (see fuzzer_helper.py);
+the sql is passed via stdin, so the argument strings don't need any quoting.
+Inputs:
+    - file reader function: 'read_csv', 'read_json' or 'read_parquet'
+    - (optional) a reproductions directory with file _REPRODUCTIONS.json (created by decode_multi_param_files.py)
+    - (optional) path to duckdb cli (executable); should be compiled with: BUILD_JSON=1 CRASH_ON_ASSERT=1 BUILD_JEMALLOC=1
+    - (optional) output file (default: _reproductions.jsonl in the reproductions directory)
+Output:
+    - one json object per case, per line: file_name, arguments, sql, returncode, outcome and stderr
+    - the number of cases per outcome
+'''
+
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parents[1] / 'register_issues'))
+import fuzzer_helper
+
+ANSI_RESET = "\033[0m"
+ANSI_RED = "\033[91m"
+ANSI_GREEN = "\033[92m"
+
+
+def main(argv: list[str]):
+    file_reader_function = argv[1]
+    if file_reader_function not in ['read_csv', 'read_json', 'read_parquet']:
+        raise ValueError(f"invalid input: {file_reader_function}")
+    reproduction_dir = Path(argv[2] if len(argv) > 2 else "~/Desktop/reproductions").expanduser()
+    duckdb_cli = Path(argv[3] if len(argv) > 3 else "~/git/duckdb/build/release/duckdb").expanduser()
+    results_file = Path(argv[4]).expanduser() if len(argv) > 4 else reproduction_dir / '_reproductions.jsonl'
+
+    if not duckdb_cli.is_file():
+        raise ValueError(f"expected file not found: {duckdb_cli}")
+    cases = get_test_cases(reproduction_dir)
+
+    counts = {'success': 0, 'regular error': 0, 'internal error': 0, 'crash': 0, 'hang': 0}
+    with ThreadPoolExecutor(max_workers=fuzzer_helper.NR_REPRODUCTION_WORKERS) as executor, results_file.open('w') as fd_results:
+        futures = [
+            executor.submit(
+                reproduce_case, duckdb_cli, file_reader_function, reproduction_dir / case['file_name'], case['arguments']
+            )
+            for case in cases
+        ]
+        for case, future in zip(cases, futures):
+            result = {'file_name': case['file_name'], 'arguments': case['arguments']} | future.result()
+            counts[result['outcome']] += 1
+            fd_results.write(json.dumps(result) + "\n")
+
+    # print summary
+    print(f"{len(cases)} - scenarios executed")
+    print(f"{ANSI_GREEN}{counts['success']}{ANSI_RESET} - scenarios with exit status 0 (OK)")
+    print(f"{ANSI_GREEN}{counts['regular error']}{ANSI_RESET} - scenarios with a regular error (assuming duckdb is compiled with CRASH_ON_ASSERT)")
+    print(f"{ANSI_RED}{counts['internal error']}{ANSI_RESET} - scenarios with an internal error (Internal Exception / Assertion Error / sanitizer)")
+    print(f"{ANSI_RED}{counts['crash']}{ANSI_RESET} - scenarios with crash")
+    print(f"{ANSI_RED}{counts['hang']}{ANSI_RESET} - scenarios that timed out after {fuzzer_helper.REPRODUCTION_TIMEOUT_S} s")
+    print(f"for details, see: {results_file}")
+
+
+def get_test_cases(reproduction_dir: Path) -> list[dict]:
+    reproduction_json = reproduction_dir / '_REPRODUCTIONS.json'
+    if not reproduction_json.is_file():
+        sys.exit(f"Error: file not found: {reproduction_json}")
+    cases: list[dict] = json.loads(reproduction_json.read_text())
+    for case in cases:
+        if 'file_name' not in case or 'arguments' not in case:
+            sys.exit(f"Error: ill formatted json file: {reproduction_json}")
+        case_file: Path = reproduction_dir / case['file_name']
+        if not case_file.is_file():
+            sys.exit(f"Error: file not found: {case_file}")
+    return cases
+
+
+def reproduce_case(duckdb_cli: Path, file_reader_function: str, case_file: Path, argument_str: str) -> dict:
+    file_path = str(case_file).replace("'", "''")
+    # try to reproduce without extra arguments
+    sql = f"select * from {file_reader_function}('{file_path}');"
+    result = run_duckdb(duckdb_cli, file_reader_function, sql)
+    if result['outcome'] in ['success', 'regular error'] and argument_str:
+        # try to reproduce with extra arguments
+        sql = f"select * from {file_reader_function}('{file_path}', {argument_str});"
+        result = run_duckdb(duckdb_cli, file_reader_function, sql)
+    return result
+
+
+def run_duckdb(duckdb_cli: Path, file_reader_function: str, sql: str) -> dict:
+    _, stderr, returncode, timed_out, _ = fuzzer_helper.run_duckdb(duckdb_cli, sql.encode())
+    exception_msg, _ = fuzzer_helper.classify_run(returncode, stderr, timed_out, file_reader_function)
+    if timed_out:
+        outcome = 'hang'
+    elif returncode == 0:
+        outcome = 'success'
+    elif not exception_msg:
+        outcome = 'regular error'
+    elif returncode < 0:
+        outcome = 'crash'
+    else:
+        outcome = 'internal error'
+    return {'sql': sql, 'returncode': None if timed_out else returncode, 'outcome': outcome, 'stderr': stderr}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in range(2, 6):
+        sys.exit(
+            """
+            ERROR; call this script with the following arguments:
+              1 - file reader function: 'read_csv', 'read_json' or 'read_parquet'
+              2 - (optional) path to reproductions directory (created by decode_multi_param_files.py)
+              3 - (optional) path to duckdb cli (executable)
+              4 - (optional) output file (default: _reproductions.jsonl in the reproductions directory)
+            """
+        )
+    main(sys.argv)
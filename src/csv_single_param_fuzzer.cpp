@@ -1,9 +1,8 @@
 #include "duckdb.hpp"
+#include "file_fuzzer_input.hpp"
 
-#include <fcntl.h>
 #include <iostream>
 #include <string>
-#include <unistd.h>
 #include <vector>
 
 std::string GetParameterString(uint8_t scenario_id) {
@@ -43,39 +42,22 @@ std::string GetParameterString(uint8_t scenario_id) {
 	return (parameter_scenarios.size() ? "," + parameter_scenarios[scenario_id % parameter_scenarios.size()] : "");
 }
 
-void FileReaderFuzzer(std::string file_read_function) {
-	uint8_t buf[4096];
-	uint8_t scenario_buf[1];
-
-	// create file from stdin
-	std::string filename = "temp_input_file";
-	int fd = open(filename.c_str(), O_CREAT | O_WRONLY | O_TRUNC, S_IRUSR | S_IWUSR);
-	if (fd < 0) {
-		std::cerr << "can't create data file: " << filename << std::endl;
-		exit(EXIT_FAILURE);
-	}
-
+duckdb::unique_ptr<duckdb::MaterializedQueryResult> FileReaderFuzzer(std::string file_read_function, duckdb::Connection &con,
+                                                                    TestCaseFile &test_case_file, const uint8_t *data,
+                                                                    size_t size) {
 	// read first char to determine parameter scneario
-	std::string parameter_string = (read(0, (void *)scenario_buf, 1)) ? GetParameterString(scenario_buf[0]) : "";
+	std::string parameter_string = size ? GetParameterString(data[0]) : "";
 
-	// create a file out of the remainder of the input
-	ssize_t n;
-	while (true) {
-		n = read(0, (void *)buf, 4096);
-		write(fd, (void *)buf, n);
-		if (n == 0) {
-			break;
-		}
-	}
-	close(fd);
+	// create a file out of the remainder of the test case
+	test_case_file.Write(size ? data + 1 : data, size ? size - 1 : 0);
 
 	// ingest file (to test if it crashes duckdb)
-	duckdb::DuckDB db(nullptr);
-	duckdb::Connection con(db);
-	// std::string query = "SELECT * FROM " + file_read_function + "('" + filename + "');";
-	std::string query = "SELECT * FROM " + file_read_function + "('" + filename + "'" + parameter_string + ");";
+	// std::string query = "SELECT * FROM " + file_read_function + "('" + test_case_file.path + "');";
+	std::string query =
+	    "SELECT * FROM " + file_read_function + "('" + test_case_file.path + "'" + parameter_string + ");";
 	duckdb::unique_ptr<duckdb::MaterializedQueryResult> q_result = con.Query(query);
 	std::cout << q_result->ToString() << std::endl;
+	return q_result;
 }
 
 int main() {
@@ -85,7 +67,9 @@ int main() {
 		std::cerr << "function '" + file_read_function + "' is not supported for csv_fuzzer_single_param" << std::endl;
 		exit(EXIT_FAILURE);
 	}
-	FileReaderFuzzer(file_read_function);
+	RunTestCases([&](duckdb::Connection &con, TestCaseFile &test_case_file, const uint8_t *data, size_t size) {
+		return FileReaderFuzzer(file_read_function, con, test_case_file, data, size);
+	});
 #else
 	static_assert(false, "error: DUCKDB_READ_FUNCTION not defined");
 #endif
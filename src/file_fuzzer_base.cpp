@@ -1,36 +1,20 @@
 #include "duckdb.hpp"
+#include "file_fuzzer_input.hpp"
 
-#include <fcntl.h>
 #include <iostream>
 #include <string>
-#include <unistd.h>
 
-void FileReaderFuzzer(std::string file_read_function) {
-	uint8_t buf[4096];
-
-	// create file from stdin
-	std::string filename = "temp_input_file";
-	int fd = open(filename.c_str(), O_CREAT | O_WRONLY | O_TRUNC, S_IRUSR | S_IWUSR);
-	if (fd < 0) {
-		std::cerr << "can't create data file: " << filename << std::endl;
-		exit(EXIT_FAILURE);
-	}
-	ssize_t n;
-	while (true) {
-		n = read(0, (void *)buf, 4096);
-		write(fd, (void *)buf, n);
-		if (n == 0) {
-			break;
-		}
-	}
-	close(fd);
+duckdb::unique_ptr<duckdb::MaterializedQueryResult> FileReaderFuzzer(std::string file_read_function, duckdb::Connection &con,
+                                                                    TestCaseFile &test_case_file, const uint8_t *data,
+                                                                    size_t size) {
+	// create file from the test case
+	test_case_file.Write(data, size);
 
 	// ingest file (to test if it crashes duckdb)
-	duckdb::DuckDB db(nullptr);
-	duckdb::Connection con(db);
-	std::string query = "SELECT * FROM " + file_read_function + "('" + filename + "');";
+	std::string query = "SELECT * FROM " + file_read_function + "('" + test_case_file.path + "');";
 	duckdb::unique_ptr<duckdb::MaterializedQueryResult> q_result = con.Query(query);
 	// std::cout << q_result->ToString() << std::endl;
+	return q_result;
 }
 
 int main() {
@@ -40,7 +24,9 @@ int main() {
 		std::cerr << "function '" + file_read_function + "' is not supported" << std::endl;
 		exit(EXIT_FAILURE);
 	}
-	FileReaderFuzzer(file_read_function);
+	RunTestCases([&](duckdb::Connection &con, TestCaseFile &test_case_file, const uint8_t *data, size_t size) {
+		return FileReaderFuzzer(file_read_function, con, test_case_file, data, size);
+	});
 #else
 	static_assert(false, "error: DUCKDB_READ_FUNCTION not defined");
 #endif
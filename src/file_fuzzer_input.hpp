@@ -0,0 +1,153 @@
+// test case delivery for the file reader fuzzers (file_fuzzer_base.cpp, file_fuzzer_multi_param.cpp and
+// csv_single_param_fuzzer.cpp)
+// - default: one test case per process, read from stdin, with a fresh database
+// - PERSISTENT_MODE (make PERSISTENT=1): afl++ persistent mode; the test cases are read from shared memory
+//   (__AFL_FUZZ_TESTCASE_BUF) in a loop (__AFL_LOOP), and one database instance is reused between the iterations.
+//   The database is created after the (deferred) fork server start, __AFL_INIT(), so every child has its own threads.
+//   With env variable FUZZ_STABILITY_CHECK=1, every test case also runs on a fresh database, and the fuzzer aborts if
+//   the outcome differs (state that leaks between iterations makes the fuzz results unreliable).
+// The test case is written to a memfd (or to 'temp_input_file' if memfd is not available), with a single write.
+// Without the afl++ compiler (e.g. 'make compile-fuzzers-local'), the afl++ macros fall back to reading stdin once.
+
+#pragma once
+
+#include "duckdb.hpp"
+
+#include <cstdint>
+#include <cstdlib>
+#include <fcntl.h>
+#include <functional>
+#include <iostream>
+#include <string>
+#include <sys/mman.h>
+#include <unistd.h>
+#include <vector>
+
+#define AFL_LOOP_ITERATIONS 10000
+
+std::vector<uint8_t> ReadStdin() {
+	std::vector<uint8_t> content;
+	uint8_t buf[4096];
+	ssize_t n;
+	while ((n = read(0, (void *)buf, 4096)) > 0) {
+		content.insert(content.end(), buf, buf + n);
+	}
+	return content;
+}
+
+#ifndef __AFL_FUZZ_TESTCASE_LEN
+// not compiled with afl-clang-fast: a single test case, read from stdin
+std::vector<uint8_t> g_stdin_test_case;
+
+bool ReadStdinTestCaseOnce() {
+	static bool done = false;
+	if (done) {
+		return false;
+	}
+	done = true;
+	g_stdin_test_case = ReadStdin();
+	return true;
+}
+
+#define __AFL_FUZZ_INIT()
+#define __AFL_INIT()
+#define __AFL_FUZZ_TESTCASE_BUF (g_stdin_test_case.data())
+#define __AFL_FUZZ_TESTCASE_LEN (g_stdin_test_case.size())
+#define __AFL_LOOP(x) ReadStdinTestCaseOnce()
+#endif
+
+#ifdef PERSISTENT_MODE
+__AFL_FUZZ_INIT();
+#endif
+
+// the file that is read by the file reader
+class TestCaseFile {
+public:
+	TestCaseFile() {
+#ifdef __linux__
+		fd = memfd_create("temp_input_file", 0);
+		if (fd >= 0) {
+			path = "/proc/self/fd/" + std::to_string(fd);
+			return;
+		}
+#endif
+		path = "temp_input_file";
+		fd = open(path.c_str(), O_CREAT | O_RDWR | O_TRUNC, S_IRUSR | S_IWUSR);
+		if (fd < 0) {
+			std::cerr << "can't create data file: " << path << std::endl;
+			exit(EXIT_FAILURE);
+		}
+	}
+
+	~TestCaseFile() {
+		close(fd);
+	}
+
+	// replaces the content of the file
+	void Write(const uint8_t *data, size_t size) {
+		if (ftruncate(fd, 0) != 0 || pwrite(fd, (const void *)data, size, 0) != (ssize_t)size) {
+			std::cerr << "can't write data file: " << path << std::endl;
+			exit(EXIT_FAILURE);
+		}
+	}
+
+	std::string path;
+
+private:
+	int fd;
+};
+
+// runs one test case: writes (part of) the test case to the file and reads it with the file reader
+typedef std::function<duckdb::unique_ptr<duckdb::MaterializedQueryResult>(duckdb::Connection &, TestCaseFile &,
+                                                                          const uint8_t *, size_t)>
+    FuzzOneFunction;
+
+// same error, or the same result (column names, types and values)
+bool SameOutcome(duckdb::MaterializedQueryResult &result, duckdb::MaterializedQueryResult &expected) {
+	if (result.HasError() || expected.HasError()) {
+		return result.HasError() == expected.HasError() && result.GetError() == expected.GetError();
+	}
+	return result.ToString() == expected.ToString();
+}
+
+void RunTestCases(const FuzzOneFunction &fuzz_one) {
+#ifdef PERSISTENT_MODE
+	// the fork server forks here; duckdb starts its scheduler threads when the database is created, and a forked child
+	// would not have these threads, so the database (and the test case file) are created per child, after the fork
+	__AFL_INIT();
+	TestCaseFile test_case_file;
+	duckdb::DuckDB db(nullptr);
+	duckdb::Connection con(db);
+	// the test case file is rewritten under the same name; don't cache its content between iterations
+	auto cache_result = con.Query("SET enable_external_file_cache=false;");
+	if (cache_result->HasError()) {
+		std::cerr << "can't disable the external file cache: " << cache_result->GetError() << std::endl;
+		exit(EXIT_FAILURE);
+	}
+	const char *stability_check_env = std::getenv("FUZZ_STABILITY_CHECK");
+	bool stability_check = stability_check_env && std::string(stability_check_env) == "1";
+
+	// the buffer address has to be taken after __AFL_INIT() and before __AFL_LOOP()
+	const uint8_t *buf = __AFL_FUZZ_TESTCASE_BUF;
+	while (__AFL_LOOP(AFL_LOOP_ITERATIONS)) {
+		size_t len = __AFL_FUZZ_TESTCASE_LEN;
+		duckdb::unique_ptr<duckdb::MaterializedQueryResult> q_result = fuzz_one(con, test_case_file, buf, len);
+		if (stability_check) {
+			duckdb::DuckDB fresh_db(nullptr);
+			duckdb::Connection fresh_con(fresh_db);
+			duckdb::unique_ptr<duckdb::MaterializedQueryResult> expected = fuzz_one(fresh_con, test_case_file, buf, len);
+			if (!SameOutcome(*q_result, *expected)) {
+				std::cerr << "stability check failed: the outcome with the reused database differs from a fresh database"
+				          << std::endl;
+				abort();
+			}
+		}
+	}
+#else
+	TestCaseFile test_case_file;
+	std::vector<uint8_t> test_case = ReadStdin();
+	duckdb::DuckDB db(nullptr);
+	duckdb::Connection con(db);
+	fuzz_one(con, test_case_file, test_case.data(), test_case.size());
+#endif
+}
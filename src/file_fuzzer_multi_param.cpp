@@ -1,42 +1,46 @@
 // fuzzer to call file readers read_csv(), read_json() and read_parquet() with multiple parameters.
 
 #include "duckdb.hpp"
+#include "file_fuzzer_input.hpp"
 
+#include <algorithm>
+#include <cstring>
 #include <exception>
-#include <fcntl.h>
 #include <iostream>
 #include <string>
-#include <unistd.h>
 
 #define MAX_ARGUMENT_LENGTH 255
 
 extern const std::vector<std::tuple<std::string, std::string>> g_all_parameters;
 
-void FileReaderFuzzer(std::string file_read_function) {
-	uint8_t file_buf[4096];
+duckdb::unique_ptr<duckdb::MaterializedQueryResult> FileReaderFuzzer(std::string file_read_function, duckdb::Connection &con,
+                                                                    TestCaseFile &test_case_file, const uint8_t *data,
+                                                                    size_t size) {
 	char argument_buf[MAX_ARGUMENT_LENGTH + 1];
 
-	std::string filename = "temp_input_file";
-	int fd = open(filename.c_str(), O_CREAT | O_WRONLY | O_TRUNC, S_IRUSR | S_IWUSR);
-	if (fd < 0) {
-		std::cerr << "can't create data file: " << filename << std::endl;
-		exit(EXIT_FAILURE);
-	}
+	// reads up to 'len' bytes of the test case (like read() on stdin)
+	size_t offset = 0;
+	auto read_test_case = [&](void *dest, size_t len) -> size_t {
+		size_t read_len = std::min(len, size - offset);
+		memcpy(dest, data + offset, read_len);
+		offset += read_len;
+		return read_len;
+	};
 
 	u_int8_t nr_parameters;
 	u_int8_t parameter_idx;
 	u_int8_t argument_length;
 	std::string total_parameter_string = "";
 	std::string parameter_string = "";
-	if (read(0, (void *)(&nr_parameters), 1)) {
+	if (read_test_case((void *)(&nr_parameters), 1)) {
 		for (u_int8_t i_param = 0; i_param < nr_parameters; i_param++) {
-			if (read(0, (void *)(&parameter_idx), 1) && read(0, (void *)(&argument_length), 1)) {
+			if (read_test_case((void *)(&parameter_idx), 1) && read_test_case((void *)(&argument_length), 1)) {
 				// take modulo to prevent invalid parameter_idx numbers
 				parameter_idx = parameter_idx % g_all_parameters.size();
 				std::string parameter_name = std::get<0>(g_all_parameters[parameter_idx]);
 				std::string parameter_type = std::get<1>(g_all_parameters[parameter_idx]);
 
-				ssize_t read_len = read(0, (void *)argument_buf, argument_length);
+				ssize_t read_len = read_test_case((void *)argument_buf, argument_length);
 				argument_buf[read_len] = '\0';
 				std::string argument_str;
 				int64_t argument_num;
@@ -71,23 +75,15 @@ void FileReaderFuzzer(std::string file_read_function) {
 		}
 	}
 
-	// create a file out of the remainder of the input
-	ssize_t n;
-	while (true) {
-		n = read(0, (void *)file_buf, 4096);
-		write(fd, (void *)file_buf, n);
-		if (n == 0) {
-			break;
-		}
-	}
-	close(fd);
+	// create a file out of the remainder of the test case
+	test_case_file.Write(data + offset, size - offset);
 
 	// ingest file (to test if it crashes duckdb)
-	duckdb::DuckDB db(nullptr);
-	duckdb::Connection con(db);
-	std::string query = "SELECT * FROM " + file_read_function + "('" + filename + "'" + total_parameter_string + ");";
+	std::string query =
+	    "SELECT * FROM " + file_read_function + "('" + test_case_file.path + "'" + total_parameter_string + ");";
 	duckdb::unique_ptr<duckdb::MaterializedQueryResult> q_result = con.Query(query);
 	// std::cout << q_result->ToString() << std::endl;
+	return q_result;
 }
 
 int main() {
@@ -97,7 +93,9 @@ int main() {
 		std::cerr << "function '" + file_read_function + "' is not supported for parameter_flex_fuzzer" << std::endl;
 		exit(EXIT_FAILURE);
 	}
-	FileReaderFuzzer(file_read_function);
+	RunTestCases([&](duckdb::Connection &con, TestCaseFile &test_case_file, const uint8_t *data, size_t size) {
+		return FileReaderFuzzer(file_read_function, con, test_case_file, data, size);
+	});
 #else
 	static_assert(false, "error: DUCKDB_READ_FUNCTION not defined");
 #endif
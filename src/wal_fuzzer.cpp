@@ -4,13 +4,103 @@
 #include <fstream>
 #include <iostream>
 #include <string>
+#include <sys/stat.h>
 #include <sys/wait.h>
 #include <unistd.h>
+#include <vector>
+#ifdef __linux__
+#include <linux/fs.h>
+#include <sys/ioctl.h>
+#endif
 
 /*
 Fuzzing the wal file.
 Note: all received wal file data will be processed with the same base database file!
+Every execution gets a fresh copy of the base database, without copying all bytes through user space:
+- a reflink (FICLONE) of the base database, if the file system supports it (e.g. btrfs, xfs)
+- otherwise: the base database is read into memory once, before the afl++ fork server starts (__AFL_INIT), and the
+  pristine image is written with a single write per execution
+Compile with -DLEGACY_BASE_DB_COPY=1 (make LEGACY_BASE_DB_COPY=1) to copy the base database with streams instead.
 */
+
+#ifndef LEGACY_BASE_DB_COPY
+// makes dst_fd a reflink of src_fd (replacing its content); returns false if the file system does not support it
+bool CloneFile(int src_fd, int dst_fd) {
+#ifdef FICLONE
+	return ioctl(dst_fd, FICLONE, src_fd) == 0;
+#else
+	return false;
+#endif
+}
+
+std::vector<char> ReadFile(const std::string &filepath) {
+	int fd = open(filepath.c_str(), O_RDONLY);
+	struct stat file_stat;
+	if (fd < 0 || fstat(fd, &file_stat) != 0) {
+		std::cerr << "can't read file: " << filepath << std::endl;
+		exit(EXIT_FAILURE);
+	}
+	std::vector<char> content(file_stat.st_size);
+	size_t offset = 0;
+	while (offset < content.size()) {
+		ssize_t n = pread(fd, content.data() + offset, content.size() - offset, offset);
+		if (n <= 0) {
+			std::cerr << "can't read file: " << filepath << std::endl;
+			exit(EXIT_FAILURE);
+		}
+		offset += n;
+	}
+	close(fd);
+	return content;
+}
+
+class BaseDatabase {
+public:
+	BaseDatabase(const std::string &base_db_filepath, const std::string &tmp_db_filepath)
+	    : tmp_db_filepath(tmp_db_filepath) {
+		base_fd = open(base_db_filepath.c_str(), O_RDONLY);
+		if (base_fd < 0) {
+			std::cerr << "can't open base database: " << base_db_filepath << std::endl;
+			exit(EXIT_FAILURE);
+		}
+		// probe once if the file system supports reflinks
+		int tmp_fd = OpenTmpDatabase();
+		use_reflink = CloneFile(base_fd, tmp_fd);
+		close(tmp_fd);
+		if (!use_reflink) {
+			image = ReadFile(base_db_filepath);
+		}
+	}
+
+	// (re)creates the tmp database as a fresh copy of the base database
+	void CopyToTmpDatabase() {
+		int tmp_fd = OpenTmpDatabase();
+		bool copied = use_reflink ? CloneFile(base_fd, tmp_fd)
+		                          : write(tmp_fd, image.data(), image.size()) == (ssize_t)image.size();
+		if (!copied) {
+			std::cerr << "can't copy base database to: " << tmp_db_filepath << std::endl;
+			exit(EXIT_FAILURE);
+		}
+		close(tmp_fd);
+	}
+
+private:
+	int OpenTmpDatabase() {
+		int tmp_fd = open(tmp_db_filepath.c_str(), O_CREAT | O_WRONLY | O_TRUNC, S_IRUSR | S_IWUSR);
+		if (tmp_fd < 0) {
+			std::cerr << "can't create data file: " << tmp_db_filepath << std::endl;
+			exit(EXIT_FAILURE);
+		}
+		return tmp_fd;
+	}
+
+	std::string tmp_db_filepath;
+	int base_fd;
+	bool use_reflink;
+	std::vector<char> image;
+};
+#endif
+
 int main() {
 	uint8_t buf[4096];
 #ifdef DUCKDB_AFLPLUSPLUS_DIR
@@ -23,6 +113,14 @@ int main() {
 	static_assert(false, "error: DUCKDB_AFLPLUSPLUS_DIR not defined");
 #endif
 
+#ifndef LEGACY_BASE_DB_COPY
+	// prepare the base database copy once; the afl++ fork server starts after this point
+	BaseDatabase base_db(base_db_filepath, tmp_db_filepath);
+#endif
+#ifdef __AFL_HAVE_MANUAL_CONTROL
+	__AFL_INIT();
+#endif
+
 	// read wal file data from stdin and save it as file
 	int fd = open(wal_filepath.c_str(), O_CREAT | O_WRONLY | O_TRUNC, S_IRUSR | S_IWUSR);
 	if (fd < 0) {
@@ -60,10 +158,14 @@ int main() {
 		}
 
 		// get a fresh copy of the base database:
+#ifdef LEGACY_BASE_DB_COPY
 		std::ifstream src(base_db_filepath.c_str(), std::ios::binary);
 		std::ofstream dst(tmp_db_filepath.c_str(), std::ios::binary);
 		dst << src.rdbuf();
 		dst.close();
+#else
+		base_db.CopyToTmpDatabase();
+#endif
 
 		// ingest database file (this will also process the .wal file) to test if it causes a crash
 		duckdb::DuckDB db(tmp_db_filepath.c_str());